@@ -1,27 +1,29 @@
-from fastapi import APIRouter, HTTPException, Query, Request, Response
-from datetime import date, datetime
-from typing import List, Optional, Callable, Any
-from fastapi_cache.decorator import cache
+from fastapi import APIRouter, HTTPException, Query, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from datetime import date, datetime, timedelta
+from typing import List, Literal, Optional
 
 from app.api.dependencies import MongoAnalyticsDep
-from app.exceptions import InvalidDateRangeError, TypeIdNotFoundError
+from app.exceptions import (
+    InvalidCursorError,
+    InvalidDateRangeError,
+    TypeIdNotFoundError,
+)
+from app.repositories.analytics import LOG_SORT_FIELDS
+from app.utils.analytics_cache import analytics_cache, build_cache_key, days_between
+from app.utils.log_export import csv_chunks, ndjson_chunks
+from app.utils.metrics import MetricsRoute
+from app.utils.pagination import decode_cursor, encode_cursor
+
 
+router = APIRouter(
+    prefix="/analytics", tags=["Analytics Analytics"], route_class=MetricsRoute
+)
 
-router = APIRouter(prefix="/analytics", tags=["Analytics Analytics"])
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
 
-def only_day_key_builder(
-    func: Callable[..., Any],
-    namespace: str = "",
-    request: Request | None = None,
-    response: Response | None = None,
-    args: tuple[Any, ...] = (),
-    kwargs: dict[str, Any] | None = None,
-) -> str:
-    kwargs = kwargs or {}
-    day = kwargs.get("day")
-    return f"{namespace}:{func.__name__}:{day}"
 
-@cache(expire=60 * 10, key_builder=only_day_key_builder)
 @router.get(
     "/daily_totals",
     summary="Получить суммы доставок за день",
@@ -44,7 +46,11 @@ async def get_daily_delivery_totals(
         - **total_delivery_cost_rub** — общая стоимость в рублях
         - **count_packages** — количество посылок
     """
-    return await db.get_daily_totals(day)
+    return await analytics_cache.get_or_set(
+        build_cache_key("daily_totals", {"day": day}),
+        [day],
+        lambda: db.get_daily_totals(day),
+    )
 
 
 @router.get(
@@ -74,7 +80,8 @@ async def delivery_totals_range(
     """
     Получить агрегированную статистику доставок по диапазону дат.
     """
-    try:
+
+    async def load():
         results = await db.get_totals_range(start_date, end_date, type_id)
         return [
             {
@@ -84,6 +91,16 @@ async def delivery_totals_range(
             }
             for r in results
         ]
+
+    try:
+        return await analytics_cache.get_or_set(
+            build_cache_key(
+                "delivery_totals_range",
+                {"start_date": start_date, "end_date": end_date, "type_id": type_id},
+            ),
+            days_between(start_date, end_date),
+            load,
+        )
     except InvalidDateRangeError as e:
         raise HTTPException(status_code=400, detail=e.detail)
     except TypeIdNotFoundError as e:
@@ -92,17 +109,82 @@ async def delivery_totals_range(
         raise HTTPException(status_code=500, detail=f"Ошибка: {e}")
 
 
+MAX_HOURLY_RANGE_DAYS = 31
+
+
+@router.get(
+    "/hourly_totals",
+    summary="Получить суммы доставок по часам",
+    response_model=List[dict],
+    description=f"""
+Возвращает стоимость доставки и количество посылок по часам и типам
+за день (`day`) или диапазон дней (`start`/`end`, не длиннее {MAX_HOURLY_RANGE_DAYS} дней).
+- Даты должны быть в формате **YYYY-MM-DD**.
+- Данные читаются из предагрегированных часовых корзин.
+    """,
+    responses={
+        200: {"description": "Успешный ответ"},
+        400: {"description": "Неверный диапазон дат"},
+        422: {"description": "Ошибка валидации параметров"},
+    },
+)
+async def get_hourly_delivery_totals(
+    db: MongoAnalyticsDep,  # type: ignore
+    day: Optional[date] = Query(None, description="Дата в формате YYYY-MM-DD"),
+    start: Optional[date] = Query(None, description="Дата начала в формате YYYY-MM-DD"),
+    end: Optional[date] = Query(None, description="Дата конца в формате YYYY-MM-DD"),
+    type_id: Optional[int] = Query(None, description="Фильтр по type_id, опциональный"),
+):
+    """
+    Суммы доставок по часам.
+
+    - **day**: один день; взаимоисключается с **start**/**end**
+    - Возвращает список словарей с полями day_key, hour, type_id,
+      total_delivery_cost_rub, count_packages
+    """
+    if day is not None:
+        if start is not None or end is not None:
+            raise HTTPException(
+                status_code=400, detail="Укажите либо day, либо start и end"
+            )
+        start = end = day
+    elif start is None or end is None:
+        raise HTTPException(status_code=400, detail="Укажите day либо start и end")
+
+    if (end - start).days >= MAX_HOURLY_RANGE_DAYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Диапазон не может быть длиннее {MAX_HOURLY_RANGE_DAYS} дней",
+        )
+
+    try:
+        return await analytics_cache.get_or_set(
+            build_cache_key(
+                "hourly_totals", {"start": start, "end": end, "type_id": type_id}
+            ),
+            days_between(start, end),
+            lambda: db.get_hourly_totals(start, end, type_id),
+        )
+    except InvalidDateRangeError as e:
+        raise HTTPException(status_code=400, detail=e.detail)
+
+
 @router.get(
     "/all",
     response_model=List[dict],
     summary="Получить все логи доставок",
-    description="Возвращает список логов доставок с фильтрацией, сортировкой и пагинацией. Используется для отладки.",
+    description=(
+        "Возвращает список логов доставок с фильтрацией, сортировкой и пагинацией. Используется для отладки. "
+        f"Если страница заполнена, в заголовке `{NEXT_CURSOR_HEADER}` возвращается курсор следующей страницы."
+    ),
     responses={
         200: {"description": "Успешный ответ"},
+        400: {"description": "Некорректный курсор"},
     },
 )
 async def get_all_delivery_logs(
     db: MongoAnalyticsDep,  # type: ignore
+    response: Response,
     skip: int = Query(0, ge=0, description="Количество записей для пропуска (skip)"),
     limit: int = Query(
         100, le=1000, description="Максимальное количество записей (limit)"
@@ -112,13 +194,18 @@ async def get_all_delivery_logs(
         None, description="Начальная дата фильтрации"
     ),
     date_to: Optional[datetime] = Query(None, description="Конечная дата фильтрации"),
-    sort_field: str = Query(
+    sort_field: Literal[LOG_SORT_FIELDS] = Query(  # type: ignore
         "created_at",
-        description="Поле для сортировки (например, created_at, package_id)",
+        description="Поле для сортировки: created_at или package_id",
     ),
     sort_order: str = Query(
         "desc", regex="^(asc|desc)$", description="Порядок сортировки: asc или desc"
     ),
+    cursor: Optional[str] = Query(
+        None,
+        max_length=200,
+        description=f"Курсор следующей страницы из заголовка {NEXT_CURSOR_HEADER}; если указан, skip игнорируется",
+    ),
 ):
     """
     Для отладки - получение всех логов доставок с пагинацией
@@ -129,16 +216,98 @@ async def get_all_delivery_logs(
     - type_id: Фильтр по типу посылки
     - date_from: Начальная дата для фильтрации
     - date_to: Конечная дата для фильтрации
-    - sort_field: Поле для сортировки (created_at, package_id и т.д.)
+    - sort_field: Поле для сортировки (created_at, package_id)
     - sort_order: Порядок сортировки (asc/desc)
+    - cursor: курсор для пагинации поиском по (sort_field, _id), стоимость
+      страницы не зависит от её номера
     """
 
-    return await db.get_all(
-        skip=skip,
-        limit=limit,
-        type_id=type_id,
-        date_from=date_from,
-        date_to=date_to,
-        sort_field=sort_field,
-        sort_order=sort_order,
+    after = None
+    if cursor:
+        try:
+            position = decode_cursor(cursor)
+            if position["sort"] != [sort_field, sort_order]:
+                raise InvalidCursorError
+            after = (position["value"], position["id"])
+        except (InvalidCursorError, KeyError, TypeError):
+            raise HTTPException(status_code=400, detail=InvalidCursorError.detail)
+
+    params = {
+        "skip": skip,
+        "limit": limit,
+        "type_id": type_id,
+        "date_from": date_from,
+        "date_to": date_to,
+        "sort_field": sort_field,
+        "sort_order": sort_order,
+    }
+    days = None
+    if date_from is not None and date_to is not None:
+        # day_key считается по Москве — захватываем соседние дни
+        days = days_between(
+            date_from.date() - timedelta(days=1), date_to.date() + timedelta(days=1)
+        )
+
+    try:
+        logs = await analytics_cache.get_or_set(
+            build_cache_key("all", {**params, "cursor": cursor}),
+            days,
+            lambda: db.get_all(**params, after=after),
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=e.detail)
+
+    if len(logs) == limit:
+        last = logs[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+            {
+                "sort": [sort_field, sort_order],
+                "value": jsonable_encoder(last.get(sort_field)),
+                "id": last["id"],
+            }
+        )
+    return logs
+
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+@router.get(
+    "/export",
+    summary="Выгрузка логов доставок",
+    description=(
+        "Потоково отдаёт все логи доставок по тем же фильтрам, что и `/analytics/all`, в формате NDJSON или CSV, без ограничения количества. "
+        "Логи отсортированы по времени создания."
+    ),
+    response_class=StreamingResponse,
+    responses={
+        200: {
+            "description": "Файл с логами",
+            "content": {media_type: {} for media_type in EXPORT_MEDIA_TYPES.values()},
+        },
+    },
+)
+async def export_delivery_logs(
+    db: MongoAnalyticsDep,  # type: ignore
+    format: Literal["ndjson", "csv"] = Query("ndjson", description="Формат выгрузки"),
+    type_id: Optional[int] = Query(None, description="Фильтр по типу посылки"),
+    date_from: Optional[datetime] = Query(
+        None, description="Начальная дата фильтрации"
+    ),
+    date_to: Optional[datetime] = Query(None, description="Конечная дата фильтрации"),
+    sort_order: Literal["asc", "desc"] = Query(
+        "asc", description="Порядок сортировки по created_at"
+    ),
+):
+    docs = db.iter_logs(type_id, date_from, date_to, sort_order)
+    chunks = csv_chunks(docs) if format == "csv" else ndjson_chunks(docs)
+    return StreamingResponse(
+        chunks,
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="delivery_logs.{format}"'
+        },
     )
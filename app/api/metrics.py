@@ -0,0 +1,28 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.setup import redis_manager
+from app.utils.metrics import render_metrics
+
+
+router = APIRouter(tags=["Мониторинг"])
+
+CELERY_QUEUE = "celery"
+
+
+@router.get(
+    "/metrics",
+    summary="Метрики в формате Prometheus",
+    description=(
+        "Время обработки запросов, SQL- и Mongo-запросов, состояние буфера логов, число обращений к Redis и длина очереди Celery. "
+        "Значения собираются со всех воркеров API и Celery и отстают не больше чем на METRICS_FLUSH_INTERVAL секунд."
+    ),
+    response_class=PlainTextResponse,
+)
+async def get_metrics():
+    await redis_manager.connect()
+    body = await render_metrics(redis_manager.redis)
+    queue_length = await redis_manager.redis.llen(CELERY_QUEUE)
+    body += "# TYPE celery_queue_length gauge\n"
+    body += f'celery_queue_length{{queue="{CELERY_QUEUE}"}} {queue_length}\n'
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
@@ -5,9 +5,14 @@ from app.api.dependencies import DBDep
 from app.exceptions import DataBaseIntegrityException, ObjectAlreadyExistException
 from app.schemas.package_types import PackageTypeBase, PackageTypeRead
 from app.schemas.reference import AddResponse
+from app.setup import redis_manager
+from app.utils.metrics import MetricsRoute
+from app.utils.package_type_cache import package_type_cache
 
 
-router = APIRouter(prefix="/package_types", tags=["Типы посылок"])
+router = APIRouter(
+    prefix="/package_types", tags=["Типы посылок"], route_class=MetricsRoute
+)
 
 
 @router.get(
@@ -25,7 +30,7 @@ async def get_package_types(
     Возвращает список всех типов посылок.
     Если в базе нет типов, возвращается пустой список.
     """
-    return await db.package_types.get_all()
+    return await package_type_cache.get_all(db.session)
 
 
 @router.post(
@@ -56,4 +61,5 @@ async def post_package_type(
     except DataBaseIntegrityException:
         raise HTTPException(status_code=409, detail="Ошибка в данных")
     await db.commit()
+    await package_type_cache.publish_invalidation(redis_manager)
     return AddResponse(id=result["id"])
@@ -1,27 +1,54 @@
-from typing import Annotated, List
-from fastapi import APIRouter, HTTPException, Query, Request, status
-from pydantic import Field
+import json
+from datetime import datetime
+from decimal import Decimal
+from typing import Annotated, Any, List
+from zoneinfo import ZoneInfo
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
+from pydantic import Field, ValidationError
 
 from app.api.dependencies import DBDep, PaginationDep
-from app.exceptions import DataBaseIntegrityException, ObjectNotFoundException
-from app.schemas.packages import PackageBrief, PackageCreate, PackageAddData, PackageRead
-from app.schemas.reference import AddResponse
-from app.tasks.tasks import set_delivery_costs, log_package_to_mongo
+from app.exceptions import (
+    DataBaseIntegrityException,
+    InvalidCursorError,
+    ObjectNotFoundException,
+)
+from app.schemas.packages import (
+    PackageBrief,
+    PackageCreate,
+    PackageAddData,
+    PackageRead,
+    package_briefs_adapter,
+)
+from app.schemas.reference import AddResponse, BulkAddResponse, BulkItemError
+from app.tasks.tasks import log_packages_batch, set_delivery_costs
 from app.config import settings
+from app.pricing import delivery_cost_rub
+from app.setup import redis_manager
+from app.utils.metrics import MetricsRoute
+from app.utils.package_log_batcher import package_log_batcher
+from app.utils.pagination import decode_cursor, encode_cursor
+from app.utils.task_enqueuer import task_enqueuer
+from app.utils.usd_rate_cache import usd_rate_cache
 
 
-router = APIRouter(prefix="/packages", tags=["Посылки"])
+router = APIRouter(prefix="/packages", tags=["Посылки"], route_class=MetricsRoute)
 
 DEFAULT_PER_PAGE = 10
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+MAX_BULK_ITEMS = 5000
 
 
 @router.get(
     "/",
     summary="Получение информации о всех посылках",
-    description="Возвращает список посылок с пагинацией. Можно фильтровать по типу и по наличию стоимости доставки.",
+    description=(
+        "Возвращает список посылок с пагинацией. Можно фильтровать по типу и по наличию стоимости доставки. "
+        f"Если страница заполнена, в заголовке `{NEXT_CURSOR_HEADER}` возвращается курсор следующей страницы."
+    ),
     response_model=List[PackageBrief],
     responses={
         200: {"description": "Список посылок успешно получен"},
+        400: {"description": "Некорректный курсор"},
         422: {"description": "Некорректные параметры запроса"},
     },
 )
@@ -36,23 +63,59 @@ async def get_packages(
     has_delivery_cost: Annotated[
         bool | None, Query(description="Фильтр по расчету доставки")
     ] = None,
+    cursor: Annotated[
+        str | None,
+        Query(
+            description=f"Курсор следующей страницы из заголовка {NEXT_CURSOR_HEADER}; если указан, page игнорируется",
+            max_length=200,
+        ),
+    ] = None,
 ):
     """
     Получение информации о всех посылках с фильтрацией и постраничной навигацией.
 
     - **type_filter**: фильтр по типу посылки (id или часть названия)
     - **has_delivery_cost**: фильтр по наличию стоимости доставки
-    - **pagination**: параметры пагина"""
+    - **pagination**: параметры пагинации (page/per_page)
+    - **cursor**: курсор для keyset-пагинации, стоимость страницы не зависит от её номера
+    """
 
     per_page = pagination.per_page or DEFAULT_PER_PAGE
-    return await db.packages.get_filtered_by_type(
+    after_id = None
+    if cursor:
+        try:
+            after_id = int(decode_cursor(cursor)["id"])
+        except (InvalidCursorError, KeyError, TypeError, ValueError):
+            raise HTTPException(status_code=400, detail=InvalidCursorError.detail)
+
+    packages = await db.packages.get_filtered_by_type(
         session_id=request.state.session_id,
         limit=per_page,
         offset=per_page * (pagination.page - 1),
         type_filter=type_filter,
         has_delivery_cost=has_delivery_cost,
+        after_id=after_id,
     )
 
+    headers = {}
+    if len(packages) == per_page:
+        headers[NEXT_CURSOR_HEADER] = encode_cursor({"id": packages[-1].id})
+
+    # Страница уже проверена в репозитории — сериализуем её одним вызовом,
+    # без повторной проверки по response_model
+    return Response(
+        content=package_briefs_adapter.dump_json(packages),
+        media_type="application/json",
+        headers=headers,
+    )
+
+
+def _delivery_cost(item: PackageCreate, usd_rub_rate: Decimal | None) -> Decimal | None:
+    """Стоимость по текущему курсу; без курса её досчитает set_delivery_costs"""
+    if usd_rub_rate is None:
+        return None
+    return delivery_cost_rub(item.weight_kg, item.value_usd, usd_rub_rate, item.type_id)
+
 
 @router.post(
     "/",
@@ -70,8 +133,11 @@ async def post_package(
     request: Request,
     data: PackageCreate,
 ):
+    usd_rub_rate = await usd_rate_cache.get(redis_manager)
     package_data = PackageAddData(
-        **data.model_dump(), session_id=request.state.session_id
+        **data.model_dump(),
+        session_id=request.state.session_id,
+        delivery_cost=_delivery_cost(data, usd_rub_rate),
     )
 
     try:
@@ -82,16 +148,165 @@ async def post_package(
     await db.commit()
 
     if settings.MODE != "TEST":
-        log_package_to_mongo.delay(
-            package_id=result["id"],
-            type_id=data.type_id,
-            weight_kg=str(data.weight_kg),
-            value_usd=str(data.value_usd),
+        await package_log_batcher.add(
+            {
+                "package_id": result["id"],
+                "type_id": data.type_id,
+                "weight_kg": str(data.weight_kg),
+                "value_usd": str(data.value_usd),
+                "created_at": datetime.now(ZoneInfo("Europe/Moscow")).isoformat(),
+            }
         )
 
     return AddResponse(id=result["id"])
 
 
+def _parse_bulk_body(body: bytes, content_type: str) -> list[Any]:
+    """Разбирает JSON-массив или NDJSON; нераспарсенные строки NDJSON — ValueError"""
+    if "ndjson" in content_type:
+        items: list[Any] = []
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError as e:
+                items.append(e)
+        return items
+
+    try:
+        items = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Тело запроса не является JSON")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Ожидается JSON-массив посылок")
+    return items
+
+
+@router.post(
+    "/bulk",
+    summary="Создать посылки пачкой",
+    description=(
+        "Принимает JSON-массив или NDJSON (`Content-Type: application/x-ndjson`) "
+        f"до {MAX_BULK_ITEMS} посылок. Корректные посылки добавляются одной транзакцией, "
+        "их ID возвращаются в порядке следования, ошибки валидации — по индексу элемента."
+    ),
+    response_model=BulkAddResponse,
+    status_code=status.HTTP_201_CREATED,
+    responses={
+        201: {"description": "Корректные посылки созданы"},
+        400: {"description": "Тело запроса не разобрано"},
+        409: {"description": "Ошибка в заполненных данных"},
+        413: {"description": "Слишком много посылок в одном запросе"},
+        422: {"description": "Ни одна посылка не прошла валидацию"},
+    },
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {
+                    "schema": {
+                        "type": "array",
+                        "items": {"$ref": "#/components/schemas/PackageCreate"},
+                    }
+                },
+                "application/x-ndjson": {"schema": {"type": "string"}},
+            },
+        }
+    },
+)
+async def post_packages_bulk(
+    db: DBDep,  # type: ignore
+    request: Request,
+):
+    raw_items = _parse_bulk_body(
+        await request.body(), request.headers.get("content-type", "")
+    )
+    if len(raw_items) > MAX_BULK_ITEMS:
+        raise HTTPException(
+            status_code=413, detail=f"Не больше {MAX_BULK_ITEMS} посылок за запрос"
+        )
+
+    valid: list[tuple[int, PackageCreate]] = []
+    errors: list[BulkItemError] = []
+    for index, raw in enumerate(raw_items):
+        if isinstance(raw, ValueError):
+            errors.append(
+                BulkItemError(
+                    index=index, errors=[{"msg": f"Некорректный JSON: {raw}"}]
+                )
+            )
+            continue
+        try:
+            valid.append((index, PackageCreate.model_validate(raw)))
+        except ValidationError as e:
+            errors.append(
+                BulkItemError(
+                    index=index,
+                    errors=e.errors(include_url=False, include_context=False),
+                )
+            )
+
+    existing_type_ids = await db.package_types.get_existing_ids(
+        {item.type_id for _, item in valid}
+    )
+    to_insert: list[PackageCreate] = []
+    for index, item in valid:
+        if item.type_id in existing_type_ids:
+            to_insert.append(item)
+        else:
+            errors.append(
+                BulkItemError(
+                    index=index,
+                    errors=[
+                        {"loc": ["type_id"], "msg": "Указанный type_id не найден."}
+                    ],
+                )
+            )
+
+    if not to_insert:
+        raise HTTPException(
+            status_code=422,
+            detail=[e.model_dump() for e in sorted(errors, key=lambda e: e.index)],
+        )
+
+    session_id = request.state.session_id
+    usd_rub_rate = await usd_rate_cache.get(redis_manager)
+    try:
+        ids = await db.packages.add_bulk(
+            [
+                PackageAddData(
+                    **item.model_dump(),
+                    session_id=session_id,
+                    delivery_cost=_delivery_cost(item, usd_rub_rate),
+                )
+                for item in to_insert
+            ],
+            session_id=session_id,
+        )
+    except DataBaseIntegrityException:
+        raise HTTPException(status_code=409, detail="Ошибка в заполненных данных")
+
+    await db.commit()
+
+    if settings.MODE != "TEST":
+        await task_enqueuer.enqueue(
+            log_packages_batch,
+            [
+                {
+                    "package_id": package_id,
+                    "type_id": item.type_id,
+                    "weight_kg": str(item.weight_kg),
+                    "value_usd": str(item.value_usd),
+                }
+                for package_id, item in zip(ids, to_insert)
+            ],
+            created_at=datetime.now(ZoneInfo("Europe/Moscow")).isoformat(),
+        )
+
+    return BulkAddResponse(ids=ids, errors=sorted(errors, key=lambda e: e.index))
+
+
 @router.post(
     "/update",
     summary="Рассчитать стоимости доставок",
@@ -100,7 +315,7 @@ async def post_package(
     responses={200: {"description": "Запрос на расчет стоимостей отправлен"}},
 )
 async def update_delivery_costs():
-    set_delivery_costs.delay()
+    await task_enqueuer.enqueue(set_delivery_costs)
     return {"status": "Запрос на расчет стоимостей отправлен"}
 
 
@@ -0,0 +1,126 @@
+from typing import Annotated
+
+import numpy as np
+from fastapi import APIRouter, Body, HTTPException, status
+
+from app.pricing import delivery_cost_rub
+from app.pricing_engine import (
+    RATE_SCALE,
+    VALUE_SCALE,
+    WEIGHT_SCALE,
+    kopecks_to_decimal,
+    pricing_engine,
+    to_scaled,
+)
+from app.schemas.pricing import (
+    DeliveryCostsProgress,
+    QuoteItem,
+    QuoteResponse,
+    RepriceProgress,
+)
+from app.setup import redis_manager
+from app.tasks.repricing import REPRICE_PROGRESS_KEY, load_progress
+from app.tasks.tasks import DELIVERY_COSTS_PROGRESS_KEY, start_repricing
+from app.utils.metrics import MetricsRoute
+from app.utils.task_enqueuer import task_enqueuer
+from app.utils.usd_rate_cache import usd_rate_cache
+
+
+router = APIRouter(
+    prefix="/pricing", tags=["Стоимость доставки"], route_class=MetricsRoute
+)
+
+MAX_QUOTE_ITEMS = 1000
+
+
+@router.post(
+    "/quote",
+    summary="Расчёт стоимости доставки без сохранения посылок",
+    description=(
+        f"Считает стоимость доставки до {MAX_QUOTE_ITEMS} посылок по текущему тарифу и курсу USD→RUB. "
+        "Результат совпадает с тем, что будет записан в посылку при текущем курсе."
+    ),
+    response_model=QuoteResponse,
+    responses={
+        200: {"description": "Стоимости в порядке переданных посылок"},
+        422: {"description": "Некорректные данные"},
+        503: {"description": "Курс USD ещё не получен"},
+    },
+)
+async def quote(
+    items: Annotated[list[QuoteItem], Body(min_length=1, max_length=MAX_QUOTE_ITEMS)],
+):
+    usd_rub_rate = await usd_rate_cache.get(redis_manager)
+    if usd_rub_rate is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Курс USD ещё не получен, попробуйте позже",
+        )
+
+    try:
+        kopecks = pricing_engine.costs_kopecks(
+            np.array([int(item.weight_kg * WEIGHT_SCALE) for item in items]),
+            np.array([int(item.value_usd * VALUE_SCALE) for item in items]),
+            np.array([item.type_id for item in items]),
+            np.full(len(items), to_scaled(usd_rub_rate, RATE_SCALE)),
+        )
+        costs = kopecks_to_decimal(kopecks)
+    except ValueError:
+        # Курс с точностью больше 4 знаков — считаем по одной через Decimal
+        costs = [
+            delivery_cost_rub(
+                item.weight_kg, item.value_usd, usd_rub_rate, item.type_id
+            )
+            for item in items
+        ]
+    return QuoteResponse(usd_rub_rate=usd_rub_rate, costs=costs)
+
+
+@router.post(
+    "/reprice",
+    summary="Пересчитать стоимости по текущему курсу",
+    description=(
+        "Запускает фоновый пересчёт стоимостей посылок за последние REPRICE_WINDOW_DAYS дней по текущему курсу USD→RUB. "
+        "Сам запускается задачей обновления курса, если курс заметно изменился."
+    ),
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=dict[str, str],
+    responses={202: {"description": "Запрос на пересчёт отправлен"}},
+)
+async def reprice():
+    await task_enqueuer.enqueue(start_repricing)
+    return {"status": "Запрос на пересчёт отправлен"}
+
+
+@router.get(
+    "/reprice",
+    summary="Ход пересчёта стоимостей",
+    description=(
+        "Состояние последнего пересчёта стоимостей по курсу: курс, окно, сколько строк пересчитано и процент пройденного окна. "
+        "Статус idle — пересчёт ещё не запускался."
+    ),
+    response_model=RepriceProgress,
+    responses={200: {"description": "Контрольная точка пересчёта"}},
+)
+async def reprice_progress():
+    raw = await redis_manager.redis.hgetall(REPRICE_PROGRESS_KEY)
+    return RepriceProgress(**load_progress(raw))
+
+
+@router.get(
+    "/delivery_costs",
+    summary="Ход досчёта стоимостей",
+    description=(
+        "Состояние последнего прохода set_delivery_costs, который досчитывает посылки, созданные без курса: сколько диапазонов id обработано и сколько стоимостей записано. "
+        "Статус idle — досчёт ещё не запускался."
+    ),
+    response_model=DeliveryCostsProgress,
+    responses={200: {"description": "Прогресс досчёта"}},
+)
+async def delivery_costs_progress():
+    raw = await redis_manager.redis.hgetall(DELIVERY_COSTS_PROGRESS_KEY)
+    if not raw:
+        return DeliveryCostsProgress(status="idle")
+    return DeliveryCostsProgress(
+        **{key.decode(): value.decode() for key, value in raw.items()}
+    )
@@ -23,6 +23,74 @@ class Settings(BaseSettings):
 
     API_KEY: str
 
+    # SQL-эхо: по умолчанию только в DEV
+    DB_ECHO: bool | None = None
+    # Порог медленного запроса для лога, мс; None — не логировать
+    SLOW_QUERY_MS: float | None = 200
+
+    DB_POOL_SIZE: int | None = None
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 60 * 60
+    DB_POOL_PRE_PING: bool = True
+    # Лимит соединений MySQL (max_connections), сколько из них оставить
+    # воркерам Celery, миграциям и админке, и на сколько воркеров uvicorn
+    # делится остальное: пул воркера — (DB_MAX_CONNECTIONS -
+    # DB_RESERVED_CONNECTIONS) / WEB_CONCURRENCY - DB_MAX_OVERFLOW
+    DB_MAX_CONNECTIONS: int = 100
+    DB_RESERVED_CONNECTIONS: int = 30
+    WEB_CONCURRENCY: int = 1
+
+    # Сколько дней хранить сырые логи доставок (None — бессрочно).
+    # Суммы в delivery_*_rollups при этом сохраняются.
+    # ttl — удаление TTL-индексом, archive — перенос в delivery_logs_archive
+    DELIVERY_LOGS_RETENTION_DAYS: int | None = None
+    DELIVERY_LOGS_RETENTION_MODE: Literal["ttl", "archive"] = "ttl"
+
+    # Хранить сырые логи в time-series коллекции delivery_logs_ts
+    DELIVERY_LOGS_TIMESERIES: bool = False
+
+    # Тариф доставки в JSON (см. app.pricing.Tariff); None — базовый тариф
+    PRICING_TARIFF: str | None = None
+    # Чем пересчитывать стоимости: numpy — векторно в воркере, sql — UPDATE в MySQL
+    PRICING_ENGINE: Literal["numpy", "sql"] = "numpy"
+
+    # Логи посылок из API уходят в Celery пачками: до LOG_BATCH_MAX_SIZE записей
+    # или через LOG_BATCH_MAX_DELAY секунд после первой записи пачки
+    LOG_BATCH_MAX_SIZE: int = 500
+    LOG_BATCH_MAX_DELAY: float = 0.5
+
+    # Очередь постановки задач Celery из API: размер (дальше — ожидание места)
+    # и число потоков, публикующих задачи в брокер
+    TASK_ENQUEUE_QUEUE_SIZE: int = 10_000
+    TASK_ENQUEUE_WORKERS: int = 4
+
+    # Пересчёт стоимостей по новому курсу: запускается, если курс изменился
+    # не меньше чем на REPRICE_THRESHOLD_PERCENT, и захватывает посылки,
+    # созданные за последние REPRICE_WINDOW_DAYS дней. Пачки по
+    # REPRICE_BATCH_SIZE, не быстрее REPRICE_ROWS_PER_SECOND строк в секунду
+    REPRICE_THRESHOLD_PERCENT: float = 1.0
+    REPRICE_WINDOW_DAYS: int = 7
+    REPRICE_BATCH_SIZE: int = 1000
+    REPRICE_ROWS_PER_SECOND: int = 2000
+
+    # Как часто процесс выгружает накопленные метрики в Redis, секунды
+    METRICS_FLUSH_INTERVAL: float = 5
+
+    @property
+    def DB_ECHO_ENABLED(self) -> bool:
+        if self.DB_ECHO is None:
+            return self.MODE == "DEV"
+        return self.DB_ECHO
+
+    @property
+    def DB_POOL_SIZE_PER_WORKER(self) -> int:
+        if self.DB_POOL_SIZE is not None:
+            return self.DB_POOL_SIZE
+        available = self.DB_MAX_CONNECTIONS - self.DB_RESERVED_CONNECTIONS
+        per_worker = available // max(self.WEB_CONCURRENCY, 1)
+        return max(per_worker - self.DB_MAX_OVERFLOW, 1)
+
     @property
     def REDIS_URL(self):
         return f"redis://{self.REDIS_HOST}:{self.REDIS_PORT}"
@@ -2,6 +2,8 @@ import logging
 
 import redis.asyncio as redis
 
+from app.utils.metrics import AsyncCountingConnection
+
 
 logger = logging.getLogger(__name__)
 
@@ -18,7 +20,13 @@ class RedisManager:
 
         logger.info(f"async Начинаю подключение к Redis host={self.host}")
 
-        self.redis = redis.Redis(host=self.host, port=self.port)
+        self.redis = redis.Redis(
+            connection_pool=redis.ConnectionPool(
+                host=self.host,
+                port=self.port,
+                connection_class=AsyncCountingConnection,
+            )
+        )
 
         try:
             await self.redis.ping()
@@ -44,6 +52,9 @@ class RedisManager:
     async def delete(self, key: str):
         await self.redis.delete(key)
 
+    async def publish(self, channel: str, message: str):
+        await self.redis.publish(channel, message)
+
     async def close(self):
         if self.redis:
             await self.redis.close()
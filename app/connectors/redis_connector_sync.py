@@ -1,6 +1,8 @@
 import logging
 import redis
 
+from app.utils.metrics import CountingConnection
+
 logger = logging.getLogger(__name__)
 
 
@@ -16,7 +18,11 @@ class RedisManagerSync:
         if self.redis is not None:
             return
 
-        self.redis = redis.Redis(host=self.host, port=self.port)
+        self.redis = redis.Redis(
+            connection_pool=redis.ConnectionPool(
+                host=self.host, port=self.port, connection_class=CountingConnection
+            )
+        )
 
         try:
             self.redis.ping()
@@ -1,12 +1,53 @@
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+import logging
+import time
+
+from sqlalchemy import NullPool, event
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase
-from sqlalchemy import NullPool
 
 from app.config import settings
 
 
-engine = create_async_engine(settings.DB_URL, echo=True)
-engine_null = create_async_engine(settings.DB_URL, echo=True, poolclass=NullPool)
+slow_query_logger = logging.getLogger("app.sql.slow")
+
+
+def setup_slow_query_log(engine: AsyncEngine, threshold_ms: float) -> None:
+    """Логирует запросы дольше threshold_ms вместо эха всех запросов"""
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def _log_slow(conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - conn.info["query_started_at"].pop()) * 1000
+        if elapsed_ms >= threshold_ms:
+            slow_query_logger.warning(
+                f"Медленный запрос {elapsed_ms:.1f} мс: {statement}"
+            )
+
+
+def make_engine(**overrides) -> AsyncEngine:
+    """Движок с параметрами пула и логирования из настроек"""
+    options = {"echo": settings.DB_ECHO_ENABLED}
+    if overrides.get("poolclass") is not NullPool:
+        options.update(
+            pool_size=settings.DB_POOL_SIZE_PER_WORKER,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+            pool_pre_ping=settings.DB_POOL_PRE_PING,
+        )
+    options.update(overrides)
+
+    new_engine = create_async_engine(settings.DB_URL, **options)
+    if settings.SLOW_QUERY_MS is not None:
+        setup_slow_query_log(new_engine, settings.SLOW_QUERY_MS)
+    return new_engine
+
+
+engine = make_engine()
+engine_null = make_engine(poolclass=NullPool)
 
 async_session_maker = async_sessionmaker(bind=engine, expire_on_commit=False)
 async_session_maker_null = async_sessionmaker(bind=engine_null, expire_on_commit=False)
@@ -16,6 +16,14 @@ class TypeIdNotFoundError(MyAllExceptions):
     detail = "Указанный type_id не найден."
 
 
+class InvalidCursorError(MyAllExceptions):
+    detail = "Некорректный курсор пагинации."
+
+
+class InvalidSortFieldError(MyAllExceptions):
+    detail = "Сортировка по этому полю не поддерживается."
+
+
 class ObjectNotFoundException(MyAllExceptions):
     detail = "Объект не найден"
 
@@ -1,4 +1,5 @@
 # ruff: noqa: E402
+import asyncio
 from contextlib import asynccontextmanager
 from typing import Any
 
@@ -7,20 +8,25 @@ import uvicorn
 import logging
 import sys
 from pathlib import Path
-from fastapi_cache import FastAPICache
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi_cache.backends.redis import RedisBackend
 
 
 sys.path.append(str(Path(__file__).parent.parent))
 
-logging.basicConfig(level=logging.INFO)
+from app.utils.log_queue import setup_queue_logging
+
+setup_queue_logging(logging.INFO)
 
 from app.setup_indexes import ensure_mongo_indexes
 from app.tasks.tasks import set_usd_course
-from app.api import analytics, package_types, packages
+from app.api import analytics, metrics as metrics_api, package_types, packages, pricing
 from app.setup import redis_manager, mongo_manager
-from app.middleware.session import session_key_middleware
+from app.middleware.session import SessionKeyMiddleware
+from app.utils.metrics import metrics
+from app.utils.package_log_batcher import package_log_batcher
+from app.utils.package_type_cache import package_type_cache
+from app.utils.task_enqueuer import task_enqueuer
+from app.utils.usd_rate_cache import usd_rate_cache
 
 
 @asynccontextmanager
@@ -30,20 +36,29 @@ async def lifespan(app: FastAPI):
     mongo_db = await mongo_manager.get_mongodb()
     app.state.mongo_db: Any = mongo_db  # type: ignore
     await ensure_mongo_indexes(mongo_db)
-    FastAPICache.init(RedisBackend(redis_manager.redis), prefix="fastapi-cache")
-    set_usd_course.delay()
+    task_enqueuer.start()
+    await task_enqueuer.enqueue(set_usd_course)
+    type_cache_listener = asyncio.create_task(package_type_cache.listen(redis_manager))
+    rate_listener = asyncio.create_task(usd_rate_cache.listen(redis_manager))
+    metrics.start()
+    package_log_batcher.start()
     yield
+    await package_log_batcher.stop()
+    await task_enqueuer.stop()
+    type_cache_listener.cancel()
+    rate_listener.cancel()
+    metrics.stop()
     await redis_manager.close()
     await mongo_manager.close()
 
 
 app = FastAPI(lifespan=lifespan)
 
-app.middleware("http")(session_key_middleware)
+app.add_middleware(SessionKeyMiddleware)
 
 # # Раскомментируйте, чтобы добавить API ключ для защиты
 # if settings.MODE == "PROD":
-#     app.middleware("http")(api_key_middleware)
+#     app.add_middleware(ApiKeyMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -51,6 +66,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 
@@ -62,6 +78,8 @@ def func():
 app.include_router(package_types.router)
 app.include_router(packages.router)
 app.include_router(analytics.router)
+app.include_router(pricing.router)
+app.include_router(metrics_api.router)
 
 
 if __name__ == "__main__":
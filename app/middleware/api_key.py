@@ -1,11 +1,26 @@
-from fastapi import Request
 from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+
 from app.config import settings
 
 
-async def api_key_middleware(request: Request, call_next):
-    api_key = request.headers.get("X-API-Key")
-    if api_key != settings.API_KEY:
-        return JSONResponse(status_code=401, content={"detail": "Invalid API key"})
-    response = await call_next(request)
-    return response
+class ApiKeyMiddleware:
+    """Проверка заголовка X-API-Key на чистом ASGI"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if Headers(scope=scope).get("x-api-key") != settings.API_KEY:
+            response = JSONResponse(
+                status_code=401, content={"detail": "Invalid API key"}
+            )
+            await response(scope, receive, send)
+            return
+
+        await self.app(scope, receive, send)
@@ -1,21 +1,54 @@
 import uuid
-from fastapi import Request
-
-
-async def session_key_middleware(request: Request, call_next):
-    if "session_id" not in request.cookies:
-        request.state.session_id = str(uuid.uuid4())
-    else:
-        request.state.session_id = request.cookies["session_id"]
-
-    response = await call_next(request)
-
-    if "session_id" not in request.cookies:
-        response.set_cookie(
-            key="session_id",
-            value=request.state.session_id,
-            max_age=60 * 60 * 24 * 365 * 10,
-            httponly=True,
-            samesite="lax",
-        )
-    return response
+
+from starlette.requests import cookie_parser
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+SESSION_COOKIE = "session_id"
+SESSION_MAX_AGE = 60 * 60 * 24 * 365 * 10
+
+
+def _session_from_headers(headers: list[tuple[bytes, bytes]]) -> str | None:
+    for name, value in headers:
+        if name == b"cookie":
+            return cookie_parser(value.decode("latin-1")).get(SESSION_COOKIE)
+    return None
+
+
+class SessionKeyMiddleware:
+    """
+    Сессионный ключ в куки на чистом ASGI: читает только заголовок cookie,
+    кладёт ключ в request.state.session_id и, если ключ новый, добавляет
+    Set-Cookie к началу ответа, не буферизуя тело.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        session_id = _session_from_headers(scope["headers"])
+        if session_id is not None:
+            scope.setdefault("state", {})["session_id"] = session_id
+            await self.app(scope, receive, send)
+            return
+
+        session_id = str(uuid.uuid4())
+        scope.setdefault("state", {})["session_id"] = session_id
+        cookie = (
+            f"{SESSION_COOKIE}={session_id}; HttpOnly; Max-Age={SESSION_MAX_AGE}; "
+            "Path=/; SameSite=lax"
+        ).encode("latin-1")
+
+        async def send_with_cookie(message: Message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"set-cookie", cookie),
+                ]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
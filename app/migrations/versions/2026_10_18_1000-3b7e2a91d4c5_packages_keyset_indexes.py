@@ -0,0 +1,41 @@
+"""packages keyset indexes
+
+Revision ID: 3b7e2a91d4c5
+Revises: c0f9119e209e
+Create Date: 2026-10-18 10:00:41.218337
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3b7e2a91d4c5"
+down_revision: Union[str, None] = "c0f9119e209e"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_packages_session_id_id", "packages", ["session_id", "id"], unique=False
+    )
+    op.create_index(
+        "ix_packages_session_id_type_id_id",
+        "packages",
+        ["session_id", "type_id", "id"],
+        unique=False,
+    )
+    op.drop_index(op.f("ix_packages_session_id"), table_name="packages")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(
+        op.f("ix_packages_session_id"), "packages", ["session_id"], unique=False
+    )
+    op.drop_index("ix_packages_session_id_type_id_id", table_name="packages")
+    op.drop_index("ix_packages_session_id_id", table_name="packages")
@@ -0,0 +1,33 @@
+"""packages delivery_cost index
+
+Revision ID: 7c4d2f9a1b36
+Revises: 3b7e2a91d4c5
+Create Date: 2026-10-18 13:00:12.503914
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "7c4d2f9a1b36"
+down_revision: Union[str, None] = "3b7e2a91d4c5"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_packages_delivery_cost_id",
+        "packages",
+        ["delivery_cost", "id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_packages_delivery_cost_id", table_name="packages")
@@ -3,7 +3,7 @@ from datetime import datetime
 from zoneinfo import ZoneInfo
 from typing import Optional
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, Integer, ForeignKey, DateTime, Numeric
+from sqlalchemy import String, Integer, ForeignKey, DateTime, Numeric, Index
 from decimal import Decimal
 
 from app.database import Base
@@ -15,6 +15,12 @@ class PackageORM(Base):
     """
 
     __tablename__ = "packages"
+    __table_args__ = (
+        Index("ix_packages_session_id_id", "session_id", "id"),
+        Index("ix_packages_session_id_type_id_id", "session_id", "type_id", "id"),
+        # Досчёт стоимостей читает только строки с delivery_cost IS NULL
+        Index("ix_packages_delivery_cost_id", "delivery_cost", "id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     name: Mapped[str] = mapped_column(String(255), nullable=False)
@@ -31,4 +37,4 @@ class PackageORM(Base):
         DateTime(timezone=True), default=lambda: datetime.now(ZoneInfo("Europe/Moscow"))
     )
 
-    session_id: Mapped[str] = mapped_column(String(255), index=True)
+    session_id: Mapped[str] = mapped_column(String(255))
@@ -0,0 +1,161 @@
+"""
+Расчёт стоимости доставки — единственное место, где задана формула:
+
+    стоимость, руб = (вес, кг * ставка ступени веса + стоимость, $ * value_rate)
+                     * коэффициент типа * курс USD→RUB
+
+с округлением до копеек. Ставки задаёт тариф (Tariff); тариф по умолчанию —
+0.5 $/кг и 1% стоимости для всех типов. Свой тариф подключается настройкой
+PRICING_TARIFF (JSON).
+
+Формула доступна для Python, для SQL (UPDATE в MySQL), для агрегаций Mongo
+и в векторном виде для NumPy (app/pricing_engine.py). Python, MySQL и NumPy
+считают точно и совпадают до копейки; Mongo считает в double и нужна только
+там, где документ ещё не содержит готовой delivery_cost_rub.
+"""
+
+from decimal import ROUND_HALF_UP, Decimal
+from functools import lru_cache
+
+from pydantic import BaseModel, Field, field_validator
+from sqlalchemy import case, func
+
+from app.config import settings
+
+
+KOPECK = Decimal("0.01")
+
+
+class WeightBracket(BaseModel):
+    # Верхняя граница веса ступени включительно; None — без ограничения
+    up_to_kg: Decimal | None = None
+    rate_usd: Decimal = Field(..., ge=0, description="Ставка, $ за килограмм")
+
+
+class Tariff(BaseModel):
+    value_rate: Decimal = Field(Decimal("0.01"), ge=0)
+    # Ступени по возрастанию up_to_kg; вес берётся по ставке своей ступени
+    weight_brackets: list[WeightBracket] = [WeightBracket(rate_usd=Decimal("0.5"))]
+    # Коэффициенты по type_id; для остальных типов — 1
+    type_coefficients: dict[int, Decimal] = {}
+
+    @field_validator("weight_brackets")
+    @classmethod
+    def check_brackets(cls, brackets: list[WeightBracket]) -> list[WeightBracket]:
+        if not brackets:
+            raise ValueError("Нужна хотя бы одна ступень веса")
+        bounds = [bracket.up_to_kg for bracket in brackets]
+        if None in bounds[:-1]:
+            raise ValueError("Ступень без верхней границы может быть только последней")
+        bounded = [bound for bound in bounds if bound is not None]
+        if bounded != sorted(bounded):
+            raise ValueError("Ступени веса должны идти по возрастанию")
+        return brackets
+
+    def weight_rate(self, weight_kg: Decimal) -> Decimal:
+        for bracket in self.weight_brackets:
+            if bracket.up_to_kg is None or weight_kg <= bracket.up_to_kg:
+                return bracket.rate_usd
+        return self.weight_brackets[-1].rate_usd
+
+    def coefficient(self, type_id: int | None) -> Decimal:
+        return self.type_coefficients.get(type_id, Decimal(1))
+
+
+@lru_cache
+def current_tariff() -> Tariff:
+    if settings.PRICING_TARIFF:
+        return Tariff.model_validate_json(settings.PRICING_TARIFF)
+    return Tariff()
+
+
+def delivery_cost_usd(
+    weight_kg, value_usd, type_id: int | None = None, tariff: Tariff | None = None
+) -> Decimal:
+    tariff = tariff or current_tariff()
+    weight_kg, value_usd = Decimal(str(weight_kg)), Decimal(str(value_usd))
+    cost = weight_kg * tariff.weight_rate(weight_kg) + value_usd * tariff.value_rate
+    coefficient = tariff.coefficient(type_id)
+    return cost if coefficient == 1 else cost * coefficient
+
+
+def delivery_cost_rub(
+    weight_kg,
+    value_usd,
+    usd_rub_rate,
+    type_id: int | None = None,
+    tariff: Tariff | None = None,
+) -> Decimal:
+    """Стоимость в рублях, округлённая как ROUND(x, 2) в MySQL"""
+    cost = delivery_cost_usd(weight_kg, value_usd, type_id, tariff)
+    cost *= Decimal(str(usd_rub_rate))
+    return cost.quantize(KOPECK, rounding=ROUND_HALF_UP)
+
+
+def delivery_cost_sql(
+    weight_kg, value_usd, usd_rub_rate, type_id=None, tariff: Tariff | None = None
+):
+    """SQL-выражение стоимости по колонкам (или выражениям) SQLAlchemy"""
+    tariff = tariff or current_tariff()
+    brackets = tariff.weight_brackets
+    weight_rate = brackets[-1].rate_usd
+    if len(brackets) > 1:
+        weight_rate = case(
+            *[
+                (weight_kg <= bracket.up_to_kg, bracket.rate_usd)
+                for bracket in brackets
+                if bracket.up_to_kg is not None
+            ],
+            else_=weight_rate,
+        )
+
+    cost = weight_kg * weight_rate + value_usd * tariff.value_rate
+    if tariff.type_coefficients and type_id is not None:
+        cost = cost * case(tariff.type_coefficients, value=type_id, else_=1)
+    return func.round(cost * usd_rub_rate, 2)
+
+
+def delivery_cost_mongo(
+    weight_kg="$weight_kg",
+    value_usd="$value_usd",
+    usd_rub_rate="$usd_rub_rate",
+    type_id="$type_id",
+    tariff: Tariff | None = None,
+) -> dict:
+    """Выражение агрегации Mongo для документа лога"""
+    tariff = tariff or current_tariff()
+    brackets = tariff.weight_brackets
+    weight_rate = float(brackets[-1].rate_usd)
+    if len(brackets) > 1:
+        weight_rate = {
+            "$switch": {
+                "branches": [
+                    {
+                        "case": {"$lte": [weight_kg, float(bracket.up_to_kg)]},
+                        "then": float(bracket.rate_usd),
+                    }
+                    for bracket in brackets
+                    if bracket.up_to_kg is not None
+                ],
+                "default": weight_rate,
+            }
+        }
+
+    cost = {
+        "$add": [
+            {"$multiply": [weight_kg, weight_rate]},
+            {"$multiply": [value_usd, float(tariff.value_rate)]},
+        ]
+    }
+    if tariff.type_coefficients:
+        coefficient = {
+            "$switch": {
+                "branches": [
+                    {"case": {"$eq": [type_id, key]}, "then": float(value)}
+                    for key, value in tariff.type_coefficients.items()
+                ],
+                "default": 1,
+            }
+        }
+        cost = {"$multiply": [cost, coefficient]}
+    return {"$round": [{"$multiply": [cost, usd_rub_rate]}, 2]}
@@ -0,0 +1,135 @@
+"""
+Векторный расчёт стоимости доставки на NumPy для пересчёта больших пачек.
+
+Все величины переводятся в целые числа фиксированной точности (граммы,
+центы, ставки и курс с 4 знаками), поэтому результат точный и совпадает
+с app.pricing.delivery_cost_rub до копейки, включая округление половины
+вверх. Значение, которое нельзя точно представить в этой точности, даёт
+ValueError — тогда пачку нужно считать через SQL (update_costs).
+"""
+
+from datetime import datetime
+from decimal import Decimal
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from app.pricing import Tariff, current_tariff
+
+
+WEIGHT_SCALE = 1_000  # граммы
+VALUE_SCALE = 100  # центы
+RATE_SCALE = 10_000  # ставки тарифа, коэффициенты и курс — до 4 знаков
+
+# Масштаб суммы веса и стоимости до коэффициента: 1e3 * 1e4 = 1e7
+_COST_SCALE = WEIGHT_SCALE * RATE_SCALE
+# Итог до округления — в масштабе 1e7 * 1e4 (коэффициент) * 1e4 (курс);
+# делитель переводит его в копейки
+_KOPECK_DIVISOR = _COST_SCALE * RATE_SCALE * RATE_SCALE // 100
+_SPLIT = 10**9
+_INT64_SAFE = 2**62
+
+MOSCOW_TZ = ZoneInfo("Europe/Moscow")
+EPOCH = datetime(1970, 1, 1)
+
+
+def to_scaled(value, scale: int) -> int:
+    scaled = Decimal(str(value)) * scale
+    if scaled != scaled.to_integral_value():
+        raise ValueError(f"{value} не представимо с точностью 1/{scale}")
+    return int(scaled)
+
+
+def microseconds_since_epoch(moment: datetime) -> int:
+    """Время по Москве без зоны (как в MySQL) в микросекундах от 1970-01-01"""
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(MOSCOW_TZ).replace(tzinfo=None)
+    delta = moment - EPOCH
+    return (delta.days * 86_400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+class PricingEngine:
+    def __init__(self, tariff: Tariff | None = None):
+        tariff = tariff or current_tariff()
+        brackets = tariff.weight_brackets
+        bounded = [bracket for bracket in brackets if bracket.up_to_kg is not None]
+        self._bounds = np.array(
+            [to_scaled(bracket.up_to_kg, WEIGHT_SCALE) for bracket in bounded],
+            dtype=np.int64,
+        )
+        # Ставка за пределами всех границ — последней ступени, как в Tariff
+        self._weight_rates = np.array(
+            [to_scaled(bracket.rate_usd, RATE_SCALE) for bracket in bounded]
+            + [to_scaled(brackets[-1].rate_usd, RATE_SCALE)],
+            dtype=np.int64,
+        )
+        self._value_rate = to_scaled(tariff.value_rate, RATE_SCALE)
+
+        type_ids = sorted(tariff.type_coefficients)
+        self._type_ids = np.array(type_ids, dtype=np.int64)
+        self._coefficients = np.array(
+            [to_scaled(tariff.type_coefficients[key], RATE_SCALE) for key in type_ids],
+            dtype=np.int64,
+        )
+
+    def _coefficients_for(self, type_ids: np.ndarray) -> np.ndarray:
+        result = np.full(type_ids.shape, RATE_SCALE, dtype=np.int64)
+        if not len(self._type_ids):
+            return result
+        index = np.searchsorted(self._type_ids, type_ids)
+        index = np.minimum(index, len(self._type_ids) - 1)
+        known = self._type_ids[index] == type_ids
+        result[known] = self._coefficients[index[known]]
+        return result
+
+    def costs_kopecks(
+        self,
+        weight_g: np.ndarray,
+        value_cents: np.ndarray,
+        type_ids: np.ndarray,
+        rates: np.ndarray,
+    ) -> np.ndarray:
+        """
+        Стоимости в копейках. weight_g — вес в граммах, value_cents — стоимость
+        в центах, rates — курс каждой строки в масштабе RATE_SCALE (int64).
+        """
+        weight_rates = self._weight_rates[np.searchsorted(self._bounds, weight_g)]
+        cost = weight_g * weight_rates + value_cents * (self._value_rate * 10)
+        coefficients = self._coefficients_for(type_ids)
+        if len(cost) and int(cost.max()) > _INT64_SAFE // int(coefficients.max()):
+            raise ValueError("Стоимость вне диапазона int64")
+        scaled = cost * coefficients
+
+        # scaled * rate может не поместиться в int64, поэтому умножаем по частям:
+        # scaled = high * 1e9 + low, деление на 1e13 с округлением половины вверх
+        high, low = np.divmod(scaled, _SPLIT)
+        if len(rates) and int(high.max()) > _INT64_SAFE // int(rates.max()):
+            raise ValueError("Стоимость вне диапазона int64")
+        high_whole, high_rest = np.divmod(high * rates, _KOPECK_DIVISOR // _SPLIT)
+        rest = high_rest * _SPLIT + low * rates + _KOPECK_DIVISOR // 2
+        return high_whole + rest // _KOPECK_DIVISOR
+
+    def rates_for(
+        self, times_us: np.ndarray, rate_series: list[tuple[datetime, Decimal]]
+    ) -> np.ndarray:
+        """
+        Курс на момент создания каждой строки по истории [(действует_с, курс)],
+        как PackageRepository._rate_expr: до первой смены действует первый курс.
+        times_us — наивное московское время в микросекундах от эпохи.
+        """
+        starts = np.array(
+            [microseconds_since_epoch(start) for start, _ in rate_series],
+            dtype=np.int64,
+        )
+        values = np.array(
+            [to_scaled(rate, RATE_SCALE) for _, rate in rate_series], dtype=np.int64
+        )
+        index = np.searchsorted(starts, times_us, side="right") - 1
+        return values[np.maximum(index, 0)]
+
+
+pricing_engine = PricingEngine()
+
+
+def kopecks_to_decimal(kopecks: np.ndarray) -> list[Decimal]:
+    return [Decimal(int(value)).scaleb(-2) for value in kopecks]
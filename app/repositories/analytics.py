@@ -1,48 +1,140 @@
 from datetime import datetime, date
-from typing import Optional, List, Dict, Any
+from typing import Any, AsyncIterator, Dict, List, Optional
+from bson import ObjectId
+from bson.errors import InvalidId
 from pymongo import ASCENDING, DESCENDING
 
-from app.exceptions import InvalidDateRangeError, TypeIdNotFoundError
+from app.exceptions import (
+    InvalidCursorError,
+    InvalidDateRangeError,
+    InvalidSortFieldError,
+    TypeIdNotFoundError,
+)
+from app.utils.delivery_logs_storage import LOGS_COLLECTION, TYPE_FIELD, from_storage
+from app.utils.metrics import metrics
+
+
+# Поля, по которым разрешена сортировка логов; для каждого есть индекс
+# (поле, _id) — см. ensure_mongo_indexes
+LOG_SORT_FIELDS = ("created_at", "package_id")
+# Документов лога в одной пачке курсора при выгрузке
+EXPORT_BATCH_SIZE = 2000
 
 
 class AnalyticsRepository:
     def __init__(self, db):
-        self.collection = db.delivery_logs
+        self.collection = db[LOGS_COLLECTION]
+        self.daily_rollups = db.delivery_daily_rollups
+        self.hourly_rollups = db.delivery_hourly_rollups
 
-    async def get_all(
-        self,
-        skip: int,
-        limit: int,
+    @staticmethod
+    def build_logs_filter(
         type_id: Optional[int],
         date_from: Optional[datetime],
         date_to: Optional[datetime],
-        sort_field: str,
-        sort_order: str,
-    ):
-        query = {}
+    ) -> dict[str, Any]:
+        """Фильтр логов, общий для постраничного списка и выгрузки"""
+        query: dict[str, Any] = {}
         if type_id is not None:
-            query["type_id"] = type_id
+            query[TYPE_FIELD] = type_id
         if date_from or date_to:
             query["created_at"] = {}
             if date_from:
                 query["created_at"]["$gte"] = date_from
             if date_to:
                 query["created_at"]["$lte"] = date_to
+        return query
+
+    @staticmethod
+    def _seek_filter(
+        sort_field: str, sort_direction: int, after: tuple[Any, str]
+    ) -> dict[str, Any]:
+        """Записи строго после (значение, _id) в порядке сортировки"""
+        value, last_id = after
+        try:
+            if sort_field == "created_at" and isinstance(value, str):
+                value = datetime.fromisoformat(value)
+            last_id = ObjectId(last_id)
+        except (InvalidId, TypeError, ValueError):
+            raise InvalidCursorError
+        op = "$gt" if sort_direction == ASCENDING else "$lt"
+        return {
+            "$or": [
+                {sort_field: {op: value}},
+                {sort_field: value, "_id": {op: last_id}},
+            ]
+        }
+
+    @metrics.timed("mongo_query_duration_seconds")
+    async def get_all(
+        self,
+        skip: int,
+        limit: int,
+        type_id: Optional[int],
+        date_from: Optional[datetime],
+        date_to: Optional[datetime],
+        sort_field: str,
+        sort_order: str,
+        after: Optional[tuple[Any, str]] = None,
+    ):
+        """
+        Страница логов. after — (значение sort_field, id) последней записи
+        предыдущей страницы: тогда поиск идёт по индексу (sort_field, _id)
+        и skip игнорируется, так что дальние страницы не дороже первой.
+        """
+        if sort_field not in LOG_SORT_FIELDS:
+            raise InvalidSortFieldError
 
+        query = self.build_logs_filter(type_id, date_from, date_to)
         sort_direction = DESCENDING if sort_order == "desc" else ASCENDING
+        if after is not None:
+            seek = self._seek_filter(sort_field, sort_direction, after)
+            query = {"$and": [query, seek]}
+            skip = 0
+
         cursor = self.collection.find(
-            query, skip=skip, limit=limit, sort=[(sort_field, sort_direction)]
+            query,
+            skip=skip,
+            limit=limit,
+            sort=[(sort_field, sort_direction), ("_id", sort_direction)],
         )
 
         results = []
         async for doc in cursor:
             doc["id"] = str(doc.pop("_id"))
-            results.append(doc)
+            results.append(from_storage(doc))
         return results
 
+    async def iter_logs(
+        self,
+        type_id: Optional[int],
+        date_from: Optional[datetime],
+        date_to: Optional[datetime],
+        sort_order: str = "asc",
+        batch_size: int = EXPORT_BATCH_SIZE,
+    ) -> AsyncIterator[dict]:
+        """
+        Логи по тем же фильтрам, что и get_all, без ограничения количества.
+        Курсор читает пачками по batch_size, в памяти держится одна пачка.
+        """
+        sort_direction = DESCENDING if sort_order == "desc" else ASCENDING
+        cursor = self.collection.find(
+            self.build_logs_filter(type_id, date_from, date_to),
+            sort=[("created_at", sort_direction), ("_id", sort_direction)],
+            batch_size=batch_size,
+        )
+        async for doc in cursor:
+            doc["id"] = str(doc.pop("_id"))
+            yield from_storage(doc)
+
+    @metrics.timed("mongo_query_duration_seconds")
     async def get_totals_range(
         self, start_date: date, end_date: date, type_id: Optional[int]
     ):
+        """
+        Суммы по типам за диапазон дней. Читаются предагрегированные суммы
+        по (day_key, type_id), а не сырые логи.
+        """
         if start_date > end_date:
             raise InvalidDateRangeError
 
@@ -57,64 +149,67 @@ class AnalyticsRepository:
             {
                 "$group": {
                     "_id": "$type_id",
-                    "total_delivery_cost": {
-                        "$sum": {
-                            "$multiply": [
-                                {
-                                    "$add": [
-                                        {"$multiply": ["$weight_kg", 0.5]},
-                                        {"$multiply": ["$value_usd", 0.01]},
-                                    ]
-                                },
-                                "$usd_rub_rate",
-                            ]
-                        }
-                    },
-                    "count_packages": {"$sum": 1},
+                    "total_delivery_cost": {"$sum": "$total_delivery_cost"},
+                    "count_packages": {"$sum": "$count_packages"},
                 }
             },
             {"$sort": {"_id": 1}},
         ]
 
-        results = await self.collection.aggregate(pipeline).to_list(None)
+        results = await self.daily_rollups.aggregate(pipeline).to_list(None)
 
         if type_id is not None and not results:
             raise TypeIdNotFoundError
 
         return results
 
+    @metrics.timed("mongo_query_duration_seconds")
     async def get_daily_totals(self, day: str) -> List[Dict[str, Any]]:
         """
         Получить суммы стоимости доставки и количество посылок за указанный day_key.
         :param day: строка в формате YYYY-MM-DD
         """
-        pipeline = [
-            {"$match": {"day_key": day}},
+        cursor = self.daily_rollups.find(
+            {"day_key": day}, sort=[("type_id", ASCENDING)]
+        )
+        return [
             {
-                "$group": {
-                    "_id": "$type_id",
-                    "total_delivery_cost": {
-                        "$sum": {
-                            "$multiply": [
-                                {
-                                    "$add": [
-                                        {"$multiply": ["$weight_kg", 0.5]},
-                                        {"$multiply": ["$value_usd", 0.01]},
-                                    ]
-                                },
-                                "$usd_rub_rate",
-                            ]
-                        }
-                    },
-                    "count_packages": {"$sum": 1},
-                }
-            },
+                "_id": doc["type_id"],
+                "total_delivery_cost": round(doc["total_delivery_cost"], 2),
+                "count_packages": doc["count_packages"],
+            }
+            async for doc in cursor
+        ]
+
+    @metrics.timed("mongo_query_duration_seconds")
+    async def get_hourly_totals(
+        self, start_date: date, end_date: date, type_id: Optional[int]
+    ) -> List[Dict[str, Any]]:
+        """
+        Суммы по часам за диапазон дней из предагрегированных корзин
+        (day_key, hour, type_id).
+        """
+        if start_date > end_date:
+            raise InvalidDateRangeError
+
+        query: dict[str, Any] = {
+            "day_key": {"$gte": str(start_date), "$lte": str(end_date)}
+        }
+        if type_id is not None:
+            query["type_id"] = type_id
+
+        cursor = self.hourly_rollups.find(
+            query,
+            projection={"_id": 0},
+            sort=[("day_key", ASCENDING), ("hour", ASCENDING), ("type_id", ASCENDING)],
+        )
+        return [
             {
-                "$project": {
-                    "total_delivery_cost": {"$round": ["$total_delivery_cost", 2]},
-                    "count_packages": 1,
-                }
-            },
-            {"$sort": {"_id": 1}},
+                "day_key": doc["day_key"],
+                "hour": doc["hour"],
+                "type_id": doc["type_id"],
+                "total_delivery_cost_rub": round(doc["total_delivery_cost"], 2),
+                "count_packages": doc["count_packages"],
+            }
+            async for doc in cursor
         ]
-        return await self.collection.aggregate(pipeline).to_list(None)
@@ -8,6 +8,7 @@ from app.exceptions import (
     DataBaseIntegrityException,
     ObjectAlreadyExistException,
 )
+from app.utils.metrics import metrics
 
 
 class BaseRepository:
@@ -34,6 +35,7 @@ class BaseRepository:
             raise ObjectNotFoundException
         return self.schema.model_validate(model)
 
+    @metrics.timed("db_query_duration_seconds")
     async def add(self, data: BaseModel):
         add_stmt = insert(self.model).values(**data.model_dump())
         try:
@@ -55,6 +57,48 @@ class BaseRepository:
         inserted_id = result.lastrowid
         return {"id": inserted_id}
 
+    @metrics.timed("db_query_duration_seconds")
+    async def add_bulk(
+        self, data: list[BaseModel], chunk_size: int = 1000, **filter_by
+    ):
+        """
+        Многострочный INSERT. Возвращает id в порядке входных данных.
+
+        Автоинкременты одного INSERT не обязаны идти подряд
+        (innodb_autoinc_lock_mode=2, auto_increment_increment > 1), поэтому
+        id вставленных строк перечитываются в той же транзакции: начиная
+        с lastrowid первой строки, среди строк с filter_by, — чужие
+        незакоммиченные строки в выборку не попадают.
+        """
+        ids: list[int] = []
+        for start in range(0, len(data), chunk_size):
+            chunk = data[start : start + chunk_size]
+            add_stmt = insert(self.model).values([item.model_dump() for item in chunk])
+            try:
+                result = await self.session.execute(add_stmt)
+            except IntegrityError as ex:
+                logging.error(
+                    f"Ошибка пакетного добавления в БД ({len(chunk)} строк). Ошибка: {ex}"
+                )
+                raise DataBaseIntegrityException from ex
+
+            query = (
+                select(self.model.id)
+                .filter_by(**filter_by)
+                .filter(self.model.id >= result.lastrowid)
+                .order_by(self.model.id)
+                .limit(len(chunk))
+            )
+            inserted = (await self.session.execute(query)).scalars().all()
+            if len(inserted) != len(chunk):
+                logging.error(
+                    f"После пакетного добавления найдено {len(inserted)} id "
+                    f"из {len(chunk)}, lastrowid={result.lastrowid}"
+                )
+                raise DataBaseIntegrityException
+            ids.extend(inserted)
+        return ids
+
     async def delete(self, **filter_by):
         await self.get_one(**filter_by)
         stmt = delete(self.model).filter_by(**filter_by)
@@ -1,42 +1,58 @@
+from datetime import datetime
 from decimal import Decimal
+from zoneinfo import ZoneInfo
 
 from app.exceptions import ObjectNotFoundException
 from app.models.package import PackageORM
-from app.models.package_type import PackageTypeORM
-from app.schemas.packages import PackageBrief, PackageRead
-from sqlalchemy import func, select, update
+from app.pricing import delivery_cost_sql
+from app.pricing_engine import VALUE_SCALE, WEIGHT_SCALE
+from app.schemas.packages import PackageRead, package_briefs_adapter
+from sqlalchemy import Integer, case, cast, func, literal_column, select, update
 from sqlalchemy.exc import NoResultFound
 from sqlalchemy.orm import joinedload
 
 from app.repositories.base import BaseRepository
+from app.utils.metrics import metrics
+from app.utils.package_type_cache import package_type_cache
+
+
+MOSCOW_TZ = ZoneInfo("Europe/Moscow")
 
 
 class PackageRepository(BaseRepository):
     model = PackageORM
     schema = PackageRead
 
+    @metrics.timed("db_query_duration_seconds")
     async def get_filtered_by_type(
         self,
         session_id: str,
         limit: int,
-        offset: int,
+        offset: int = 0,
         type_filter: str | None = None,
         has_delivery_cost: bool | None = None,
+        after_id: int | None = None,
     ):
-        query = (
-            select(self.model)
-            .options(joinedload(self.model.type))
-            .filter(self.model.session_id == session_id)
-        )
+        # Только столбцы PackageBrief, без сущностей ORM в сессии
+        query = select(
+            self.model.id,
+            self.model.name,
+            self.model.type_id,
+            self.model.weight_kg,
+            self.model.delivery_cost,
+        ).filter(self.model.session_id == session_id)
 
-        # Фильтр по типу (id или name)
+        # Фильтр по типу (id или name); названия ищутся в кэше типов, без JOIN
         if type_filter:
             if type_filter.isdigit():
                 query = query.filter(self.model.type_id == int(type_filter))
             else:
-                query = query.join(self.model.type).filter(
-                    func.lower(PackageTypeORM.name).like(f"%{type_filter.lower()}%")
+                type_ids = await package_type_cache.find_ids_by_name(
+                    self.session, type_filter
                 )
+                if not type_ids:
+                    return []
+                query = query.filter(self.model.type_id.in_(type_ids))
 
         # Фильтр по delivery_cost
         if has_delivery_cost:
@@ -44,18 +60,37 @@ class PackageRepository(BaseRepository):
         elif has_delivery_cost is False:
             query = query.filter(self.model.delivery_cost.is_(None))
 
-        query = query.limit(limit).offset(offset)
+        # Keyset-пагинация: поиск по индексу (session_id[, type_id], id)
+        # вместо пропуска offset строк
+        if after_id is not None:
+            query = query.filter(self.model.id > after_id)
+        else:
+            query = query.offset(offset)
+
+        query = query.order_by(self.model.id).limit(limit)
 
         result = await self.session.execute(query)
 
-        packages = result.scalars().all()
+        rows = result.all()
 
-        for p in packages:
-            if p.delivery_cost is None:
-                p.delivery_cost = "Не рассчитано"
+        types = await package_type_cache.get_many(
+            self.session, {row.type_id for row in rows}
+        )
 
-        return [PackageBrief.model_validate(package) for package in packages]
+        return package_briefs_adapter.validate_python(
+            [
+                {
+                    "id": row.id,
+                    "name": row.name,
+                    "type": types[row.type_id],
+                    "weight_kg": row.weight_kg,
+                    "delivery_cost": row.delivery_cost,
+                }
+                for row in rows
+            ]
+        )
 
+    @metrics.timed("db_query_duration_seconds")
     async def get_one(self, **filter_by):
         query = (
             select(self.model)
@@ -68,27 +103,174 @@ class PackageRepository(BaseRepository):
         except NoResultFound:
             raise ObjectNotFoundException
 
-        if model.delivery_cost is None:
-            model.delivery_cost = "Не рассчитано"
-
         return self.schema.model_validate(model)
 
-    async def update_costs(self, usd_rub_rate: Decimal):
-        cost_expr = func.round(
-            (
-                self.model.weight_kg * Decimal("0.5")
-                + self.model.value_usd * Decimal("0.01")
-            )
-            * usd_rub_rate,
-            2,
+    @metrics.timed("db_query_duration_seconds")
+    async def get_pending_cost_ids(self, limit: int) -> list[int]:
+        """
+        id посылок без стоимости по возрастанию — чтение диапазона индекса
+        (delivery_cost, id), а не всей таблицы
+        """
+        query = (
+            select(self.model.id)
+            .filter(self.model.delivery_cost.is_(None))
+            .order_by(self.model.id)
+            .limit(limit)
         )
+        result = await self.session.execute(query)
+        return list(result.scalars().all())
+
+    @metrics.timed("db_query_duration_seconds")
+    async def get_max_id(self) -> int | None:
+        result = await self.session.execute(select(func.max(self.model.id)))
+        return result.scalar_one()
 
+    @metrics.timed("db_query_duration_seconds")
+    async def get_ids_before(
+        self, before_id: int, limit: int
+    ) -> list[tuple[int, datetime]]:
+        """
+        (id, created_at) посылок с id меньше before_id по убыванию id —
+        чтение первичного ключа от новых посылок к старым
+        """
         query = (
-            update(self.model)
-            .filter(self.model.delivery_cost.is_(None))
-            .values(delivery_cost=cost_expr)
+            select(self.model.id, self.model.created_at)
+            .filter(self.model.id < before_id)
+            .order_by(self.model.id.desc())
+            .limit(limit)
+        )
+        result = await self.session.execute(query)
+        return [
+            (package_id, created_at.replace(tzinfo=MOSCOW_TZ))
+            for package_id, created_at in result.all()
+        ]
+
+    @metrics.timed("db_query_duration_seconds")
+    async def get_pending_created_range(
+        self, id_from: int, id_to: int
+    ) -> tuple[datetime | None, datetime | None]:
+        """Время создания первой и последней посылки без стоимости в диапазоне id"""
+        query = select(
+            func.min(self.model.created_at), func.max(self.model.created_at)
+        ).filter(
+            self.model.delivery_cost.is_(None),
+            self.model.id.between(id_from, id_to),
+        )
+        result = await self.session.execute(query)
+        start, end = result.one()
+        if start is None:
+            return None, None
+        # MySQL хранит московское время без зоны
+        return start.replace(tzinfo=MOSCOW_TZ), end.replace(tzinfo=MOSCOW_TZ)
+
+    def _rate_expr(self, usd_rub_rate: Decimal | list[tuple[datetime, Decimal]]):
+        """
+        Курс для строки: константа или CASE по created_at из истории курсов,
+        где каждый курс действует с указанного момента до следующего.
+        """
+        if isinstance(usd_rub_rate, Decimal):
+            return usd_rub_rate
+        (_, first_rate), *changes = usd_rub_rate
+        if not changes:
+            return first_rate
+        return case(
+            *[
+                (
+                    self.model.created_at
+                    >= valid_from.astimezone(MOSCOW_TZ).replace(tzinfo=None),
+                    rate,
+                )
+                for valid_from, rate in reversed(changes)
+            ],
+            else_=first_rate,
+        )
+
+    @metrics.timed("db_query_duration_seconds")
+    async def update_costs(
+        self,
+        usd_rub_rate: Decimal | list[tuple[datetime, Decimal]],
+        id_from: int | None = None,
+        id_to: int | None = None,
+        only_missing: bool = True,
+        created_since: datetime | None = None,
+    ):
+        """
+        Заполняет пустые стоимости доставки. usd_rub_rate — один курс или
+        история курсов [(действует_с, курс), ...] по возрастанию времени:
+        тогда каждая посылка считается по курсу на момент её создания.
+        only_missing=False пересчитывает и уже заполненные стоимости,
+        created_since ограничивает посылки созданными не раньше этого момента.
+        """
+        cost_expr = delivery_cost_sql(
+            self.model.weight_kg,
+            self.model.value_usd,
+            self._rate_expr(usd_rub_rate),
+            self.model.type_id,
         )
 
+        query = update(self.model).values(delivery_cost=cost_expr)
+        if only_missing:
+            query = query.filter(self.model.delivery_cost.is_(None))
+        if created_since is not None:
+            query = query.filter(
+                self.model.created_at
+                >= created_since.astimezone(MOSCOW_TZ).replace(tzinfo=None)
+            )
+        if id_from is not None:
+            query = query.filter(self.model.id >= id_from)
+        if id_to is not None:
+            query = query.filter(self.model.id <= id_to)
+
         result = await self.session.execute(query)
 
         return result.rowcount
+
+    @metrics.timed("db_query_duration_seconds")
+    async def get_pending_for_pricing(self, id_from: int, id_to: int) -> list[tuple]:
+        """
+        Посылки без стоимости в диапазоне id для PricingEngine:
+        (id, вес в граммах, стоимость в центах, type_id, created_at в мкс).
+        """
+        query = (
+            select(
+                self.model.id,
+                cast(self.model.weight_kg * WEIGHT_SCALE, Integer),
+                cast(self.model.value_usd * VALUE_SCALE, Integer),
+                self.model.type_id,
+                func.timestampdiff(
+                    literal_column("MICROSECOND"),
+                    literal_column("'1970-01-01'"),
+                    self.model.created_at,
+                ),
+            )
+            .filter(
+                self.model.delivery_cost.is_(None),
+                self.model.id.between(id_from, id_to),
+            )
+            .order_by(self.model.id)
+        )
+        result = await self.session.execute(query)
+        return result.all()
+
+    @metrics.timed("db_query_duration_seconds")
+    async def set_costs(
+        self, ids: list[int], costs: list[Decimal], batch_size: int = 1000
+    ) -> int:
+        """Записывает готовые стоимости: один UPDATE с CASE id на batch_size строк"""
+        updated = 0
+        for start in range(0, len(ids), batch_size):
+            batch = dict(
+                zip(ids[start : start + batch_size], costs[start : start + batch_size])
+            )
+            query = (
+                update(self.model)
+                .filter(
+                    self.model.id.in_(batch),
+                    self.model.delivery_cost.is_(None),
+                )
+                .values(delivery_cost=case(batch, value=self.model.id))
+                .execution_options(synchronize_session=False)
+            )
+            result = await self.session.execute(query)
+            updated += result.rowcount
+        return updated
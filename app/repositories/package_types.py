@@ -1,3 +1,5 @@
+from sqlalchemy import select
+
 from app.models.package_type import PackageTypeORM
 from app.schemas.package_types import PackageTypeRead
 from app.repositories.base import BaseRepository
@@ -6,3 +8,11 @@ from app.repositories.base import BaseRepository
 class PackageTypeRepository(BaseRepository):
     model = PackageTypeORM
     schema = PackageTypeRead
+
+    async def get_existing_ids(self, ids: set[int]) -> set[int]:
+        """Возвращает те из переданных id, которые есть в таблице"""
+        if not ids:
+            return set()
+        query = select(self.model.id).filter(self.model.id.in_(ids))
+        result = await self.session.execute(query)
+        return set(result.scalars().all())
@@ -1,7 +1,14 @@
 from datetime import datetime
 from decimal import ROUND_HALF_UP, Decimal
 from typing import Annotated, Union
-from pydantic import BaseModel, ConfigDict, Field, field_validator
+from pydantic import (
+    BaseModel,
+    BeforeValidator,
+    ConfigDict,
+    Field,
+    PlainSerializer,
+    TypeAdapter,
+)
 from app.schemas.package_types import PackageTypeBase, PackageTypeRead
 
 
@@ -19,38 +26,63 @@ DecimalField = Annotated[
 ]
 
 
+def round_weight(v):
+    if v is None:
+        return v
+    if not isinstance(v, Decimal):
+        v = Decimal(str(v))
+    return v.quantize(Decimal("0.001"), rounding=ROUND_HALF_UP)
+
+
+WeightKg = Annotated[
+    Decimal,
+    BeforeValidator(round_weight),
+    Field(
+        ...,
+        gt=0,
+        max_digits=6,
+        decimal_places=3,
+        json_schema_extra={"example": "1.555"},
+    ),
+]
+
+ValueUsd = Annotated[
+    Decimal,
+    Field(
+        ...,
+        gt=0,
+        max_digits=10,
+        decimal_places=2,
+        json_schema_extra={"example": "15.55"},
+    ),
+]
+
+NOT_CALCULATED = "Не рассчитано"
+
+# Пустая стоимость хранится как None и заменяется текстом только в ответе
+DeliveryCost = Annotated[
+    Decimal | None,
+    PlainSerializer(
+        lambda v: v if v is not None else NOT_CALCULATED,
+        return_type=Union[Decimal, str],
+    ),
+    Field(
+        ...,
+        examples=["150.50", NOT_CALCULATED],
+        json_schema_extra={
+            "oneOf": [
+                {"type": "string", "format": "decimal", "example": "150.50"},
+                {"type": "string", "example": NOT_CALCULATED},
+            ]
+        },
+    ),
+]
+
+
 class PackageBase(BaseModel):
     name: str = Field(..., max_length=40)
-
-    weight_kg: Annotated[
-        Decimal,
-        Field(
-            ...,
-            gt=0,
-            max_digits=6,
-            decimal_places=3,
-            json_schema_extra={"example": "1.555"},
-        ),
-    ]
-
-    value_usd: Annotated[
-        Decimal,
-        Field(
-            ...,
-            gt=0,
-            max_digits=10,
-            decimal_places=2,
-            json_schema_extra={"example": "15.55"},
-        ),
-    ]
-
-    @field_validator("weight_kg", mode="before")
-    def round_weight(cls, v):
-        if v is None:
-            return v
-        if not isinstance(v, Decimal):
-            v = Decimal(str(v))
-        return v.quantize(Decimal("0.001"), rounding=ROUND_HALF_UP)
+    weight_kg: WeightKg
+    value_usd: ValueUsd
 
 
 class PackageCreate(PackageBase):
@@ -59,21 +91,14 @@ class PackageCreate(PackageBase):
 
 class PackageAddData(PackageCreate):
     session_id: str
+    # Считается при создании, если курс известен; иначе — задачей set_delivery_costs
+    delivery_cost: Decimal | None = None
 
 
 class PackageRead(PackageBase):
     id: int
     type: PackageTypeRead
-    delivery_cost: Union[Decimal, str] = Field(
-        ...,
-        examples=["150.50", "Не рассчитано"],
-        json_schema_extra={
-            "oneOf": [
-                {"type": "string", "format": "decimal", "example": "150.50"},
-                {"type": "string", "example": "Не рассчитано"},
-            ]
-        },
-    )
+    delivery_cost: DeliveryCost
     created_at: datetime
 
     model_config = ConfigDict(from_attributes=True)
@@ -84,15 +109,10 @@ class PackageBrief(BaseModel):
     name: str
     type: PackageTypeBase
     weight_kg: Decimal = Field(..., json_schema_extra={"example": "1.500"})
-    delivery_cost: Union[Decimal, str] = Field(
-        ...,
-        examples=["150.50", "Не рассчитано"],
-        json_schema_extra={
-            "oneOf": [
-                {"type": "string", "format": "decimal", "example": "150.50"},
-                {"type": "string", "example": "Не рассчитано"},
-            ]
-        },
-    )
+    delivery_cost: DeliveryCost
 
     model_config = ConfigDict(from_attributes=True)
+
+
+# Проверка всей страницы списка одним вызовом вместо PackageBrief(...) на строку
+package_briefs_adapter = TypeAdapter(list[PackageBrief])
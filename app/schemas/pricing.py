@@ -0,0 +1,40 @@
+from datetime import datetime
+from decimal import Decimal
+from typing import Literal
+
+from pydantic import BaseModel, Field
+
+from app.schemas.packages import ValueUsd, WeightKg
+
+
+class QuoteItem(BaseModel):
+    weight_kg: WeightKg
+    value_usd: ValueUsd
+    type_id: int
+
+
+class QuoteResponse(BaseModel):
+    usd_rub_rate: Decimal
+    costs: list[Decimal] = Field(..., json_schema_extra={"example": ["150.50"]})
+
+
+class RepriceProgress(BaseModel):
+    status: Literal["idle", "pending", "running", "done"]
+    job_id: str | None = None
+    usd_rub_rate: Decimal | None = None
+    since: datetime | None = None
+    reached_at: datetime | None = None
+    updated: int = 0
+    percent: float | None = None
+    started_at: datetime | None = None
+    updated_at: datetime | None = None
+    finished_at: datetime | None = None
+
+
+class DeliveryCostsProgress(BaseModel):
+    status: Literal["idle", "running", "done", "failed"]
+    total_chunks: int = 0
+    done_chunks: int = 0
+    updated: int = 0
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
@@ -1,5 +1,17 @@
+from typing import Any
+
 from pydantic import BaseModel
 
 
 class AddResponse(BaseModel):
     id: int
+
+
+class BulkItemError(BaseModel):
+    index: int
+    errors: list[dict[str, Any]]
+
+
+class BulkAddResponse(BaseModel):
+    ids: list[int]
+    errors: list[BulkItemError]
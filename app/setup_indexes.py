@@ -1,9 +1,198 @@
+"""
+Реестр индексов Mongo: каждый запрос к коллекциям должен идти по одному из
+них (проверяется explain-тестами в tests/integration_test/analytics/test_db.py).
+
+Индексы создаются при старте API. Проверка и приведение к реестру:
+    python -m app.setup_indexes            # показать расхождения
+    python -m app.setup_indexes --apply    # создать недостающие
+    python -m app.setup_indexes --apply --drop-extra
+"""
+
+import argparse
+import logging
+from dataclasses import dataclass, field
+
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import OperationFailure
+
+from app.config import settings
+from app.repositories.analytics import LOG_SORT_FIELDS
+from app.utils.delivery_logs_storage import (
+    LOGS_COLLECTION,
+    TIMESERIES,
+    TYPE_FIELD,
+    timeseries_create_options,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    collection: str
+    keys: list[tuple[str, int]]
+    name: str
+    unique: bool = False
+    expire_after_seconds: int | None = None
+    # Какие запросы обслуживает индекс — для людей, читающих реестр
+    used_by: tuple[str, ...] = field(default=(), compare=False)
+
+    @property
+    def options(self) -> dict:
+        options: dict = {"name": self.name}
+        if self.unique:
+            options["unique"] = True
+        if self.expire_after_seconds is not None:
+            options["expireAfterSeconds"] = self.expire_after_seconds
+        return options
+
+    def matches(self, info: dict) -> bool:
+        """Совпадает ли индекс из index_information() с описанием"""
+        return (
+            [(key, int(direction)) for key, direction in info["key"]] == list(self.keys)
+            and bool(info.get("unique")) == self.unique
+            and info.get("expireAfterSeconds") == self.expire_after_seconds
+        )
+
+
+def index_registry() -> list[IndexSpec]:
+    registry = [
+        *(
+            IndexSpec(
+                LOGS_COLLECTION,
+                [(sort_field, 1), ("_id", 1)],
+                f"idx_{sort_field}_id",
+                used_by=("AnalyticsRepository.get_all", "iter_logs"),
+            )
+            for sort_field in LOG_SORT_FIELDS
+        ),
+        IndexSpec(
+            LOGS_COLLECTION,
+            [(TYPE_FIELD, 1), ("created_at", 1), ("_id", 1)],
+            "idx_type_created_at_id",
+            used_by=("AnalyticsRepository.get_all(type_id)", "iter_logs(type_id)"),
+        ),
+        IndexSpec(
+            "delivery_daily_rollups",
+            [("day_key", 1), ("type_id", 1)],
+            "idx_day_type",
+            unique=True,
+            used_by=("get_totals_range", "get_daily_totals", "increment_rollups"),
+        ),
+        IndexSpec(
+            "delivery_hourly_rollups",
+            [("day_key", 1), ("hour", 1), ("type_id", 1)],
+            "idx_day_hour_type",
+            unique=True,
+            used_by=("get_hourly_totals", "increment_rollups"),
+        ),
+        IndexSpec(
+            "usd_rate_history",
+            [("created_at", -1)],
+            "idx_created_at_desc",
+            used_by=("get_last_saved_rate", "get_rate_series"),
+        ),
+    ]
+
+    if not TIMESERIES:
+        # В time-series коллекции сборка агрегатов идёт по created_at
+        registry.append(
+            IndexSpec(
+                LOGS_COLLECTION,
+                [("day_key", 1), ("type_id", 1)],
+                "idx_day_type",
+                used_by=("rebuild_rollups",),
+            )
+        )
+
+    retention_days = settings.DELIVERY_LOGS_RETENTION_DAYS
+    retention_ttl = settings.DELIVERY_LOGS_RETENTION_MODE == "ttl"
+    if retention_days and retention_ttl and not TIMESERIES:
+        # Для time-series срок задаётся опцией коллекции (expireAfterSeconds)
+        registry.append(
+            IndexSpec(
+                LOGS_COLLECTION,
+                [("created_at", 1)],
+                "idx_created_at_ttl",
+                expire_after_seconds=retention_days * 24 * 60 * 60,
+                used_by=("TTL сырых логов",),
+            )
+        )
+    return registry
 
 
 async def ensure_mongo_indexes(db: AsyncIOMotorDatabase):
-    await db.delivery_logs.create_index(
-        [("day_key", 1), ("type_id", 1)], name="idx_day_type"
+    """Создаёт недостающие индексы; расхождения с реестром только логирует"""
+    if TIMESERIES and LOGS_COLLECTION not in await db.list_collection_names(
+        filter={"name": LOGS_COLLECTION}
+    ):
+        await db.create_collection(LOGS_COLLECTION, **timeseries_create_options())
+
+    for spec in index_registry():
+        try:
+            await db[spec.collection].create_index(spec.keys, **spec.options)
+        except OperationFailure as e:
+            logger.warning(
+                f"Индекс {spec.collection}.{spec.name} расходится с реестром: {e}. "
+                "Проверьте: python -m app.setup_indexes"
+            )
+
+
+def check_indexes(db) -> dict[str, list[str]]:
+    """
+    Сравнивает индексы в базе с реестром (синхронный pymongo).
+    Возвращает недостающие, отличающиеся и лишние индексы.
+    """
+    report: dict[str, list[str]] = {"missing": [], "different": [], "extra": []}
+    registry = index_registry()
+    for collection in sorted({spec.collection for spec in registry}):
+        existing = db[collection].index_information()
+        expected = {
+            spec.name: spec for spec in registry if spec.collection == collection
+        }
+        for name, spec in expected.items():
+            if name not in existing:
+                report["missing"].append(f"{collection}.{name}")
+            elif not spec.matches(existing[name]):
+                report["different"].append(f"{collection}.{name}")
+        for name in existing:
+            if name != "_id_" and name not in expected:
+                report["extra"].append(f"{collection}.{name}")
+    return report
+
+
+def apply_indexes(db, drop_extra: bool = False) -> None:
+    """Приводит индексы к реестру: отличающиеся пересоздаются"""
+    report = check_indexes(db)
+    registry = {(spec.collection, spec.name): spec for spec in index_registry()}
+    for entry in report["different"] + (report["extra"] if drop_extra else []):
+        collection, name = entry.split(".", 1)
+        db[collection].drop_index(name)
+        logger.info(f"Удалён индекс {entry}")
+    for entry in report["missing"] + report["different"]:
+        spec = registry[tuple(entry.split(".", 1))]
+        db[spec.collection].create_index(spec.keys, **spec.options)
+        logger.info(f"Создан индекс {entry}")
+
+
+if __name__ == "__main__":
+    from app.setup import mongo_manager_sync
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Проверка индексов Mongo")
+    parser.add_argument("--apply", action="store_true", help="Привести к реестру")
+    parser.add_argument(
+        "--drop-extra", action="store_true", help="Удалить индексы не из реестра"
     )
+    args = parser.parse_args()
 
-    await db.delivery_logs.create_index([("day_key", 1)], name="idx_day")
+    db = mongo_manager_sync.get_mongodb()
+    if args.apply:
+        apply_indexes(db, drop_extra=args.drop_extra)
+    report = check_indexes(db)
+    for kind, entries in report.items():
+        for entry in entries:
+            print(f"{kind}: {entry}")
+    if report["missing"] or report["different"]:
+        raise SystemExit(1)
@@ -0,0 +1,109 @@
+"""
+Дописывает delivery_cost_rub в логи, записанные до появления этого поля.
+
+    python -m app.tasks.backfill_costs --batch-size 5000
+
+Логи обходятся по (created_at, _id), стоимость считается app.pricing так же,
+как при записи нового лога. Повторный запуск продолжает с незаполненных.
+После заполнения агрегаты за затронутые дни пересобираются, чтобы суммы
+совпадали с округлёнными стоимостями посылок, а кэш аналитики сбрасывается.
+"""
+
+import argparse
+import logging
+
+from pymongo import UpdateOne
+
+from app.pricing import delivery_cost_rub
+from app.setup import mongo_manager_sync, redis_manager_sync
+from app.tasks.rollups import rebuild_rollups
+from app.utils.delivery_logs_storage import (
+    LOGS_COLLECTION,
+    TYPE_FIELD,
+    day_key_of,
+    from_storage,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+def backfill_delivery_costs(db, batch_size: int = 5000) -> int:
+    """Возвращает количество обновлённых документов"""
+    collection = db[LOGS_COLLECTION]
+    missing = {"delivery_cost_rub": {"$exists": False}}
+    query = missing
+    updated = 0
+    first_day = None
+    while True:
+        batch = list(
+            collection.find(
+                query,
+                projection={
+                    "created_at": 1,
+                    "weight_kg": 1,
+                    "value_usd": 1,
+                    "usd_rub_rate": 1,
+                    TYPE_FIELD: 1,
+                },
+                sort=[("created_at", 1), ("_id", 1)],
+                limit=batch_size,
+            )
+        )
+        if not batch:
+            break
+        if first_day is None:
+            first_day = day_key_of(batch[0]["created_at"])
+
+        result = collection.bulk_write(
+            [
+                UpdateOne(
+                    {"_id": log["_id"], "created_at": log["created_at"]},
+                    {
+                        "$set": {
+                            "delivery_cost_rub": float(
+                                delivery_cost_rub(
+                                    log["weight_kg"],
+                                    log["value_usd"],
+                                    log["usd_rub_rate"],
+                                    from_storage(log)["type_id"],
+                                )
+                            )
+                        }
+                    },
+                )
+                for log in batch
+            ],
+            ordered=False,
+        )
+        updated += result.modified_count
+
+        # Дальше — строго после последнего документа пачки, по индексу
+        last = batch[-1]
+        query = {
+            "$and": [
+                missing,
+                {
+                    "$or": [
+                        {"created_at": {"$gt": last["created_at"]}},
+                        {"created_at": last["created_at"], "_id": {"$gt": last["_id"]}},
+                    ]
+                },
+            ]
+        }
+        logger.info(f"Стоимость дописана в {updated} логов")
+
+    if updated:
+        # Логи обходятся по created_at — последний документ самый поздний
+        rebuild_rollups(db, first_day, day_key_of(last["created_at"]))
+    return updated
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Заполнение delivery_cost_rub в логах")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    redis_manager_sync.connect()
+    backfill_delivery_costs(mongo_manager_sync.get_mongodb(), args.batch_size)
@@ -1,17 +1,24 @@
 from celery import Celery
 from celery.schedules import crontab
-from celery.signals import worker_process_init
+from celery.signals import worker_process_init, worker_process_shutdown
 
 from app.setup import redis_manager_sync, mongo_manager_sync
+from app.tasks.rate_provider import usd_rate_provider
+from app.tasks.worker_runtime import worker_runtime
+from app.utils.metrics import metrics
 from app.config import settings
 
 
 celery_instance = Celery(
     "tasks",
     broker=settings.REDIS_URL,
+    backend=settings.REDIS_URL,
     include=["app.tasks.tasks"],
 )
 
+# Результаты нужны только для chord при пересчёте стоимостей
+celery_instance.conf.result_expires = 60 * 60
+
 celery_instance.conf.beat_schedule = {
     "task_1": {
         "task": "set_delivery_costs",
@@ -23,12 +30,32 @@ celery_instance.conf.beat_schedule = {
     },
     "task_3": {
         "task": "insert_buffer_to_mongo",
+        "schedule": crontab(minute="*/1"),
+    },
+    "task_5": {
+        "task": "reprice_delivery_costs",
         "schedule": crontab(minute="*/5"),
     },
 }
 
+if settings.DELIVERY_LOGS_RETENTION_MODE == "archive":
+    celery_instance.conf.beat_schedule["task_4"] = {
+        "task": "archive_delivery_logs",
+        "schedule": crontab(minute=30, hour=3),
+    }
+
 
 @worker_process_init.connect
 def init_connections(**kwargs):
     mongo_manager_sync.connect()
     redis_manager_sync.connect()
+    usd_rate_provider.start_listener()
+    worker_runtime.init()
+    metrics.start()
+
+
+@worker_process_shutdown.connect
+def close_connections(**kwargs):
+    usd_rate_provider.stop_listener()
+    worker_runtime.shutdown()
+    metrics.stop()
@@ -0,0 +1,33 @@
+import uuid
+
+from redis import Redis
+
+
+# Снимает блокировку, только если в ней всё ещё наш токен
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def acquire_lock(redis: Redis, key: str, ttl: int) -> str | None:
+    """Токен блокировки или None, если её держит другой процесс"""
+    token = uuid.uuid4().hex
+    if redis.set(key, token, nx=True, ex=ttl):
+        return token
+    return None
+
+
+def release_lock(redis: Redis, key: str, token: str) -> bool:
+    """
+    Снимает блокировку, если она всё ещё наша. False — её TTL истёк
+    и блокировку уже взял кто-то другой.
+    """
+    return bool(redis.register_script(_RELEASE_LOCK_SCRIPT)(keys=[key], args=[token]))
+
+
+def holds_lock(redis, key: str, token: str) -> bool:
+    value = redis.get(key)
+    return value is not None and value.decode() == token
@@ -0,0 +1,201 @@
+import logging
+import time
+import uuid
+from typing import Any, Callable
+
+from bson import ObjectId, json_util
+from pymongo.errors import BulkWriteError
+
+from app.connectors.mongo_connector_sync import MongoManagerSync
+from app.connectors.redis_connector_sync import RedisManagerSync
+from app.setup import mongo_manager_sync, redis_manager_sync
+from app.tasks.rollups import increment_rollups
+from app.utils.analytics_cache import invalidate_analytics_days
+from app.utils.delivery_logs_storage import (
+    LOGS_COLLECTION,
+    TIMESERIES,
+    find_existing_ids,
+    to_storage,
+)
+
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY_ERROR = 11000
+
+# Переносит до ARGV[1] записей из буфера в список "в обработке" одной операцией,
+# чтобы при падении воркера пачка не терялась, а дописывалась следующим сбросом
+_MOVE_BATCH_SCRIPT = """
+local items = redis.call('LRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1)
+if #items > 0 then
+    redis.call('RPUSH', KEYS[2], unpack(items))
+    redis.call('LTRIM', KEYS[1], #items, -1)
+end
+return items
+"""
+
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class RedisLogBuffer:
+    """
+    Общий для всех процессов буфер логов в Redis-списке.
+
+    Запись сбрасывается в Mongo при достижении batch_size записей или когда
+    самая старая запись ждёт дольше max_age секунд. Семантика at-least-once:
+    пачка удаляется из Redis только после insert_many, а повторная вставка
+    отбрасывается по заранее присвоенному _id.
+
+    on_insert вызывается с фактически вставленными документами — через него
+    обновляются предагрегированные суммы.
+    """
+
+    def __init__(
+        self,
+        redis_manager: RedisManagerSync,
+        mongo_manager: MongoManagerSync,
+        collection: str = LOGS_COLLECTION,
+        key: str = "delivery_logs:buffer",
+        batch_size: int = 100,
+        max_age: float = 60,
+        drain_chunk: int = 1000,
+        lock_ttl: int = 60,
+        on_insert: Callable[[Any, list[dict]], Any] | None = None,
+    ):
+        self._redis_manager = redis_manager
+        self._mongo_manager = mongo_manager
+        self.collection = collection
+        self.key = key
+        self.processing_key = f"{key}:processing"
+        self.first_push_key = f"{key}:first_push"
+        self.lock_key = f"{key}:lock"
+        self.batch_size = batch_size
+        self.max_age = max_age
+        self.drain_chunk = drain_chunk
+        self.lock_ttl = lock_ttl
+        self.on_insert = on_insert
+
+    @property
+    def redis(self):
+        return self._redis_manager.redis
+
+    def add(self, document: dict) -> None:
+        """Кладёт документ в буфер и сбрасывает его, если сработал триггер"""
+        self.add_many([document])
+
+    def add_many(self, documents: list[dict]) -> None:
+        """Кладёт пачку документов одним RPUSH"""
+        if not documents:
+            return
+        for document in documents:
+            document.setdefault("_id", ObjectId())
+
+        pipe = self.redis.pipeline()
+        pipe.rpush(self.key, *(json_util.dumps(document) for document in documents))
+        pipe.set(self.first_push_key, time.time(), nx=True)
+        pipe.get(self.first_push_key)
+        size, _, first_push = pipe.execute()
+
+        if self.should_flush(size, first_push):
+            self.flush()
+
+    def should_flush(self, size: int, first_push: bytes | None) -> bool:
+        if size >= self.batch_size:
+            return True
+        if first_push is None:
+            return False
+        return time.time() - float(first_push) >= self.max_age
+
+    def size(self) -> int:
+        return self.redis.llen(self.key) + self.redis.llen(self.processing_key)
+
+    def flush(self) -> int:
+        """
+        Выгружает весь буфер в Mongo пачками по drain_chunk.
+        Возвращает количество вставленных документов.
+        """
+        token = uuid.uuid4().hex
+        if not self.redis.set(self.lock_key, token, nx=True, ex=self.lock_ttl):
+            logger.debug("Буфер уже сбрасывается другим процессом")
+            return 0
+
+        move_batch = self.redis.register_script(_MOVE_BATCH_SCRIPT)
+        try:
+            # Пачка, оставшаяся от процесса, упавшего посреди сброса
+            inserted = self._insert(
+                self.redis.lrange(self.processing_key, 0, -1), recovering=True
+            )
+            self.redis.delete(self.processing_key, self.first_push_key)
+
+            while True:
+                items = move_batch(
+                    keys=[self.key, self.processing_key], args=[self.drain_chunk]
+                )
+                if not items:
+                    break
+                inserted += self._insert(items)
+                self.redis.delete(self.processing_key)
+                self.redis.expire(self.lock_key, self.lock_ttl)
+
+            if inserted:
+                logger.debug(f"Записано в Mongo {inserted} записей")
+            return inserted
+        finally:
+            self.redis.register_script(_RELEASE_LOCK_SCRIPT)(
+                keys=[self.lock_key], args=[token]
+            )
+
+    def _insert(self, items: list[bytes], recovering: bool = False) -> int:
+        if not items:
+            return 0
+        documents = [json_util.loads(item) for item in items]
+        db = self._mongo_manager.get_mongodb()
+        if recovering and TIMESERIES:
+            # В time-series коллекции нет уникального индекса по _id
+            inserted = find_existing_ids(db[self.collection], documents)
+            documents = [
+                document for document in documents if document["_id"] not in inserted
+            ]
+            if not documents:
+                return 0
+        try:
+            db[self.collection].insert_many(
+                [to_storage(document) for document in documents], ordered=False
+            )
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(err.get("code") != DUPLICATE_KEY_ERROR for err in errors):
+                raise
+            # Дубликаты — документы, уже записанные до сбоя прошлого сброса
+            duplicates = {err["index"] for err in errors}
+            documents = [
+                document
+                for index, document in enumerate(documents)
+                if index not in duplicates
+            ]
+
+        if self.on_insert is not None and documents:
+            try:
+                self.on_insert(db, documents)
+            except Exception as e:
+                logger.error(
+                    f"Ошибка обновления агрегатов после записи логов: {e}. "
+                    "Нужна пересборка: python -m app.tasks.rollups"
+                )
+        return len(documents)
+
+
+def update_aggregates(db, documents: list[dict]) -> None:
+    """Обновляет агрегаты и сбрасывает кэш аналитики за затронутые дни"""
+    days = increment_rollups(db, documents)
+    invalidate_analytics_days(redis_manager_sync.redis, days)
+
+
+delivery_log_buffer = RedisLogBuffer(
+    redis_manager_sync, mongo_manager_sync, on_insert=update_aggregates
+)
@@ -0,0 +1,199 @@
+import bisect
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from zoneinfo import ZoneInfo
+
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app.connectors.mongo_connector_sync import MongoManagerSync
+from app.connectors.redis_connector_sync import RedisManagerSync
+from app.setup import mongo_manager_sync, redis_manager_sync
+
+
+logger = logging.getLogger(__name__)
+
+RATE_KEY = "USD_RUB"
+RATE_TTL = 120 * 60
+RATE_CHANNEL = "usd_rate:updated"
+RATE_HISTORY = "usd_rate_history"
+# Окно истории, которое держится в памяти для поиска курса на момент времени
+SERIES_WINDOW = timedelta(days=2)
+
+
+def as_utc(moment: datetime) -> datetime:
+    """pymongo отдаёт наивные datetime в UTC — приводим всё к aware UTC"""
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc)
+
+
+class UsdRateProvider:
+    """
+    Курс USD→RUB для воркеров.
+
+    Текущий курс держится в памяти процесса до expire секунд и обновляется
+    сразу по сообщению из Redis pub/sub от set_usd_course. Когда курса нет
+    ни в памяти, ни в Redis, берётся последний курс из истории в Mongo.
+
+    История курсов (usd_rate_history) позволяет найти курс, действовавший
+    на любой момент времени; последние SERIES_WINDOW держатся в памяти.
+    """
+
+    def __init__(
+        self,
+        redis_manager: RedisManagerSync,
+        mongo_manager: MongoManagerSync,
+        expire: float = 10 * 60,
+    ):
+        self._redis_manager = redis_manager
+        self._mongo_manager = mongo_manager
+        self.expire = expire
+        self._rate: Decimal | None = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        self._listener = None
+        self._series: list[tuple[datetime, Decimal]] = []
+        self._series_from: datetime | None = None
+        self._series_expires_at = 0.0
+
+    def _remember(self, rate: Decimal) -> None:
+        with self._lock:
+            self._rate = rate
+            self._expires_at = time.monotonic() + self.expire
+
+    def _cached(self) -> Decimal | None:
+        with self._lock:
+            if self._rate is not None and time.monotonic() < self._expires_at:
+                return self._rate
+        return None
+
+    def _redis_get(self, key: str):
+        if self._redis_manager.redis is None:
+            self._redis_manager.connect()
+        try:
+            return self._redis_manager.get(key)
+        except RedisConnectionError:
+            logger.warning("Redis соединение потеряно. Повторяем запрос...")
+            return self._redis_manager.get(key)
+
+    def get_current_rate(self) -> Decimal | None:
+        """Актуальный курс из памяти или Redis, без запасного варианта"""
+        rate = self._cached()
+        if rate is not None:
+            return rate
+
+        raw = self._redis_get(RATE_KEY)
+        if raw is None:
+            return None
+        rate = Decimal(raw.decode())
+        self._remember(rate)
+        return rate
+
+    def get_rate(self) -> tuple[Decimal | None, bool]:
+        """
+        Курс и признак того, что он взят из истории (может быть устаревшим).
+        """
+        rate = self.get_current_rate()
+        if rate is not None:
+            return rate, False
+
+        last_rate = self.get_last_saved_rate()
+        if last_rate is None:
+            return None, False
+        logger.warning(f"Используем последний известный курс: {last_rate}")
+        return last_rate, True
+
+    def get_last_saved_rate(self) -> Decimal | None:
+        db = self._mongo_manager.get_mongodb()
+        last_entry = db[RATE_HISTORY].find_one({}, sort=[("created_at", -1)])
+        return Decimal(last_entry["rate"]) if last_entry else None
+
+    def get_rate_series(
+        self, start: datetime, end: datetime
+    ) -> list[tuple[datetime, Decimal]]:
+        """
+        Курсы, действовавшие в [start, end], по возрастанию времени.
+        Первый элемент — курс, действовавший на start (если он известен).
+        """
+        db = self._mongo_manager.get_mongodb()
+        series = []
+        first = db[RATE_HISTORY].find_one(
+            {"created_at": {"$lte": start}}, sort=[("created_at", -1)]
+        )
+        if first is not None:
+            series.append((as_utc(first["created_at"]), Decimal(first["rate"])))
+        for entry in db[RATE_HISTORY].find(
+            {"created_at": {"$gt": start, "$lte": end}}, sort=[("created_at", 1)]
+        ):
+            series.append((as_utc(entry["created_at"]), Decimal(entry["rate"])))
+        return series
+
+    def _recent_series(self) -> list[tuple[datetime, Decimal]]:
+        with self._lock:
+            if time.monotonic() < self._series_expires_at:
+                return self._series
+        now = datetime.now(timezone.utc)
+        series = self.get_rate_series(now - SERIES_WINDOW, now)
+        with self._lock:
+            self._series = series
+            self._series_from = now - SERIES_WINDOW
+            self._series_expires_at = time.monotonic() + self.expire
+        return series
+
+    def get_rate_as_of(self, at: datetime) -> tuple[Decimal | None, bool]:
+        """
+        Курс, действовавший на момент at, и признак оценки: курс старше
+        RATE_TTL на момент at считается устаревшим.
+        """
+        at = as_utc(at)
+        series = self._recent_series()
+        if self._series_from is not None and at >= self._series_from and series:
+            times = [moment for moment, _ in series]
+            index = bisect.bisect_right(times, at) - 1
+            entry = series[index] if index >= 0 else None
+        else:
+            entry = self.get_rate_series(at, at)[:1]
+            entry = entry[0] if entry else None
+
+        if entry is None:
+            return None, False
+        valid_from, rate = entry
+        return rate, at - valid_from > timedelta(seconds=RATE_TTL)
+
+    def publish(self, rate: Decimal) -> None:
+        """Сохраняет новый курс в Redis и историю и оповещает воркеры"""
+        self._redis_manager.set(RATE_KEY, str(rate), expire=RATE_TTL)
+        self._remember(rate)
+
+        db = self._mongo_manager.get_mongodb()
+        db[RATE_HISTORY].insert_one(
+            {"rate": str(rate), "created_at": datetime.now(ZoneInfo("Europe/Moscow"))}
+        )
+        # Оповещаем после записи в историю, чтобы воркеры перечитали её целиком
+        self._redis_manager.redis.publish(RATE_CHANNEL, str(rate))
+
+    def _on_message(self, message: dict) -> None:
+        try:
+            self._remember(Decimal(message["data"].decode()))
+            with self._lock:
+                self._series_expires_at = 0.0
+        except Exception as e:
+            logger.error(f"Некорректное сообщение о курсе USD: {e}")
+
+    def start_listener(self) -> None:
+        if self._listener is not None:
+            return
+        pubsub = self._redis_manager.redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{RATE_CHANNEL: self._on_message})
+        self._listener = pubsub.run_in_thread(sleep_time=1, daemon=True)
+
+    def stop_listener(self) -> None:
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+
+
+usd_rate_provider = UsdRateProvider(redis_manager_sync, mongo_manager_sync)
@@ -0,0 +1,233 @@
+"""
+Пересчёт стоимостей доставки по новому курсу USD.
+
+set_usd_course запускает его, когда курс изменился не меньше чем на
+REPRICE_THRESHOLD_PERCENT: посылки, созданные за последние REPRICE_WINDOW_DAYS
+дней, пересчитываются по новому курсу пачками по первичному ключу от новых
+к старым. После каждой пачки в Redis сохраняется контрольная точка, поэтому
+прерванный пересчёт продолжается с неё, а новый курс во время пересчёта
+заменяет задание. Скорость ограничена REPRICE_ROWS_PER_SECOND, чтобы
+пересчёт не отнимал MySQL у запросов API.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+from zoneinfo import ZoneInfo
+
+from redis import Redis, WatchError
+
+from app.config import settings
+from app.tasks.locks import holds_lock
+from app.utils.db_manager import DB_Manager
+
+
+logger = logging.getLogger(__name__)
+
+MOSCOW_TZ = ZoneInfo("Europe/Moscow")
+
+REPRICE_PROGRESS_KEY = "reprice:progress"
+REPRICE_LOCK_KEY = "reprice:lock"
+# Блокировка продлевается после каждой пачки; если воркер упал, она истечёт,
+# и задание продолжит следующий запуск reprice_delivery_costs
+REPRICE_LOCK_TTL = 10 * 60
+
+ACTIVE_STATUSES = ("pending", "running")
+
+
+def is_material_change(old_rate: Decimal, new_rate: Decimal) -> bool:
+    threshold = Decimal(str(settings.REPRICE_THRESHOLD_PERCENT))
+    return abs(new_rate - old_rate) * 100 >= old_rate * threshold
+
+
+def last_repriced_rate(redis: Redis) -> Decimal | None:
+    """Курс последнего поставленного пересчёта — от него считается изменение"""
+    rate = redis.hget(REPRICE_PROGRESS_KEY, "usd_rub_rate")
+    return Decimal(rate.decode()) if rate is not None else None
+
+
+def _holds_lock(redis, token: str) -> bool:
+    return holds_lock(redis, REPRICE_LOCK_KEY, token)
+
+
+def reprice_since(now: datetime | None = None) -> datetime:
+    """Пересчитываются посылки, созданные не раньше этого момента"""
+    now = now or datetime.now(MOSCOW_TZ)
+    return now - timedelta(days=settings.REPRICE_WINDOW_DAYS)
+
+
+def start_job(redis: Redis, usd_rub_rate: Decimal, since: datetime) -> str:
+    """Записывает новое задание вместо предыдущего, даже незаконченного"""
+    job_id = uuid.uuid4().hex
+    pipe = redis.pipeline()
+    pipe.delete(REPRICE_PROGRESS_KEY)
+    pipe.hset(
+        REPRICE_PROGRESS_KEY,
+        mapping={
+            "job_id": job_id,
+            "status": "pending",
+            "usd_rub_rate": str(usd_rub_rate),
+            "since": since.isoformat(),
+            "updated": 0,
+            "started_at": datetime.now(MOSCOW_TZ).isoformat(),
+        },
+    )
+    pipe.execute()
+    return job_id
+
+
+def load_progress(raw: dict[bytes, bytes]) -> dict:
+    """
+    Контрольная точка из Redis в виде для API: статус, курс, окно, сколько
+    строк пересчитано и процент — доля окна по времени создания, пройденная
+    от новых посылок к старым.
+    """
+    progress = {key.decode(): value.decode() for key, value in raw.items()}
+    if not progress:
+        return {"status": "idle"}
+
+    for field in ("since", "reached_at", "started_at", "updated_at", "finished_at"):
+        if field in progress:
+            progress[field] = datetime.fromisoformat(progress[field])
+    progress["updated"] = int(progress.get("updated", 0))
+
+    if progress["status"] == "done":
+        progress["percent"] = 100.0
+    elif "reached_at" in progress:
+        window = progress["started_at"] - progress["since"]
+        passed = progress["started_at"] - progress["reached_at"]
+        progress["percent"] = round(min(max(passed / window, 0), 1) * 100, 1)
+    else:
+        progress["percent"] = 0.0
+    return progress
+
+
+def _save_checkpoint(
+    redis: Redis, lock_token: str, job_id: str, mapping: dict, updated: int
+) -> bool:
+    """
+    Сохраняет контрольную точку и продлевает блокировку, только если задание
+    не заменили новым и блокировка всё ещё наша. Иначе возвращает False —
+    тогда этот пересчёт прекращается.
+    """
+    with redis.pipeline() as pipe:
+        try:
+            pipe.watch(REPRICE_PROGRESS_KEY, REPRICE_LOCK_KEY)
+            current = pipe.hget(REPRICE_PROGRESS_KEY, "job_id")
+            if current is None or current.decode() != job_id:
+                return False
+            if not _holds_lock(pipe, lock_token):
+                logger.warning(f"Пересчёт стоимостей {job_id}: блокировка потеряна")
+                return False
+            pipe.multi()
+            pipe.hset(
+                REPRICE_PROGRESS_KEY,
+                mapping={**mapping, "updated_at": datetime.now(MOSCOW_TZ).isoformat()},
+            )
+            pipe.hincrby(REPRICE_PROGRESS_KEY, "updated", updated)
+            pipe.expire(REPRICE_LOCK_KEY, REPRICE_LOCK_TTL)
+            pipe.execute()
+            return True
+        except WatchError:
+            return False
+
+
+async def _run_job(
+    session_factory,
+    redis: Redis,
+    lock_token: str,
+    progress: dict,
+    batch_size: int,
+    rows_per_second: int,
+) -> int:
+    job_id = progress["job_id"]
+    usd_rub_rate = Decimal(progress["usd_rub_rate"])
+    since = datetime.fromisoformat(progress["since"])
+    updated_total = 0
+
+    async with DB_Manager(session_factory=session_factory) as db:
+        if "cursor" in progress:
+            cursor = int(progress["cursor"])
+            logger.info(f"Пересчёт стоимостей {job_id}: продолжаем с id < {cursor}")
+        else:
+            # Посылки, созданные после старта, уже посчитаны по новому курсу
+            cursor = (await db.packages.get_max_id() or 0) + 1
+            if not _save_checkpoint(
+                redis, lock_token, job_id, {"status": "running", "cursor": cursor}, 0
+            ):
+                return 0
+
+        while True:
+            if not _holds_lock(redis, lock_token):
+                logger.warning(f"Пересчёт стоимостей {job_id}: блокировка потеряна")
+                return updated_total
+            started = time.monotonic()
+            rows = await db.packages.get_ids_before(cursor, batch_size)
+            in_window = [row for row in rows if row[1] >= since]
+            if not in_window:
+                break
+
+            updated = await db.packages.update_costs(
+                usd_rub_rate,
+                in_window[-1][0],
+                in_window[0][0],
+                only_missing=False,
+                created_since=since,
+            )
+            await db.commit()
+            updated_total += updated
+
+            cursor = rows[-1][0]
+            checkpoint = {"cursor": cursor, "reached_at": in_window[-1][1].isoformat()}
+            if not _save_checkpoint(redis, lock_token, job_id, checkpoint, updated):
+                logger.info(f"Пересчёт стоимостей {job_id} прерван")
+                return updated_total
+            if len(in_window) < len(rows):
+                # Дошли до посылок старше окна
+                break
+
+            pause = len(rows) / rows_per_second - (time.monotonic() - started)
+            if pause > 0:
+                await asyncio.sleep(pause)
+
+    _save_checkpoint(
+        redis,
+        lock_token,
+        job_id,
+        {"status": "done", "finished_at": datetime.now(MOSCOW_TZ).isoformat()},
+        0,
+    )
+    logger.info(
+        f"Пересчёт стоимостей {job_id} по курсу {usd_rub_rate}: {updated_total}"
+    )
+    return updated_total
+
+
+async def run_repricing(
+    session_factory,
+    redis: Redis,
+    lock_token: str,
+    batch_size: int | None = None,
+    rows_per_second: int | None = None,
+) -> int:
+    """
+    Выполняет задание из контрольной точки; если во время пересчёта его
+    заменили новым, сразу переходит к новому. lock_token — токен из
+    acquire_lock: потеряв блокировку, пересчёт останавливается.
+    Возвращает число пересчитанных строк.
+    """
+    batch_size = batch_size or settings.REPRICE_BATCH_SIZE
+    rows_per_second = rows_per_second or settings.REPRICE_ROWS_PER_SECOND
+    updated_total = 0
+    while _holds_lock(redis, lock_token):
+        raw = redis.hgetall(REPRICE_PROGRESS_KEY)
+        progress = {key.decode(): value.decode() for key, value in raw.items()}
+        if progress.get("status") not in ACTIVE_STATUSES:
+            return updated_total
+        updated_total += await _run_job(
+            session_factory, redis, lock_token, progress, batch_size, rows_per_second
+        )
+    return updated_total
@@ -0,0 +1,87 @@
+"""
+Хранение сырых логов доставок ограниченный срок (DELIVERY_LOGS_RETENTION_DAYS).
+
+Суммы по дням и часам уже лежат в delivery_*_rollups, поэтому старые сырые
+логи нужны только для выгрузок и пересборки агрегатов. В режиме ttl их
+удаляет TTL-индекс (см. app/setup_indexes.py), в режиме archive — задача
+archive_delivery_logs переносит их в отдельную коллекцию.
+"""
+
+import logging
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from app.config import settings
+from app.setup import redis_manager_sync
+from app.utils.analytics_cache import invalidate_analytics_range
+from app.utils.delivery_logs_storage import LOGS_COLLECTION, TIMESERIES, day_key_of
+
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_COLLECTION = "delivery_logs_archive"
+# Удаление из time-series коллекции по timeField появилось в MongoDB 7.0
+TIMESERIES_DELETE_MIN_VERSION = (7, 0)
+
+
+def retention_cutoff(now: datetime | None = None) -> datetime | None:
+    """Логи старше этого момента удаляются или архивируются"""
+    if not settings.DELIVERY_LOGS_RETENTION_DAYS:
+        return None
+    now = now or datetime.now(timezone.utc)
+    return now - timedelta(days=settings.DELIVERY_LOGS_RETENTION_DAYS)
+
+
+def first_retained_day() -> str | None:
+    """Первый день (day_key), за который сырые логи гарантированно целы"""
+    cutoff = retention_cutoff()
+    if cutoff is None:
+        return None
+    moscow_cutoff = cutoff.astimezone(ZoneInfo("Europe/Moscow"))
+    return str(moscow_cutoff.date() + timedelta(days=1))
+
+
+def archive_old_logs(db, before: datetime) -> int:
+    """
+    Переносит логи с created_at < before в архив. Повторный запуск безопасен:
+    уже перенесённые документы совпадают по _id и не дублируются.
+    """
+    if TIMESERIES:
+        version = tuple(db.client.server_info()["versionArray"][:2])
+        if version < TIMESERIES_DELETE_MIN_VERSION:
+            logger.error(
+                "Архивация логов из time-series коллекции требует MongoDB 7.0+, "
+                f"сервер {'.'.join(map(str, version))} — используйте режим ttl"
+            )
+            return 0
+    match = {"created_at": {"$lt": before}}
+    oldest = db[LOGS_COLLECTION].find_one(
+        match, projection={"created_at": 1}, sort=[("created_at", 1)]
+    )
+    if oldest is None:
+        return 0
+    db[LOGS_COLLECTION].aggregate(
+        [
+            {"$match": match},
+            {
+                "$merge": {
+                    "into": ARCHIVE_COLLECTION,
+                    "on": "_id",
+                    "whenMatched": "keepExisting",
+                    "whenNotMatched": "insert",
+                }
+            },
+        ]
+    )
+    deleted = db[LOGS_COLLECTION].delete_many(match).deleted_count
+    logger.info(f"Перенесено в {ARCHIVE_COLLECTION} {deleted} логов до {before}")
+
+    try:
+        invalidate_analytics_range(
+            redis_manager_sync.redis,
+            date.fromisoformat(day_key_of(oldest["created_at"])),
+            date.fromisoformat(day_key_of(before)),
+        )
+    except Exception as e:
+        logger.error(f"Не удалось сбросить кэш аналитики после архивации: {e}")
+    return deleted
@@ -0,0 +1,204 @@
+"""
+Предагрегированные суммы доставок по дням и по часам в разрезе типов посылок.
+
+Пересборка из сырых логов:
+    python -m app.tasks.rollups --start 2025-01-01 --end 2025-12-31
+"""
+
+import argparse
+import logging
+from collections import defaultdict
+from datetime import date, timedelta
+
+from pymongo import UpdateOne
+
+from app.pricing import delivery_cost_mongo, delivery_cost_rub
+from app.setup import mongo_manager_sync, redis_manager_sync
+from app.tasks.retention import first_retained_day
+from app.utils.analytics_cache import invalidate_analytics_range
+from app.utils.delivery_logs_storage import (
+    LOGS_COLLECTION,
+    TIMESERIES,
+    TYPE_FIELD,
+    day_start,
+)
+
+
+logger = logging.getLogger(__name__)
+
+DAILY_ROLLUPS = "delivery_daily_rollups"
+HOURLY_ROLLUPS = "delivery_hourly_rollups"
+
+# Коллекция агрегатов -> поля ключа корзины
+ROLLUP_KEYS = {
+    DAILY_ROLLUPS: ("day_key", "type_id"),
+    HOURLY_ROLLUPS: ("day_key", "hour", "type_id"),
+}
+ROLLUP_INDEX_NAMES = {
+    DAILY_ROLLUPS: "idx_day_type",
+    HOURLY_ROLLUPS: "idx_day_hour_type",
+}
+
+
+def document_cost(document: dict) -> float:
+    """Стоимость из лога; для логов до появления delivery_cost_rub — по формуле"""
+    if "delivery_cost_rub" in document:
+        return document["delivery_cost_rub"]
+    return float(
+        delivery_cost_rub(
+            document["weight_kg"],
+            document["value_usd"],
+            document["usd_rub_rate"],
+            document["type_id"],
+        )
+    )
+
+
+def _increment(db, collection: str, documents: list[dict]) -> None:
+    key_fields = ROLLUP_KEYS[collection]
+    totals: dict[tuple, list] = defaultdict(lambda: [0.0, 0])
+    for document in documents:
+        bucket = totals[tuple(document[field] for field in key_fields)]
+        bucket[0] += document_cost(document)
+        bucket[1] += 1
+
+    if not totals:
+        return
+
+    db[collection].bulk_write(
+        [
+            UpdateOne(
+                dict(zip(key_fields, key)),
+                {"$inc": {"total_delivery_cost": cost, "count_packages": count}},
+                upsert=True,
+            )
+            for key, (cost, count) in totals.items()
+        ],
+        ordered=False,
+    )
+
+
+def increment_rollups(db, documents: list[dict]) -> set[str]:
+    """
+    Добавляет только что записанные логи в суммы по дням и по часам.
+    Возвращает затронутые дни.
+    """
+    for collection in ROLLUP_KEYS:
+        _increment(db, collection, documents)
+    return {document["day_key"] for document in documents}
+
+
+# Поля корзины в сырых логах; в time-series коллекции day_key и hour
+# не хранятся и вычисляются из created_at по Москве
+_TIMESERIES_BUCKET_FIELDS = {
+    "day_key": {
+        "$dateToString": {
+            "format": "%Y-%m-%d",
+            "date": "$created_at",
+            "timezone": "Europe/Moscow",
+        }
+    },
+    "hour": {"$hour": {"date": "$created_at", "timezone": "Europe/Moscow"}},
+    "type_id": "$meta.type_id",
+}
+
+
+def _bucket_field(field: str):
+    return _TIMESERIES_BUCKET_FIELDS[field] if TIMESERIES else f"${field}"
+
+
+def _rebuild(db, collection: str, logs_match: dict, rollups_match: dict) -> None:
+    key_fields = ROLLUP_KEYS[collection]
+
+    db[collection].create_index(
+        [(field, 1) for field in key_fields],
+        name=ROLLUP_INDEX_NAMES[collection],
+        unique=True,
+    )
+    db[collection].delete_many(rollups_match)
+    db[LOGS_COLLECTION].aggregate(
+        [
+            {"$match": logs_match},
+            {
+                "$group": {
+                    "_id": {field: _bucket_field(field) for field in key_fields},
+                    "total_delivery_cost": {
+                        "$sum": {
+                            "$ifNull": [
+                                "$delivery_cost_rub",
+                                delivery_cost_mongo(type_id=f"${TYPE_FIELD}"),
+                            ]
+                        }
+                    },
+                    "count_packages": {"$sum": 1},
+                }
+            },
+            {
+                "$project": {
+                    "_id": 0,
+                    **{field: f"$_id.{field}" for field in key_fields},
+                    "total_delivery_cost": 1,
+                    "count_packages": 1,
+                }
+            },
+            {
+                "$merge": {
+                    "into": collection,
+                    "on": list(key_fields),
+                    "whenMatched": "replace",
+                    "whenNotMatched": "insert",
+                }
+            },
+        ]
+    )
+
+
+def rebuild_rollups(db, start: str | None = None, end: str | None = None):
+    """Пересчитывает суммы за диапазон дней (YYYY-MM-DD) из сырых логов"""
+    # Сырые логи за дни до срока хранения удалены — пересборка стёрла бы суммы
+    retained_from = first_retained_day()
+    if retained_from is not None and (start is None or start < retained_from):
+        logger.warning(
+            f"Логи до {retained_from} не хранятся — пересборка начнётся с этого дня"
+        )
+        start = retained_from
+    day_filter: dict = {}
+    if start:
+        day_filter["$gte"] = start
+    if end:
+        day_filter["$lte"] = end
+    rollups_match = {"day_key": day_filter} if day_filter else {}
+
+    logs_match = rollups_match
+    if TIMESERIES:
+        # Границы дней по Москве — фильтр по timeField идёт по корзинам
+        time_filter = {}
+        if start:
+            time_filter["$gte"] = day_start(start)
+        if end:
+            time_filter["$lt"] = day_start(end) + timedelta(days=1)
+        logs_match = {"created_at": time_filter} if time_filter else {}
+
+    for collection in ROLLUP_KEYS:
+        _rebuild(db, collection, logs_match, rollups_match)
+    logger.info(f"Агрегаты пересобраны за диапазон {start or '…'}–{end or '…'}")
+
+    try:
+        invalidate_analytics_range(
+            redis_manager_sync.redis,
+            date.fromisoformat(start) if start else None,
+            date.fromisoformat(end) if end else None,
+        )
+    except Exception as e:
+        logger.error(f"Не удалось сбросить кэш аналитики после пересборки: {e}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Пересборка агрегатов доставок")
+    parser.add_argument("--start", help="Первый день YYYY-MM-DD")
+    parser.add_argument("--end", help="Последний день YYYY-MM-DD")
+    args = parser.parse_args()
+
+    redis_manager_sync.connect()
+    rebuild_rollups(mongo_manager_sync.get_mongodb(), args.start, args.end)
@@ -1,33 +1,51 @@
 from datetime import datetime
 import logging
 from decimal import Decimal
-from typing import Optional
 from zoneinfo import ZoneInfo
-from asgiref.sync import async_to_sync
+import numpy as np
+from celery import chord
 
+from app.config import settings
+from app.pricing import delivery_cost_rub
+from app.pricing_engine import kopecks_to_decimal, pricing_engine
 from app.tasks.celery_app import celery_instance
-from app.tasks.task_helpers import get_usd_rate, update_usd_rate_from_cbr
-from app.database import async_session_maker_null
+from app.tasks.locks import acquire_lock, release_lock
+from app.tasks.log_buffer import delivery_log_buffer
+from app.tasks.rate_provider import usd_rate_provider
+from app.tasks.repricing import (
+    REPRICE_LOCK_KEY,
+    REPRICE_LOCK_TTL,
+    is_material_change,
+    last_repriced_rate,
+    reprice_since,
+    run_repricing,
+    start_job,
+)
+from app.tasks.retention import archive_old_logs, retention_cutoff
+from app.tasks.task_helpers import update_usd_rate_from_cbr
+from app.tasks.worker_runtime import worker_runtime
 from app.utils.db_manager import DB_Manager
-from app.setup import mongo_manager_sync
+from app.utils.metrics import metrics
+from app.setup import mongo_manager_sync, redis_manager_sync
 
 
 logger = logging.getLogger(__name__)
 
-BATCH_SIZE = 100
-buffer: list[dict] = []
+COST_CHUNK_SIZE = 5000
+# Сколько посылок без стоимости берёт один проход досчёта
+COST_SWEEP_LIMIT = 100_000
+DELIVERY_COSTS_LOCK_KEY = "delivery_costs:lock"
+DELIVERY_COSTS_LOCK_TTL = 30 * 60
+DELIVERY_COSTS_PROGRESS_KEY = "delivery_costs:progress"
 
 
 def push_buffer():
-    """Записываем буфер в MongoDB и очищаем"""
-    if not buffer:
-        logger.debug("Буфер пустой")
-        return
-    db = mongo_manager_sync.get_mongodb()
+    """Записываем буфер из Redis в MongoDB"""
     try:
-        db.delivery_logs.insert_many(buffer)
-        logger.debug(f"Записано в Mongo {len(buffer)} записей")
-        buffer.clear()
+        metrics.set_gauge("log_buffer_size", delivery_log_buffer.size())
+        with metrics.timer("log_buffer_flush_duration_seconds"):
+            inserted = delivery_log_buffer.flush()
+        metrics.inc("log_buffer_flushed_documents_total", inserted)
     except Exception as e:
         logger.error(f"Ошибка батчевой записи в Mongo: {e}")
 
@@ -38,69 +56,303 @@ def insert_buffer_to_mongo():
     push_buffer()
 
 
+def _rate_at(created_at: str | None) -> tuple[Decimal | None, bool]:
+    """Курс на момент создания посылки, а без него — текущий"""
+    if created_at is not None:
+        usd_rub_rate, is_estimated = usd_rate_provider.get_rate_as_of(
+            datetime.fromisoformat(created_at)
+        )
+        if usd_rub_rate is not None:
+            return usd_rub_rate, is_estimated
+    return usd_rate_provider.get_rate()
+
+
+def _build_log_document(
+    package_id, type_id, weight_kg, value_usd, usd_rub_rate, is_estimated: bool
+) -> dict:
+    now = datetime.now(ZoneInfo("Europe/Moscow"))
+    return {
+        "package_id": package_id,
+        "type_id": type_id,
+        "weight_kg": float(weight_kg),
+        "value_usd": float(value_usd),
+        "usd_rub_rate": float(usd_rub_rate),
+        "delivery_cost_rub": float(
+            delivery_cost_rub(weight_kg, value_usd, usd_rub_rate, type_id)
+        ),
+        "is_estimated": is_estimated,
+        "created_at": now,
+        "day_key": now.strftime("%Y-%m-%d"),
+        "hour": now.hour,
+    }
+
+
 @celery_instance.task(name="add_to_mongo")
-def log_package_to_mongo(package_id, type_id, weight_kg, value_usd):
+def log_package_to_mongo(package_id, type_id, weight_kg, value_usd, created_at=None):
     try:
-        usd_rub_rate = get_usd_rate()
-        is_estimated = False
-
+        usd_rub_rate, is_estimated = _rate_at(created_at)
         if usd_rub_rate is None:
-            last_rate = get_last_saved_rate()
-            if last_rate is None:
-                logger.error("Нет доступного курса USD — отмена записи")
-                return
-            logger.warning(f"Используем последний известный курс: {last_rate}")
-            usd_rub_rate = last_rate
-            is_estimated = True
-
-        now = datetime.now(ZoneInfo("Europe/Moscow"))
-        document = {
-            "package_id": package_id,
-            "type_id": type_id,
-            "weight_kg": float(weight_kg),
-            "value_usd": float(value_usd),
-            "usd_rub_rate": float(usd_rub_rate),
-            "is_estimated": is_estimated,
-            "created_at": now,
-            "day_key": now.strftime("%Y-%m-%d"),
-            "hour": now.hour,
-        }
-
-        buffer.append(document)
-
-        if len(buffer) >= BATCH_SIZE:
-            push_buffer()
+            logger.error("Нет доступного курса USD — отмена записи")
+            return
+
+        document = _build_log_document(
+            package_id, type_id, weight_kg, value_usd, usd_rub_rate, is_estimated
+        )
+        delivery_log_buffer.add(document)
 
     except Exception as e:
         logger.error(f"Ошибка записи package_id={package_id}: {str(e)}")
 
 
-def get_last_saved_rate() -> Optional[float]:
-    """Возвращает последний сохранённый курс из MongoDB"""
-    db = mongo_manager_sync.get_mongodb()
-    last_entry = db.delivery_logs.find_one(
-        {"usd_rub_rate": {"$exists": True}}, sort=[("created_at", -1)]
-    )
-    return last_entry["usd_rub_rate"] if last_entry else None
+@celery_instance.task(name="log_packages_batch")
+def log_packages_batch(records: list[dict], created_at: str | None = None):
+    """
+    Логирует пачку посылок одной задачей.
+    records — словари с ключами package_id, type_id, weight_kg, value_usd
+    и, если посылки созданы в разное время, created_at (ISO); иначе берётся
+    общий created_at. По моменту создания выбирается курс.
+    """
+    try:
+        documents = []
+        for record in records:
+            usd_rub_rate, is_estimated = _rate_at(record.get("created_at", created_at))
+            if usd_rub_rate is None:
+                continue
+            documents.append(
+                _build_log_document(
+                    record["package_id"],
+                    record["type_id"],
+                    record["weight_kg"],
+                    record["value_usd"],
+                    usd_rub_rate,
+                    is_estimated,
+                )
+            )
+        if len(documents) < len(records):
+            logger.error(
+                f"Нет доступного курса USD — отмена записи "
+                f"{len(records) - len(documents)} посылок"
+            )
+        delivery_log_buffer.add_many(documents)
+
+    except Exception as e:
+        logger.error(f"Ошибка пакетной записи {len(records)} посылок: {str(e)}")
+
+
+@celery_instance.task(name="archive_delivery_logs")
+def archive_delivery_logs():
+    """Перенос сырых логов старше срока хранения в архив"""
+    before = retention_cutoff()
+    if before is None:
+        return 0
+    return archive_old_logs(mongo_manager_sync.get_mongodb(), before)
 
 
 @celery_instance.task(name="set_usd_course")
 def set_usd_course():
-    update_usd_rate_from_cbr()
+    # Изменение считаем от курса последнего пересчёта, а не от прошлого
+    # запроса к ЦБ — иначе медленный дрейф курса никогда не дойдёт до порога
+    previous_rate = (
+        last_repriced_rate(redis_manager_sync.redis)
+        or usd_rate_provider.get_last_saved_rate()
+    )
+    rate = update_usd_rate_from_cbr()
+    if rate is None or previous_rate is None:
+        return
+    if is_material_change(previous_rate, rate):
+        logger.info(f"Курс USD изменился {previous_rate} → {rate}: пересчёт стоимостей")
+        start_repricing.delay(str(rate))
+
+
+@celery_instance.task(name="start_repricing")
+def start_repricing(usd_rub_rate: str | None = None):
+    """
+    Ставит пересчёт стоимостей за окно REPRICE_WINDOW_DAYS по курсу
+    usd_rub_rate (по умолчанию — текущему) и запускает его
+    """
+    rate = (
+        Decimal(usd_rub_rate)
+        if usd_rub_rate is not None
+        else usd_rate_provider.get_current_rate()
+    )
+    if rate is None:
+        logger.warning("Нет курса USD — пересчёт стоимостей отменён")
+        return
+    job_id = start_job(redis_manager_sync.redis, rate, reprice_since())
+    logger.info(f"Поставлен пересчёт стоимостей {job_id} по курсу {rate}")
+    reprice_delivery_costs.delay()
+
+
+@celery_instance.task(name="reprice_delivery_costs")
+def reprice_delivery_costs():
+    """
+    Выполняет или продолжает с контрольной точки пересчёт стоимостей.
+    Запускается из start_repricing и периодически — чтобы подхватить
+    задание, прерванное падением воркера.
+    """
+    redis = redis_manager_sync.redis
+    lock_token = acquire_lock(redis, REPRICE_LOCK_KEY, REPRICE_LOCK_TTL)
+    if lock_token is None:
+        # Уже идущий пересчёт сам перейдёт к новому заданию
+        return
+    try:
+        return worker_runtime.run(
+            run_repricing(worker_runtime.session_maker, redis, lock_token)
+        )
+    finally:
+        release_lock(redis, REPRICE_LOCK_KEY, lock_token)
+
+
+async def _get_pending_cost_ids_async(limit: int) -> list[int]:
+    async with DB_Manager(session_factory=worker_runtime.session_maker) as db:
+        return await db.packages.get_pending_cost_ids(limit)
 
 
-async def _update_delivery_costs_async(usd_rub_rate: Decimal):
-    async with DB_Manager(session_factory=async_session_maker_null) as db:
-        updated_count = await db.packages.update_costs(usd_rub_rate)
+async def _price_with_engine(db, rate_series, id_from: int, id_to: int) -> int:
+    """Стоимости диапазона считаются в NumPy и записываются пачками UPDATE"""
+    rows = await db.packages.get_pending_for_pricing(id_from, id_to)
+    if not rows:
+        return 0
+    ids, weight_g, value_cents, type_ids, times_us = (
+        np.array(column, dtype=np.int64) for column in zip(*rows)
+    )
+    kopecks = pricing_engine.costs_kopecks(
+        weight_g, value_cents, type_ids, pricing_engine.rates_for(times_us, rate_series)
+    )
+    return await db.packages.set_costs(ids.tolist(), kopecks_to_decimal(kopecks))
+
+
+async def _update_delivery_costs_async(id_from: int, id_to: int) -> int:
+    """Считает посылки диапазона по курсам на момент их создания"""
+    async with DB_Manager(session_factory=worker_runtime.session_maker) as db:
+        start, end = await db.packages.get_pending_created_range(id_from, id_to)
+        if start is None:
+            return 0
+        rate_series = usd_rate_provider.get_rate_series(start, end)
+        if not rate_series:
+            logger.warning(f"Нет истории курса USD для id {id_from}..{id_to}")
+            return 0
+
+        updated_count = None
+        if settings.PRICING_ENGINE == "numpy":
+            try:
+                updated_count = await _price_with_engine(
+                    db, rate_series, id_from, id_to
+                )
+            except ValueError as e:
+                logger.warning(f"id {id_from}..{id_to} считаем в SQL: {e}")
+        if updated_count is None:
+            updated_count = await db.packages.update_costs(rate_series, id_from, id_to)
         if updated_count > 0:
             await db.commit()
-        logger.info(f"Обновлено стоимостей доставок: {updated_count}")
+        return updated_count
+
+
+def split_ids(ids: list[int], chunk_size: int) -> list[tuple[int, int]]:
+    """Делит отсортированные id на отрезки не больше чем по chunk_size посылок"""
+    return [
+        (ids[start], ids[min(start + chunk_size, len(ids)) - 1])
+        for start in range(0, len(ids), chunk_size)
+    ]
 
 
 @celery_instance.task(name="set_delivery_costs")
 def set_delivery_costs():
-    usd_rub_rate = get_usd_rate()
-    if usd_rub_rate is None:
+    """
+    Досчёт посылок, которым не досталось стоимости при создании (не было
+    курса). Берёт до COST_SWEEP_LIMIT таких посылок по индексу, раскладывает
+    на диапазоны id и пересчитывает их параллельно: каждый диапазон —
+    отдельная задача с короткой транзакцией.
+    """
+    if usd_rate_provider.get_last_saved_rate() is None:
         logger.warning("Нет курса USD — обновление стоимостей отменено")
         return
-    async_to_sync(_update_delivery_costs_async)(usd_rub_rate)
+
+    lock_token = acquire_lock(
+        redis_manager_sync.redis, DELIVERY_COSTS_LOCK_KEY, DELIVERY_COSTS_LOCK_TTL
+    )
+    if lock_token is None:
+        logger.info("Пересчёт стоимостей уже выполняется — пропускаем")
+        return
+
+    try:
+        ids = worker_runtime.run(_get_pending_cost_ids_async(COST_SWEEP_LIMIT))
+        if not ids:
+            release_lock(redis_manager_sync.redis, DELIVERY_COSTS_LOCK_KEY, lock_token)
+            logger.info("Нет посылок без стоимости доставки")
+            return
+
+        ranges = split_ids(ids, COST_CHUNK_SIZE)
+        redis_manager_sync.redis.hset(
+            DELIVERY_COSTS_PROGRESS_KEY,
+            mapping={
+                "status": "running",
+                "total_chunks": len(ranges),
+                "done_chunks": 0,
+                "updated": 0,
+                "started_at": datetime.now(ZoneInfo("Europe/Moscow")).isoformat(),
+            },
+        )
+        logger.info(
+            f"Досчёт стоимостей: {len(ids)} посылок, id {ids[0]}..{ids[-1]}, "
+            f"{len(ranges)} диапазонов"
+        )
+
+        # Если упадёт хоть один диапазон, callback не вызовется — тогда
+        # блокировку снимает errback fail_delivery_costs. Токен едет с chord:
+        # запоздавший callback не снимет блокировку следующего прохода
+        callback = finish_delivery_costs.s(lock_token=lock_token).on_error(
+            fail_delivery_costs.s(lock_token=lock_token)
+        )
+        chord(
+            [update_delivery_costs_chunk.s(id_from, id_to) for id_from, id_to in ranges]
+        )(callback)
+    except Exception:
+        _finish_delivery_costs_progress(lock_token, "failed")
+        raise
+
+
+@celery_instance.task(name="update_delivery_costs_chunk")
+def update_delivery_costs_chunk(id_from: int, id_to: int) -> int:
+    """Пересчитывает стоимости в одном диапазоне id"""
+    updated_count = worker_runtime.run(_update_delivery_costs_async(id_from, id_to))
+
+    pipe = redis_manager_sync.redis.pipeline()
+    pipe.hincrby(DELIVERY_COSTS_PROGRESS_KEY, "done_chunks", 1)
+    pipe.hincrby(DELIVERY_COSTS_PROGRESS_KEY, "updated", updated_count)
+    pipe.execute()
+
+    return updated_count
+
+
+def _finish_delivery_costs_progress(lock_token: str, status: str) -> bool:
+    """
+    Снимает блокировку и фиксирует итог. Если блокировка уже не наша (TTL
+    истёк и идёт следующий проход), не трогает ни её, ни его прогресс.
+    """
+    if not release_lock(redis_manager_sync.redis, DELIVERY_COSTS_LOCK_KEY, lock_token):
+        logger.warning("Блокировка досчёта стоимостей истекла до его окончания")
+        return False
+    redis_manager_sync.redis.hset(
+        DELIVERY_COSTS_PROGRESS_KEY,
+        mapping={
+            "status": status,
+            "finished_at": datetime.now(ZoneInfo("Europe/Moscow")).isoformat(),
+        },
+    )
+    return True
+
+
+@celery_instance.task(name="fail_delivery_costs")
+def fail_delivery_costs(request, exc, traceback, lock_token: str):
+    """Errback chord: досчёт упал — снимаем блокировку до следующего прохода"""
+    logger.error(f"Досчёт стоимостей прерван ошибкой: {exc}")
+    _finish_delivery_costs_progress(lock_token, "failed")
+
+
+@celery_instance.task(name="finish_delivery_costs")
+def finish_delivery_costs(results: list[int], lock_token: str):
+    """Callback chord: фиксирует итог пересчёта и снимает блокировку"""
+    updated_count = sum(results)
+    _finish_delivery_costs_progress(lock_token, "done")
+    logger.info(f"Обновлено стоимостей доставок: {updated_count}")
@@ -0,0 +1,93 @@
+"""
+Перенос сырых логов из delivery_logs в time-series коллекцию delivery_logs_ts.
+
+    python -m app.tasks.timeseries_migration --batch-size 10000
+
+Логи копируются пачками по возрастанию _id, последний перенесённый _id
+сохраняется в коллекции migrations — прерванный перенос продолжается с места
+остановки, а уже скопированные документы не дублируются.
+
+Порядок перехода:
+1. запустить перенос на работающей системе;
+2. включить DELIVERY_LOGS_TIMESERIES=true и перезапустить API и воркеры;
+3. запустить перенос ещё раз с --overlap-minutes 10, чтобы докопировать логи,
+   попавшие в старую коллекцию из буфера уже после первого прохода.
+"""
+
+import argparse
+import logging
+from datetime import timedelta
+
+from bson import ObjectId
+
+from app.setup import mongo_manager_sync
+from app.utils.delivery_logs_storage import (
+    PLAIN_COLLECTION,
+    TIMESERIES_COLLECTION,
+    create_timeseries_collection,
+    find_existing_ids,
+    to_timeseries,
+)
+
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_ID = "delivery_logs_timeseries"
+
+
+def migrate_to_timeseries(db, batch_size: int = 10000, overlap_minutes: int = 0):
+    """Копирует логи в time-series коллекцию. Возвращает число новых документов"""
+    create_timeseries_collection(db)
+    source = db[PLAIN_COLLECTION]
+    target = db[TIMESERIES_COLLECTION]
+
+    checkpoint = db.migrations.find_one({"_id": CHECKPOINT_ID})
+    last_id = checkpoint["last_id"] if checkpoint else None
+    if last_id is not None and overlap_minutes:
+        last_id = ObjectId.from_datetime(
+            last_id.generation_time - timedelta(minutes=overlap_minutes)
+        )
+
+    copied = 0
+    while True:
+        query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+        batch = list(source.find(query, sort=[("_id", 1)], limit=batch_size))
+        if not batch:
+            break
+
+        existing = find_existing_ids(target, batch)
+        documents = [
+            to_timeseries(document)
+            for document in batch
+            if document["_id"] not in existing
+        ]
+        if documents:
+            target.insert_many(documents, ordered=False)
+        copied += len(documents)
+
+        last_id = batch[-1]["_id"]
+        db.migrations.update_one(
+            {"_id": CHECKPOINT_ID}, {"$set": {"last_id": last_id}}, upsert=True
+        )
+        logger.info(f"Перенесено {copied} логов, последний _id={last_id}")
+
+    return copied
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(
+        description="Перенос логов доставок в time-series коллекцию"
+    )
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument(
+        "--overlap-minutes",
+        type=int,
+        default=0,
+        help="Перепроверить логи за столько минут до сохранённой позиции",
+    )
+    args = parser.parse_args()
+
+    migrate_to_timeseries(
+        mongo_manager_sync.get_mongodb(), args.batch_size, args.overlap_minutes
+    )
@@ -0,0 +1,63 @@
+import asyncio
+import logging
+from typing import Any, Coroutine, TypeVar
+
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+
+from app.database import make_engine
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class WorkerRuntime:
+    """
+    Событийный цикл и пул соединений MySQL, живущие весь срок процесса воркера.
+
+    Задачи выполняют корутины через run() в одном и том же цикле, поэтому
+    соединения из пула переиспользуются между задачами, а не открываются
+    заново, как с NullPool и async_to_sync.
+    """
+
+    def __init__(self, pool_size: int = 2, max_overflow: int = 2):
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._engine: AsyncEngine | None = None
+        self._session_maker: async_sessionmaker | None = None
+
+    def init(self) -> None:
+        """Вызывается в worker_process_init, уже после fork"""
+        if self._loop is not None:
+            return
+        self._loop = asyncio.new_event_loop()
+        self._engine = make_engine(
+            pool_size=self.pool_size, max_overflow=self.max_overflow
+        )
+        self._session_maker = async_sessionmaker(
+            bind=self._engine, expire_on_commit=False
+        )
+        logger.info("Инициализирован событийный цикл и пул БД воркера")
+
+    @property
+    def session_maker(self) -> async_sessionmaker:
+        self.init()
+        return self._session_maker
+
+    def run(self, coro: Coroutine[Any, Any, T]) -> T:
+        self.init()
+        return self._loop.run_until_complete(coro)
+
+    def shutdown(self) -> None:
+        if self._loop is None:
+            return
+        self._loop.run_until_complete(self._engine.dispose())
+        self._loop.close()
+        self._loop = None
+        self._engine = None
+        self._session_maker = None
+
+
+worker_runtime = WorkerRuntime()
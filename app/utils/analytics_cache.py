@@ -0,0 +1,138 @@
+import json
+import logging
+from datetime import date, datetime, timedelta
+from typing import Any, Awaitable, Callable, Iterable
+from zoneinfo import ZoneInfo
+
+from fastapi.encoders import jsonable_encoder
+
+from app.connectors.redis_connector import RedisManager
+from app.setup import redis_manager
+
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "analytics-cache"
+# Тег записей без ограничения по датам: сбрасывается при любой записи логов
+OPEN_RANGE_TAG = "*"
+# Диапазоны длиннее этого помечаются как открытые, чтобы не плодить теги
+MAX_TAGGED_DAYS = 400
+
+
+def build_cache_key(endpoint: str, params: dict[str, Any]) -> str:
+    """Ключ из имени эндпоинта и всех параметров запроса"""
+    query = "&".join(
+        f"{name}={'' if value is None else value}"
+        for name, value in sorted(params.items())
+    )
+    return f"{PREFIX}:{endpoint}:{query}"
+
+
+def _tag_key(tag: str) -> str:
+    return f"{PREFIX}:tag:{tag}"
+
+
+def days_between(start: date, end: date) -> list[str] | None:
+    """Дни диапазона в формате day_key; None для слишком длинных диапазонов"""
+    length = (end - start).days + 1
+    if length > MAX_TAGGED_DAYS:
+        return None
+    return [str(start + timedelta(days=i)) for i in range(max(length, 0))]
+
+
+class AnalyticsCache:
+    """
+    Кэш ответов аналитики в Redis.
+
+    Записи помечаются днями, от которых зависят, и удаляются при записи
+    новых логов за эти дни. Закрытые (прошедшие) дни живут дольше текущего.
+    """
+
+    def __init__(
+        self,
+        redis_manager: RedisManager,
+        today_ttl: int = 60,
+        closed_ttl: int = 24 * 60 * 60,
+    ):
+        self._redis_manager = redis_manager
+        self.today_ttl = today_ttl
+        self.closed_ttl = closed_ttl
+
+    def ttl_for(self, days: list[str] | None) -> int:
+        if not days:
+            return self.today_ttl
+        today = str(datetime.now(ZoneInfo("Europe/Moscow")).date())
+        return self.closed_ttl if max(days) < today else self.today_ttl
+
+    async def get_or_set(
+        self,
+        key: str,
+        days: list[str] | None,
+        loader: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """
+        Возвращает ответ из кэша или вычисляет его через loader.
+        days=None — ответ зависит от любых дней (открытый диапазон).
+        """
+        try:
+            await self._redis_manager.connect()
+            cached = await self._redis_manager.get(key)
+        except Exception as e:
+            logger.warning(f"Кэш аналитики недоступен: {e}")
+            return await loader()
+
+        if cached is not None:
+            return json.loads(cached)
+
+        value = await loader()
+
+        ttl = self.ttl_for(days)
+        tags = days if days is not None else [OPEN_RANGE_TAG]
+        try:
+            pipe = self._redis_manager.redis.pipeline()
+            pipe.set(key, json.dumps(jsonable_encoder(value)), ex=ttl)
+            for tag in tags:
+                pipe.sadd(_tag_key(tag), key)
+                pipe.expire(_tag_key(tag), self.closed_ttl)
+            await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Не удалось записать кэш аналитики: {e}")
+        return value
+
+    async def invalidate_days(self, days: Iterable[str]) -> None:
+        await self._redis_manager.connect()
+        redis = self._redis_manager.redis
+        for tag in [*days, OPEN_RANGE_TAG]:
+            keys = await redis.smembers(_tag_key(tag))
+            await redis.delete(_tag_key(tag), *keys)
+
+
+def invalidate_analytics_days(redis, days: Iterable[str]) -> None:
+    """Синхронный сброс кэша за дни — вызывается воркером после записи логов"""
+    pipe = redis.pipeline()
+    tags = [*days, OPEN_RANGE_TAG]
+    for tag in tags:
+        pipe.smembers(_tag_key(tag))
+    members = pipe.execute()
+
+    pipe = redis.pipeline()
+    for tag, keys in zip(tags, members):
+        pipe.delete(_tag_key(tag), *keys)
+    pipe.execute()
+
+
+def invalidate_analytics_range(redis, start: date | None, end: date | None) -> None:
+    """
+    Синхронный сброс кэша за диапазон дней. Открытый или слишком длинный
+    диапазон сбрасывает весь кэш аналитики.
+    """
+    days = days_between(start, end) if start and end else None
+    if days is not None:
+        invalidate_analytics_days(redis, days)
+        return
+    keys = list(redis.scan_iter(match=f"{PREFIX}:*", count=1000))
+    if keys:
+        redis.delete(*keys)
+
+
+analytics_cache = AnalyticsCache(redis_manager)
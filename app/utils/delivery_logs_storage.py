@@ -0,0 +1,108 @@
+"""
+Формат хранения сырых логов доставок.
+
+По умолчанию логи лежат в обычной коллекции delivery_logs как есть.
+При DELIVERY_LOGS_TIMESERIES=true — в time-series коллекции
+delivery_logs_ts (timeField created_at, metaField meta={type_id}): Mongo
+хранит их сжатыми корзинами по времени, а day_key и hour не записываются,
+а вычисляются из created_at. Перенос данных: python -m app.tasks.timeseries_migration
+"""
+
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+from app.config import settings
+
+
+MOSCOW_TZ = ZoneInfo("Europe/Moscow")
+
+PLAIN_COLLECTION = "delivery_logs"
+TIMESERIES_COLLECTION = "delivery_logs_ts"
+
+TIMESERIES = settings.DELIVERY_LOGS_TIMESERIES
+LOGS_COLLECTION = TIMESERIES_COLLECTION if TIMESERIES else PLAIN_COLLECTION
+# Путь к типу посылки в запросах к сырым логам
+TYPE_FIELD = "meta.type_id" if TIMESERIES else "type_id"
+
+TIMESERIES_OPTIONS = {
+    "timeField": "created_at",
+    "metaField": "meta",
+    "granularity": "minutes",
+}
+
+
+def to_timeseries(document: dict) -> dict:
+    """Документ лога в формате time-series коллекции"""
+    stored = {
+        key: value
+        for key, value in document.items()
+        if key not in ("type_id", "day_key", "hour")
+    }
+    stored["meta"] = {"type_id": document["type_id"]}
+    return stored
+
+
+def to_storage(document: dict) -> dict:
+    return to_timeseries(document) if TIMESERIES else document
+
+
+def from_storage(document: dict) -> dict:
+    """Документ из коллекции в прежнем формате: type_id, day_key и hour"""
+    if "meta" not in document:
+        return document
+    document["type_id"] = document.pop("meta")["type_id"]
+    moscow = _to_moscow(document["created_at"])
+    document["day_key"] = moscow.strftime("%Y-%m-%d")
+    document["hour"] = moscow.hour
+    return document
+
+
+def _to_moscow(created_at: datetime) -> datetime:
+    # pymongo отдаёт наивное время в UTC
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return created_at.astimezone(MOSCOW_TZ)
+
+
+def day_key_of(created_at: datetime) -> str:
+    """День (day_key) по Москве, к которому относится момент created_at"""
+    return _to_moscow(created_at).strftime("%Y-%m-%d")
+
+
+def find_existing_ids(collection, documents: list[dict]) -> set:
+    """
+    _id документов, уже записанных в коллекцию. Поиск ограничен диапазоном
+    created_at пачки, чтобы в time-series коллекции читались только её корзины.
+    """
+    times = [document["created_at"] for document in documents]
+    return {
+        document["_id"]
+        for document in collection.find(
+            {
+                "_id": {"$in": [document["_id"] for document in documents]},
+                "created_at": {"$gte": min(times), "$lte": max(times)},
+            },
+            projection={"_id": 1},
+        )
+    }
+
+
+def day_start(day_key: str) -> datetime:
+    """Начало дня day_key по Москве"""
+    return datetime.fromisoformat(day_key).replace(tzinfo=MOSCOW_TZ)
+
+
+def timeseries_create_options() -> dict:
+    """Аргументы create_collection для time-series коллекции логов"""
+    options: dict = {"timeseries": TIMESERIES_OPTIONS}
+    retention_days = settings.DELIVERY_LOGS_RETENTION_DAYS
+    if retention_days and settings.DELIVERY_LOGS_RETENTION_MODE == "ttl":
+        # В time-series коллекции срок хранения задаётся опцией, а не TTL-индексом
+        options["expireAfterSeconds"] = retention_days * 24 * 60 * 60
+    return options
+
+
+def create_timeseries_collection(db, name: str = TIMESERIES_COLLECTION) -> None:
+    """Создаёт time-series коллекцию (синхронный pymongo), если её ещё нет"""
+    if name not in db.list_collection_names(filter={"name": name}):
+        db.create_collection(name, **timeseries_create_options())
@@ -0,0 +1,64 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterator
+
+
+# Колонки CSV в порядке вывода
+EXPORT_FIELDS = (
+    "id",
+    "package_id",
+    "type_id",
+    "weight_kg",
+    "value_usd",
+    "usd_rub_rate",
+    "delivery_cost_rub",
+    "is_estimated",
+    "created_at",
+    "day_key",
+    "hour",
+)
+# Строк в одном отправляемом куске ответа
+LINES_PER_CHUNK = 500
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+async def ndjson_chunks(
+    docs: AsyncIterator[dict], lines_per_chunk: int = LINES_PER_CHUNK
+) -> AsyncIterator[bytes]:
+    lines = []
+    async for doc in docs:
+        lines.append(json.dumps(doc, default=_default, ensure_ascii=False))
+        if len(lines) >= lines_per_chunk:
+            yield ("\n".join(lines) + "\n").encode()
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode()
+
+
+async def csv_chunks(
+    docs: AsyncIterator[dict], lines_per_chunk: int = LINES_PER_CHUNK
+) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    rows = 0
+    async for doc in docs:
+        created_at = doc.get("created_at")
+        if isinstance(created_at, datetime):
+            doc["created_at"] = created_at.isoformat()
+        writer.writerow(doc)
+        rows += 1
+        if rows >= lines_per_chunk:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+            rows = 0
+    if buffer.tell():
+        yield buffer.getvalue().encode()
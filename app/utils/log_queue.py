@@ -0,0 +1,24 @@
+import atexit
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+
+def setup_queue_logging(level: int = logging.INFO) -> QueueListener:
+    """
+    Переводит корневой логгер на запись через очередь: обработчик в потоке
+    запроса только кладёт запись в очередь, а форматирование и вывод
+    выполняет отдельный поток QueueListener.
+    """
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter("%(levelname)s:%(name)s:%(message)s"))
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.handlers = [QueueHandler(log_queue)]
+    root.setLevel(level)
+
+    listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
@@ -0,0 +1,289 @@
+import asyncio
+import bisect
+import functools
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable
+
+import redis
+import redis.asyncio as redis_async
+from fastapi.exceptions import RequestValidationError
+from fastapi.routing import APIRoute
+from starlette.concurrency import run_in_threadpool
+from starlette.exceptions import HTTPException as StarletteHTTPException
+
+from app.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "metrics"
+COUNTERS_KEY = f"{PREFIX}:counter"
+HISTOGRAMS_KEY = f"{PREFIX}:histogram"
+GAUGES_KEY = f"{PREFIX}:gauge"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labels(labels: dict[str, str], **extra: str) -> str:
+    items = sorted({**labels, **extra}.items())
+    return ",".join(f'{name}="{value}"' for name, value in items)
+
+
+def _series(name: str, labels: str) -> str:
+    return f"{name}{{{labels}}}" if labels else name
+
+
+class MetricsRegistry:
+    """
+    Метрики в формате Prometheus, общие для всех воркеров uvicorn и Celery.
+
+    Процесс копит значения в памяти (несколько операций со словарём под
+    блокировкой), а фоновый поток раз в flush_interval секунд прибавляет
+    накопленное к хэшам в Redis одним pipeline. /metrics читает итог из Redis,
+    поэтому значения отстают не больше чем на flush_interval.
+    """
+
+    def __init__(self, flush_interval: float = 5, buckets=DEFAULT_BUCKETS):
+        self.flush_interval = flush_interval
+        self.buckets = tuple(buckets)
+        self._counters: dict[str, float] = defaultdict(float)
+        self._histograms: dict[tuple[str, str], list] = {}
+        self._gauges: dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._redis: redis.Redis | None = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        series = _series(name, _labels(labels))
+        with self._lock:
+            self._counters[series] += value
+
+    def set_gauge(self, name: str, value: float, **labels: str) -> None:
+        series = _series(name, _labels(labels))
+        with self._lock:
+            self._gauges[series] = value
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        key = (name, _labels(labels))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._histograms.get(key)
+            if state is None:
+                # Счётчики по корзинам (+Inf последней), сумма, количество
+                state = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                self._histograms[key] = state
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def timer(self, name: str, **labels: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def timed(self, name: str, **labels: str) -> Callable:
+        """
+        Декоратор: время выполнения функции (обычной или async) в гистограмму
+        name с меткой method=<Класс.метод>.
+        """
+
+        def decorator(func):
+            method_labels = {"method": func.__qualname__, **labels}
+
+            if asyncio.iscoroutinefunction(func):
+
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    with self.timer(name, **method_labels):
+                        return await func(*args, **kwargs)
+
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(name, **method_labels):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def _drain(self):
+        with self._lock:
+            counters, self._counters = self._counters, defaultdict(float)
+            histograms, self._histograms = self._histograms, {}
+            gauges, self._gauges = self._gauges, {}
+        return counters, histograms, gauges
+
+    def flush(self) -> None:
+        """Прибавляет накопленное в процессе к общим значениям в Redis"""
+        counters, histograms, gauges = self._drain()
+        if not (counters or histograms or gauges):
+            return
+
+        if self._redis is None:
+            self._redis = redis.Redis(
+                host=settings.REDIS_HOST, port=settings.REDIS_PORT
+            )
+        pipe = self._redis.pipeline(transaction=False)
+        for series, value in counters.items():
+            pipe.hincrbyfloat(COUNTERS_KEY, series, value)
+        for (name, labels), (counts, total, count) in histograms.items():
+            cumulative = 0
+            for le, bucket_count in zip([*self.buckets, "+Inf"], counts):
+                cumulative += bucket_count
+                bucket_labels = ",".join(filter(None, [labels, f'le="{le}"']))
+                pipe.hincrby(
+                    HISTOGRAMS_KEY, _series(f"{name}_bucket", bucket_labels), cumulative
+                )
+            pipe.hincrbyfloat(HISTOGRAMS_KEY, _series(f"{name}_sum", labels), total)
+            pipe.hincrby(HISTOGRAMS_KEY, _series(f"{name}_count", labels), count)
+        if gauges:
+            pipe.hset(GAUGES_KEY, mapping=gauges)
+        pipe.execute()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning(f"Не удалось выгрузить метрики в Redis: {e}")
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="metrics-flusher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=self.flush_interval)
+        self._thread = None
+        try:
+            self.flush()
+        except Exception as e:
+            logger.warning(f"Не удалось выгрузить метрики в Redis: {e}")
+
+
+metrics = MetricsRegistry(flush_interval=settings.METRICS_FLUSH_INTERVAL)
+
+
+def _metric_name(series: str) -> str:
+    return series.split("{", 1)[0]
+
+
+def _sort_key(series: str):
+    """Корзины гистограммы — по возрастанию le, а не как строки"""
+    head, sep, le = series.partition('le="')
+    if not sep:
+        return series, 0.0
+    le = le.split('"', 1)[0]
+    return head, float("inf") if le == "+Inf" else float(le)
+
+
+async def render_metrics(redis_client) -> str:
+    """Текст для /metrics в формате Prometheus exposition"""
+    counters, histograms, gauges = await asyncio.gather(
+        redis_client.hgetall(COUNTERS_KEY),
+        redis_client.hgetall(HISTOGRAMS_KEY),
+        redis_client.hgetall(GAUGES_KEY),
+    )
+    lines = []
+    for kind, values in (
+        ("counter", counters),
+        ("histogram", histograms),
+        ("gauge", gauges),
+    ):
+        declared = set()
+        for raw_series, raw_value in sorted(
+            values.items(), key=lambda item: _sort_key(item[0].decode())
+        ):
+            series = raw_series.decode()
+            name = _metric_name(series)
+            if kind == "histogram":
+                name = name.rsplit("_", 1)[0]
+            if name not in declared:
+                declared.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{series} {raw_value.decode()}")
+    return "\n".join(lines) + "\n"
+
+
+def _find_exception_handler(app, exc: Exception) -> Callable | None:
+    """Обработчик исключения, как его выбирает Starlette: по MRO класса"""
+    for cls in type(exc).__mro__:
+        if cls in app.exception_handlers:
+            return app.exception_handlers[cls]
+    return None
+
+
+class MetricsRoute(APIRoute):
+    """Маршрут, который пишет время обработки запроса в гистограмму"""
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        method = next(iter(self.methods), "")
+        path = self.path
+
+        async def timed_handler(request):
+            started = time.perf_counter()
+            status_code = 500
+            try:
+                response = await handler(request)
+                status_code = response.status_code
+                return response
+            except StarletteHTTPException as e:
+                status_code = e.status_code
+                raise
+            except RequestValidationError:
+                status_code = 422
+                raise
+            except Exception as e:
+                # Исключение с обработчиком приложения — не 500: отдаём ответ
+                # обработчика сами, чтобы записать его настоящий статус
+                exception_handler = _find_exception_handler(request.app, e)
+                if exception_handler is None:
+                    raise
+                if asyncio.iscoroutinefunction(exception_handler):
+                    response = await exception_handler(request, e)
+                else:
+                    response = await run_in_threadpool(exception_handler, request, e)
+                status_code = response.status_code
+                return response
+            finally:
+                metrics.observe(
+                    "http_request_duration_seconds",
+                    time.perf_counter() - started,
+                    method=method,
+                    path=path,
+                    status=str(status_code),
+                )
+
+        return timed_handler
+
+
+class CountingConnection(redis.Connection):
+    """Соединение Redis, считающее отправленные пакеты команд (round-trip'ы)"""
+
+    def send_packed_command(self, command, check_health=True):
+        metrics.inc("redis_roundtrips_total", client="sync")
+        return super().send_packed_command(command, check_health)
+
+
+class AsyncCountingConnection(redis_async.Connection):
+    async def send_packed_command(self, command, check_health=True):
+        metrics.inc("redis_roundtrips_total", client="async")
+        return await super().send_packed_command(command, check_health)
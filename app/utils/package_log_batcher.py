@@ -0,0 +1,106 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+from app.config import settings
+from app.tasks.tasks import log_packages_batch
+from app.utils.metrics import metrics
+from app.utils.task_enqueuer import task_enqueuer
+
+
+logger = logging.getLogger(__name__)
+
+# Сигнал остановки в очереди: всё, что пришло до него, будет отправлено
+_STOP = object()
+
+
+class PackageLogBatcher:
+    """
+    Копит события логирования посылок в процессе API и отправляет их в Celery
+    одной задачей log_packages_batch на пачку: когда набралось max_size
+    записей или прошло max_delay секунд с первой записи пачки.
+
+    Каждая запись несёт свой created_at, поэтому курс выбирается так же,
+    как при отдельной задаче на посылку. При остановке остаток отправляется.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 500,
+        max_delay: float = 0.5,
+        send: Callable[[list[dict]], Awaitable[None]] | None = None,
+    ):
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self._send = send or self._send_to_celery
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+        # Пачка, которая сейчас набирается
+        self._pending: list[dict] = []
+
+    @staticmethod
+    async def _send_to_celery(records: list[dict]) -> None:
+        await task_enqueuer.enqueue(log_packages_batch, records)
+
+    async def add(self, record: dict) -> None:
+        if self._queue is None:
+            # Батчер не запущен (скрипты, тесты без lifespan) — отправляем сразу
+            await self._flush([record])
+            return
+        self._queue.put_nowait(record)
+
+    async def _flush(self, records: list[dict]) -> None:
+        try:
+            await self._send(records)
+            metrics.inc("package_log_batches_total")
+            metrics.inc("package_log_records_total", len(records))
+        except Exception as e:
+            logger.error(f"Не удалось отправить пачку из {len(records)} логов: {e}")
+
+    async def _collect(self) -> bool:
+        """
+        Ждёт первую запись и добирает пачку до max_size или до max_delay.
+        Возвращает False, если пришёл сигнал остановки.
+        """
+        record = await self._queue.get()
+        if record is _STOP:
+            return False
+        self._pending.append(record)
+        try:
+            async with asyncio.timeout(self.max_delay):
+                while len(self._pending) < self.max_size:
+                    record = await self._queue.get()
+                    if record is _STOP:
+                        return False
+                    self._pending.append(record)
+        except TimeoutError:
+            pass
+        return True
+
+    async def _run(self) -> None:
+        running = True
+        while running:
+            running = await self._collect()
+            records, self._pending = self._pending, []
+            for start in range(0, len(records), self.max_size):
+                await self._flush(records[start : start + self.max_size])
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Отправляет всё, что накопилось, и останавливает фоновую задачу"""
+        if self._task is None:
+            return
+        self._queue.put_nowait(_STOP)
+        await self._task
+        self._task = None
+        self._queue = None
+
+
+package_log_batcher = PackageLogBatcher(
+    max_size=settings.LOG_BATCH_MAX_SIZE, max_delay=settings.LOG_BATCH_MAX_DELAY
+)
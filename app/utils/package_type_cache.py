@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Iterable
+
+from app.connectors.redis_connector import RedisManager
+from app.models.package_type import PackageTypeORM
+from app.repositories.package_types import PackageTypeRepository
+from app.schemas.package_types import PackageTypeRead
+
+
+logger = logging.getLogger(__name__)
+
+INVALIDATE_CHANNEL = "package_types:invalidate"
+
+
+class PackageTypeCache:
+    """
+    LRU-кэш типов посылок в памяти процесса с TTL.
+
+    Таблица маленькая и меняется редко, поэтому обычно лежит в кэше целиком.
+    При добавлении типа все процессы получают сообщение в Redis pub/sub
+    и сбрасывают кэш; TTL страхует от потерянных сообщений.
+    """
+
+    def __init__(self, ttl: float = 300, maxsize: int = 1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._types: OrderedDict[int, PackageTypeRead] = OrderedDict()
+        self._loaded_at: float | None = None
+        # Все строки таблицы в кэше — можно отдавать полный список
+        self._complete = False
+        # Растёт при каждом сбросе: загрузка, начатая до сброса, не сохраняется
+        self._generation = 0
+        self._lock = asyncio.Lock()
+
+    def invalidate(self) -> None:
+        self._types.clear()
+        self._loaded_at = None
+        self._complete = False
+        self._generation += 1
+
+    def _is_fresh(self) -> bool:
+        return (
+            self._loaded_at is not None
+            and time.monotonic() - self._loaded_at < self.ttl
+        )
+
+    def _remember(self, types: Iterable[PackageTypeRead]) -> None:
+        for package_type in types:
+            self._types[package_type.id] = package_type
+            self._types.move_to_end(package_type.id)
+        while len(self._types) > self.maxsize:
+            self._types.popitem(last=False)
+            self._complete = False
+
+    async def _reload(self, session) -> list[PackageTypeRead]:
+        async with self._lock:
+            # Пока ждали блокировку, таблицу мог загрузить другой запрос
+            if self._is_fresh() and self._complete:
+                return sorted(self._types.values(), key=lambda t: t.id)
+            generation = self._generation
+            types = await PackageTypeRepository(session).get_all()
+            if generation == self._generation:
+                self._types = OrderedDict()
+                self._complete = True
+                self._remember(types)
+                self._loaded_at = time.monotonic()
+            return types
+
+    async def get_all(self, session) -> list[PackageTypeRead]:
+        if self._is_fresh() and self._complete:
+            return sorted(self._types.values(), key=lambda t: t.id)
+        return await self._reload(session)
+
+    async def get_many(self, session, ids: Iterable[int]) -> dict[int, PackageTypeRead]:
+        """
+        Типы по id. Если таблица больше maxsize, часть типов в кэше не
+        помещается — недостающие дочитываются по первичному ключу.
+        """
+        ids = set(ids)
+        if not self._is_fresh():
+            await self._reload(session)
+
+        found = {}
+        for type_id in ids:
+            package_type = self._types.get(type_id)
+            if package_type is not None:
+                self._types.move_to_end(type_id)
+                found[type_id] = package_type
+
+        missing = ids - found.keys()
+        if missing:
+            generation = self._generation
+            types = await PackageTypeRepository(session).get_filtered(
+                PackageTypeORM.id.in_(missing)
+            )
+            if generation == self._generation:
+                self._remember(types)
+            found.update((package_type.id, package_type) for package_type in types)
+        return found
+
+    async def find_ids_by_name(self, session, name_part: str) -> list[int]:
+        """id типов, в названии которых есть name_part (без учёта регистра)"""
+        name_part = name_part.casefold()
+        return [
+            package_type.id
+            for package_type in await self.get_all(session)
+            if name_part in package_type.name.casefold()
+        ]
+
+    async def publish_invalidation(self, redis_manager: RedisManager) -> None:
+        self.invalidate()
+        try:
+            await redis_manager.publish(INVALIDATE_CHANNEL, "1")
+        except Exception as e:
+            logger.warning(f"Не удалось разослать сброс кэша типов посылок: {e}")
+
+    async def listen(self, redis_manager: RedisManager) -> None:
+        """Фоновая задача: сбрасывает кэш по сообщениям из Redis pub/sub"""
+        while True:
+            pubsub = redis_manager.redis.pubsub()
+            try:
+                await pubsub.subscribe(INVALIDATE_CHANNEL)
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self.invalidate()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Подписка на сброс кэша типов посылок прервана: {e}")
+                self.invalidate()
+                await asyncio.sleep(5)
+            finally:
+                await pubsub.aclose()
+
+
+package_type_cache = PackageTypeCache()
@@ -0,0 +1,23 @@
+import base64
+import json
+from typing import Any
+
+from app.exceptions import InvalidCursorError
+
+
+def encode_cursor(payload: dict[str, Any]) -> str:
+    """Упаковывает позицию последней записи страницы в непрозрачный курсор"""
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict[str, Any]:
+    """Распаковывает курсор, полученный от клиента"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidCursorError
+    if not isinstance(payload, dict):
+        raise InvalidCursorError
+    return payload
@@ -0,0 +1,106 @@
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from app.config import settings
+from app.utils.metrics import metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+def apply_async(task, args: tuple, kwargs: dict) -> None:
+    task.apply_async(args=args, kwargs=kwargs)
+
+
+class TaskEnqueuer:
+    """
+    Постановка задач Celery из async-кода без блокировки event loop.
+
+    apply_async — синхронный вызов брокера, поэтому задачи публикуются
+    из отдельного пула потоков. Обработчик запроса только кладёт задачу
+    в ограниченную очередь в памяти и сразу идёт дальше; если брокер
+    тормозит и очередь заполнилась, enqueue ждёт свободного места —
+    так медленный брокер притормаживает приём, а не копит память.
+
+    Пока очередь не запущена (скрипты, тесты без lifespan), enqueue
+    публикует задачу сам, но тоже не в потоке event loop.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 10_000,
+        workers: int = 4,
+        publish: Callable[[Any, tuple, dict], None] = apply_async,
+    ):
+        self.max_size = max_size
+        self.workers = workers
+        self.publish = publish
+        self._queue: asyncio.Queue | None = None
+        self._consumers: list[asyncio.Task] = []
+        self._executor: ThreadPoolExecutor | None = None
+
+    async def enqueue(self, task, *args, **kwargs) -> None:
+        if self._queue is None:
+            await asyncio.to_thread(self._publish, task, args, kwargs)
+            return
+        await self._queue.put((task, args, kwargs))
+        metrics.set_gauge("celery_enqueue_queue_size", self._queue.qsize())
+
+    def _publish(self, task, args: tuple, kwargs: dict) -> None:
+        try:
+            with metrics.timer("celery_enqueue_duration_seconds", task=task.name):
+                self.publish(task, args, kwargs)
+        except Exception as e:
+            metrics.inc("celery_enqueue_errors_total", task=task.name)
+            logger.error(f"Не удалось поставить задачу {task.name}: {e}")
+
+    async def _consume(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            task, args, kwargs = await self._queue.get()
+            try:
+                await loop.run_in_executor(
+                    self._executor,
+                    functools.partial(self._publish, task, args, kwargs),
+                )
+            finally:
+                self._queue.task_done()
+
+    def start(self) -> None:
+        if self._queue is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="celery-enqueue"
+        )
+        self._consumers = [
+            asyncio.create_task(self._consume()) for _ in range(self.workers)
+        ]
+
+    async def stop(self, timeout: float = 10) -> None:
+        """Дожидается публикации очереди (не дольше timeout) и останавливается"""
+        if self._queue is None:
+            return
+        try:
+            async with asyncio.timeout(timeout):
+                await self._queue.join()
+        except TimeoutError:
+            logger.error(
+                f"Брокер не принял {self._queue.qsize()} задач за {timeout} с — "
+                "они потеряны"
+            )
+        for consumer in self._consumers:
+            consumer.cancel()
+        await asyncio.gather(*self._consumers, return_exceptions=True)
+        self._executor.shutdown(wait=True)
+        self._queue = None
+        self._consumers = []
+        self._executor = None
+
+
+task_enqueuer = TaskEnqueuer(
+    max_size=settings.TASK_ENQUEUE_QUEUE_SIZE, workers=settings.TASK_ENQUEUE_WORKERS
+)
@@ -0,0 +1,63 @@
+import asyncio
+import logging
+import time
+from decimal import Decimal
+
+from app.connectors.redis_connector import RedisManager
+from app.tasks.rate_provider import RATE_CHANNEL, RATE_KEY
+
+
+logger = logging.getLogger(__name__)
+
+
+class UsdRateCache:
+    """
+    Текущий курс USD→RUB в процессе API для расчёта стоимости при создании
+    посылки. Курс читается из Redis и держится в памяти до ttl секунд;
+    новый курс приходит сразу по сообщению set_usd_course в Redis pub/sub.
+    Без курса в Redis — None: стоимость досчитает периодическая задача.
+    """
+
+    def __init__(self, ttl: float = 60):
+        self.ttl = ttl
+        self._rate: Decimal | None = None
+        self._expires_at = 0.0
+
+    def invalidate(self) -> None:
+        self._expires_at = 0.0
+
+    def _remember(self, rate: Decimal | None) -> None:
+        self._rate = rate
+        self._expires_at = time.monotonic() + self.ttl
+
+    async def get(self, redis_manager: RedisManager) -> Decimal | None:
+        if time.monotonic() < self._expires_at:
+            return self._rate
+        try:
+            raw = await redis_manager.get(RATE_KEY)
+        except Exception as e:
+            logger.warning(f"Не удалось прочитать курс USD из Redis: {e}")
+            return None
+        self._remember(Decimal(raw.decode()) if raw is not None else None)
+        return self._rate
+
+    async def listen(self, redis_manager: RedisManager) -> None:
+        """Фоновая задача: обновляет курс по сообщениям из Redis pub/sub"""
+        while True:
+            pubsub = redis_manager.redis.pubsub()
+            try:
+                await pubsub.subscribe(RATE_CHANNEL)
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self._remember(Decimal(message["data"].decode()))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Подписка на обновления курса USD прервана: {e}")
+                self.invalidate()
+                await asyncio.sleep(5)
+            finally:
+                await pubsub.aclose()
+
+
+usd_rate_cache = UsdRateCache()
@@ -0,0 +1,71 @@
+"""
+Пропускная способность создания посылок: POST /packages/ по одной против POST /packages/bulk.
+
+Запуск против поднятого сервиса:
+    python -m benchmarks.bench_bulk_insert --url http://localhost:8000 --type-id 1 --count 5000
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+
+
+def make_items(count: int, type_id: int) -> list[dict]:
+    return [
+        {
+            "name": f"bench {i}",
+            "weight_kg": "1.250",
+            "value_usd": "12.50",
+            "type_id": type_id,
+        }
+        for i in range(count)
+    ]
+
+
+async def bench_single(client: httpx.AsyncClient, items: list[dict], concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def post(item: dict):
+        async with semaphore:
+            response = await client.post("/packages/", json=item)
+            response.raise_for_status()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(post(item) for item in items))
+    return time.perf_counter() - started
+
+
+async def bench_bulk(client: httpx.AsyncClient, items: list[dict], batch: int):
+    started = time.perf_counter()
+    for start in range(0, len(items), batch):
+        chunk = items[start : start + batch]
+        response = await client.post("/packages/bulk", json=chunk)
+        response.raise_for_status()
+    return time.perf_counter() - started
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--type-id", type=int, required=True)
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--batch", type=int, default=1000)
+    args = parser.parse_args()
+
+    items = make_items(args.count, args.type_id)
+    async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+        # Первая посылка заводит session_id в куки клиента
+        (await client.post("/packages/", json=items[0])).raise_for_status()
+
+        single = await bench_single(client, items, args.concurrency)
+        bulk = await bench_bulk(client, items, args.batch)
+
+    print(f"single: {args.count / single:>10.1f} посылок/с ({single:.2f} с)")
+    print(f"bulk:   {args.count / bulk:>10.1f} посылок/с ({bulk:.2f} с)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,86 @@
+"""
+Агрегация сумм доставок по (day_key, type_id): расчёт стоимости формулой
+в каждом документе против $sum по готовому полю delivery_cost_rub.
+
+Запуск (нужна Mongo из .env; данные пишутся во временную коллекцию):
+    python -m benchmarks.bench_cost_aggregation --docs 1000000 --runs 5
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from app.pricing import delivery_cost_mongo, delivery_cost_rub
+from app.setup import mongo_manager_sync
+
+
+BENCH_COLLECTION = "bench_delivery_logs"
+
+
+def seed(collection, docs: int) -> None:
+    collection.drop()
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    batch = []
+    for i in range(docs):
+        weight_kg = round(random.uniform(0.1, 30), 3)
+        value_usd = round(random.uniform(1, 2000), 2)
+        usd_rub_rate = round(random.uniform(80, 100), 4)
+        created_at = start + timedelta(seconds=i * 30)
+        batch.append(
+            {
+                "type_id": random.randint(1, 5),
+                "weight_kg": weight_kg,
+                "value_usd": value_usd,
+                "usd_rub_rate": usd_rub_rate,
+                "delivery_cost_rub": float(
+                    delivery_cost_rub(weight_kg, value_usd, usd_rub_rate)
+                ),
+                "created_at": created_at,
+                "day_key": created_at.strftime("%Y-%m-%d"),
+            }
+        )
+        if len(batch) == 10000:
+            collection.insert_many(batch)
+            batch = []
+    if batch:
+        collection.insert_many(batch)
+
+
+def bench(collection, cost_expr, runs: int) -> float:
+    pipeline = [
+        {
+            "$group": {
+                "_id": {"day_key": "$day_key", "type_id": "$type_id"},
+                "total_delivery_cost": {"$sum": cost_expr},
+                "count_packages": {"$sum": 1},
+            }
+        }
+    ]
+    list(collection.aggregate(pipeline))  # прогрев кэша
+    started = time.perf_counter()
+    for _ in range(runs):
+        list(collection.aggregate(pipeline))
+    return (time.perf_counter() - started) / runs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=200000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    collection = mongo_manager_sync.get_mongodb()[BENCH_COLLECTION]
+    seed(collection, args.docs)
+    try:
+        before = bench(collection, delivery_cost_mongo(), args.runs)
+        after = bench(collection, "$delivery_cost_rub", args.runs)
+    finally:
+        collection.drop()
+
+    print(f"формула в агрегации:   {before * 1000:.1f} мс")
+    print(f"$sum по готовому полю: {after * 1000:.1f} мс")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Задержки POST /packages/ при медленном брокере. Вместо Redis задачи
+«публикует» заглушка, которая спит --broker-delay мс в каждом вызове.
+
+Сравниваются:
+- inline — батчер и очередь задач не запущены: запрос сам ждёт брокер,
+  как при прямом .delay() в обработчике;
+- queued — как в API: батчер и очередь задач из lifespan.
+
+Запуск (нужна БД из .env, MODE не TEST — иначе логирование выключено):
+    python -m benchmarks.bench_enqueue_latency --requests 2000 --broker-delay 50
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from app.api import packages
+from app.config import settings
+from app.middleware.session import SessionKeyMiddleware
+from app.utils.package_log_batcher import package_log_batcher
+from app.utils.task_enqueuer import task_enqueuer
+
+
+def slow_broker(delay: float):
+    def publish(task, args: tuple, kwargs: dict) -> None:
+        time.sleep(delay)
+
+    return publish
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(SessionKeyMiddleware)
+    app.include_router(packages.router)
+    return app
+
+
+async def bench(
+    queued: bool, broker_delay: float, requests: int, concurrency: int, type_id: int
+) -> list[float]:
+    task_enqueuer.publish = slow_broker(broker_delay)
+    if queued:
+        task_enqueuer.start()
+        package_log_batcher.start()
+
+    latencies: list[float] = []
+    payload = {
+        "name": "bench",
+        "weight_kg": "1.5",
+        "value_usd": "10",
+        "type_id": type_id,
+    }
+    try:
+        async with AsyncClient(
+            transport=ASGITransport(app=build_app()), base_url="http://bench"
+        ) as client:
+            remaining = requests
+
+            async def worker():
+                nonlocal remaining
+                while remaining > 0:
+                    remaining -= 1
+                    started = time.perf_counter()
+                    response = await client.post("/packages/", json=payload)
+                    latencies.append(time.perf_counter() - started)
+                    assert response.status_code == 201, response.text
+
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+    finally:
+        await package_log_batcher.stop()
+        await task_enqueuer.stop()
+    return latencies
+
+
+def report(title: str, latencies: list[float]) -> None:
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(
+        f"{title:<28} p50 {quantiles[49] * 1000:7.1f} мс   "
+        f"p99 {quantiles[98] * 1000:7.1f} мс"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--broker-delay", type=float, default=50, help="мс")
+    parser.add_argument("--type-id", type=int, default=1)
+    args = parser.parse_args()
+
+    if settings.MODE == "TEST":
+        raise SystemExit("При MODE=TEST логирование посылок выключено")
+
+    for queued in (False, True):
+        for delay_ms in (0, args.broker_delay):
+            latencies = await bench(
+                queued, delay_ms / 1000, args.requests, args.concurrency, args.type_id
+            )
+            mode = "queued" if queued else "inline"
+            report(f"{mode}, брокер +{delay_ms:g} мс", latencies)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
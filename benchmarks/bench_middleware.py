@@ -0,0 +1,86 @@
+"""
+Запросов в секунду на GET /packages/ с сессионным middleware через
+BaseHTTPMiddleware (как было) и на чистом ASGI.
+
+Запуск (нужна БД из .env):
+    python -m benchmarks.bench_middleware --requests 5000 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from httpx import ASGITransport, AsyncClient
+
+from app.api import packages
+from app.middleware.session import SessionKeyMiddleware
+
+
+async def legacy_session_key_middleware(request: Request, call_next):
+    """Прежняя реализация через app.middleware("http")"""
+    if "session_id" not in request.cookies:
+        request.state.session_id = str(uuid.uuid4())
+    else:
+        request.state.session_id = request.cookies["session_id"]
+
+    response = await call_next(request)
+
+    if "session_id" not in request.cookies:
+        response.set_cookie(
+            key="session_id",
+            value=request.state.session_id,
+            max_age=60 * 60 * 24 * 365 * 10,
+            httponly=True,
+            samesite="lax",
+        )
+    return response
+
+
+def build_app(legacy: bool) -> FastAPI:
+    app = FastAPI()
+    if legacy:
+        app.middleware("http")(legacy_session_key_middleware)
+    else:
+        app.add_middleware(SessionKeyMiddleware)
+    app.include_router(packages.router)
+    return app
+
+
+async def bench(app: FastAPI, requests: int, concurrency: int) -> float:
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://bench"
+    ) as client:
+        # Первый запрос получает куки, дальше — обычный путь с готовой сессией
+        response = await client.get("/packages/")
+        assert response.status_code == 200, response.text
+
+        remaining = requests
+
+        async def worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                await client.get("/packages/")
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return requests / (time.perf_counter() - started)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    before = await bench(build_app(legacy=True), args.requests, args.concurrency)
+    after = await bench(build_app(legacy=False), args.requests, args.concurrency)
+
+    print(f"BaseHTTPMiddleware: {before:.0f} запросов/с")
+    print(f"чистый ASGI:        {after:.0f} запросов/с")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
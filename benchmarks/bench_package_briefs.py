@@ -0,0 +1,96 @@
+"""
+Строк в секунду при выдаче страницы списка посылок (PackageBrief):
+
+- entities — как было: select(PackageORM) целыми сущностями, PackageBrief
+  на каждую строку и сериализация ответа через jsonable_encoder;
+- projection — PackageRepository.get_filtered_by_type (только нужные
+  столбцы, проверка страницы одним TypeAdapter) и dump_json, как в API.
+
+Время включает запрос к MySQL и сериализацию в JSON.
+
+Запуск (нужна БД из .env):
+    python -m benchmarks.bench_package_briefs --rows 5000 --repeat 20
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import select
+
+from app.database import async_session_maker_null
+from app.models.package import PackageORM
+from app.schemas.packages import PackageBrief, package_briefs_adapter
+from app.utils.db_manager import DB_Manager
+from app.utils.package_type_cache import package_type_cache
+from benchmarks.bench_packages_pagination import seed
+
+
+PAGE_SIZES = (10, 30, 100, 300, 1000)
+
+
+async def entities_page(db, session_id: str, limit: int) -> bytes:
+    result = await db.session.execute(
+        select(PackageORM)
+        .filter(PackageORM.session_id == session_id)
+        .order_by(PackageORM.id)
+        .limit(limit)
+    )
+    packages = result.scalars().all()
+    types = await package_type_cache.get_many(db.session, {p.type_id for p in packages})
+    briefs = [
+        PackageBrief(
+            id=p.id,
+            name=p.name,
+            type=types[p.type_id],
+            weight_kg=p.weight_kg,
+            delivery_cost=p.delivery_cost,
+        )
+        for p in packages
+    ]
+    return json.dumps(jsonable_encoder(briefs)).encode()
+
+
+async def projection_page(db, session_id: str, limit: int) -> bytes:
+    briefs = await db.packages.get_filtered_by_type(session_id=session_id, limit=limit)
+    return package_briefs_adapter.dump_json(briefs)
+
+
+async def measure(session_id: str, page_size: int, repeat: int, page) -> float:
+    async with DB_Manager(session_factory=async_session_maker_null) as db:
+        # Прогрев кэша типов и соединения
+        await page(db, session_id, page_size)
+        started = time.perf_counter()
+        for _ in range(repeat):
+            body = await page(db, session_id, page_size)
+            # Сессия не копит сущности между страницами, как и в API
+            db.session.expunge_all()
+        elapsed = time.perf_counter() - started
+    assert body.startswith(b"[")
+    return page_size * repeat / elapsed
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=max(PAGE_SIZES))
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--session-id", default=None)
+    args = parser.parse_args()
+
+    session_id = args.session_id
+    if session_id is None:
+        session_id = f"bench-{uuid.uuid4()}"
+        await seed(session_id, args.rows)
+
+    print(f"{'page':>6} {'entities, rows/s':>18} {'projection, rows/s':>20}")
+    for page_size in PAGE_SIZES:
+        entities = await measure(session_id, page_size, args.repeat, entities_page)
+        projection = await measure(session_id, page_size, args.repeat, projection_page)
+        print(f"{page_size:>6} {entities:>18,.0f} {projection:>20,.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,102 @@
+"""
+Сравнение LIMIT/OFFSET и keyset-пагинации для PackageRepository.get_filtered_by_type.
+
+Запуск (нужна БД из .env):
+    python -m benchmarks.bench_packages_pagination --rows 200000 --per-page 30
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+from decimal import Decimal
+
+from sqlalchemy import insert, select
+
+from app.database import async_session_maker_null
+from app.models.package import PackageORM
+from app.models.package_type import PackageTypeORM
+from app.utils.db_manager import DB_Manager
+
+
+BENCH_TYPE_NAME = "bench pagination"
+
+
+async def seed(session_id: str, rows: int) -> None:
+    async with DB_Manager(session_factory=async_session_maker_null) as db:
+        type_id = await db.session.scalar(
+            select(PackageTypeORM.id).filter_by(name=BENCH_TYPE_NAME)
+        )
+        if type_id is None:
+            result = await db.session.execute(
+                insert(PackageTypeORM).values(name=BENCH_TYPE_NAME)
+            )
+            type_id = result.lastrowid
+
+        chunk = 5000
+        for start in range(0, rows, chunk):
+            await db.session.execute(
+                insert(PackageORM),
+                [
+                    {
+                        "name": f"bench {i}",
+                        "weight_kg": Decimal("1.000"),
+                        "value_usd": Decimal("10.00"),
+                        "type_id": type_id,
+                        "session_id": session_id,
+                    }
+                    for i in range(start, min(start + chunk, rows))
+                ],
+            )
+        await db.commit()
+
+
+async def measure(session_id: str, rows: int, per_page: int, repeat: int) -> None:
+    pages = rows // per_page
+    depths = sorted({1, pages // 100, pages // 10, pages // 2, pages - 1} - {0})
+
+    async with DB_Manager(session_factory=async_session_maker_null) as db:
+        repo = db.packages
+        print(f"{'page':>8} {'offset, ms':>12} {'cursor, ms':>12}")
+        for page in depths:
+            offset = per_page * (page - 1)
+            after = await repo.get_filtered_by_type(
+                session_id=session_id, limit=1, offset=offset - 1 if offset else 0
+            )
+            after_id = after[0].id if offset and after else None
+
+            started = time.perf_counter()
+            for _ in range(repeat):
+                await repo.get_filtered_by_type(
+                    session_id=session_id, limit=per_page, offset=offset
+                )
+            offset_ms = (time.perf_counter() - started) / repeat * 1000
+
+            started = time.perf_counter()
+            for _ in range(repeat):
+                await repo.get_filtered_by_type(
+                    session_id=session_id, limit=per_page, after_id=after_id
+                )
+            cursor_ms = (time.perf_counter() - started) / repeat * 1000
+
+            print(f"{page:>8} {offset_ms:>12.2f} {cursor_ms:>12.2f}")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--per-page", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--session-id", default=None)
+    args = parser.parse_args()
+
+    session_id = args.session_id
+    if session_id is None:
+        session_id = f"bench-{uuid.uuid4()}"
+        await seed(session_id, args.rows)
+
+    await measure(session_id, args.rows, args.per_page, args.repeat)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
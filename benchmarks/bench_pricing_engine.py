@@ -0,0 +1,101 @@
+"""
+Расчёт стоимостей пачки посылок: построчно через Decimal (delivery_cost_rub)
+против векторного PricingEngine. Проверяет, что результаты совпадают.
+
+Запуск (база не нужна):
+    python -m benchmarks.bench_pricing_engine --rows 1000000
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import numpy as np
+
+from app.pricing import Tariff, delivery_cost_rub
+from app.pricing_engine import (
+    VALUE_SCALE,
+    WEIGHT_SCALE,
+    PricingEngine,
+    kopecks_to_decimal,
+    microseconds_since_epoch,
+)
+
+
+BENCH_TARIFF = Tariff(
+    weight_brackets=[
+        {"up_to_kg": "1", "rate_usd": "0.7"},
+        {"up_to_kg": "10", "rate_usd": "0.5"},
+        {"rate_usd": "0.35"},
+    ],
+    type_coefficients={2: Decimal("1.2"), 3: Decimal("0.9")},
+)
+
+
+def generate(rows: int):
+    start = datetime(2025, 1, 1)
+    weights = [Decimal(random.randint(100, 30000)).scaleb(-3) for _ in range(rows)]
+    values = [Decimal(random.randint(100, 200000)).scaleb(-2) for _ in range(rows)]
+    type_ids = [random.randint(1, 5) for _ in range(rows)]
+    created = [start + timedelta(seconds=random.randint(0, 86400)) for _ in range(rows)]
+    # Курс меняется раз в 4 часа
+    series = [
+        (
+            start + timedelta(hours=hour),
+            Decimal(random.randint(800000, 1000000)).scaleb(-4),
+        )
+        for hour in range(0, 24, 4)
+    ]
+    return weights, values, type_ids, created, series
+
+
+def rate_at(series, moment: datetime) -> Decimal:
+    rate = series[0][1]
+    for valid_from, value in series:
+        if valid_from <= moment:
+            rate = value
+    return rate
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    weights, values, type_ids, created, series = generate(args.rows)
+
+    started = time.perf_counter()
+    expected = [
+        delivery_cost_rub(weight, value, rate_at(series, moment), type_id, BENCH_TARIFF)
+        for weight, value, type_id, moment in zip(weights, values, type_ids, created)
+    ]
+    decimal_seconds = time.perf_counter() - started
+
+    engine = PricingEngine(BENCH_TARIFF)
+    # Так строки приходят из MySQL (get_pending_for_pricing): уже целыми числами
+    weight_g = np.array([int(weight * WEIGHT_SCALE) for weight in weights])
+    value_cents = np.array([int(value * VALUE_SCALE) for value in values])
+    types = np.array(type_ids)
+    times_us = np.array([microseconds_since_epoch(moment) for moment in created])
+
+    started = time.perf_counter()
+    kopecks = engine.costs_kopecks(
+        weight_g, value_cents, types, engine.rates_for(times_us, series)
+    )
+    engine_seconds = time.perf_counter() - started
+    actual = kopecks_to_decimal(kopecks)
+    convert_seconds = time.perf_counter() - started - engine_seconds
+
+    mismatches = sum(a != b for a, b in zip(actual, expected))
+    print(f"Decimal построчно: {decimal_seconds:.2f} с")
+    print(
+        f"PricingEngine:     {engine_seconds:.3f} с "
+        f"(+{convert_seconds:.2f} с на перевод в Decimal для UPDATE)"
+    )
+    print(f"Расхождений: {mismatches} из {args.rows}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Накладные расходы запуска DB-задачи Celery: async_to_sync + NullPool
+против постоянного цикла воркера с пулом соединений.
+
+Запуск (нужна БД из .env):
+    python -m benchmarks.bench_task_overhead --runs 200
+"""
+
+import argparse
+import time
+
+from asgiref.sync import async_to_sync
+from sqlalchemy import text
+
+from app.database import async_session_maker_null
+from app.tasks.worker_runtime import worker_runtime
+from app.utils.db_manager import DB_Manager
+
+
+async def select_one(session_factory) -> None:
+    async with DB_Manager(session_factory=session_factory) as db:
+        await db.session.execute(text("SELECT 1"))
+
+
+def bench_null_pool(runs: int) -> float:
+    started = time.perf_counter()
+    for _ in range(runs):
+        async_to_sync(select_one)(async_session_maker_null)
+    return (time.perf_counter() - started) / runs
+
+
+def bench_worker_runtime(runs: int) -> float:
+    worker_runtime.run(select_one(worker_runtime.session_maker))  # прогрев пула
+    started = time.perf_counter()
+    for _ in range(runs):
+        worker_runtime.run(select_one(worker_runtime.session_maker))
+    return (time.perf_counter() - started) / runs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=100)
+    args = parser.parse_args()
+
+    before = bench_null_pool(args.runs)
+    after = bench_worker_runtime(args.runs)
+    worker_runtime.shutdown()
+
+    print(f"async_to_sync + NullPool: {before * 1000:.2f} мс/задача")
+    print(f"цикл воркера + пул:       {after * 1000:.2f} мс/задача")
+
+
+if __name__ == "__main__":
+    main()
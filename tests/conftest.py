@@ -1,11 +1,8 @@
 # ruff: noqa: E402
-from unittest import mock
 import aiomysql
 
 from app.schemas.package_types import PackageTypeBase
 
-mock.patch("fastapi_cache.decorator.cache", lambda *args, **kwargs: lambda f: f).start()
-
 import pytest
 from httpx import AsyncClient, ASGITransport
 
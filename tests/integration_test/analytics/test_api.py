@@ -0,0 +1,159 @@
+import csv
+import io
+import json
+from datetime import datetime, timezone
+
+from httpx import AsyncClient
+import pytest
+
+from app.api.dependencies import get_analytics_repo
+from app.main import app
+from app.setup import mongo_manager
+from app.utils.delivery_logs_storage import LOGS_COLLECTION, TYPE_FIELD, to_storage
+from app.utils.analytics_cache import analytics_cache
+
+
+class CountingAnalyticsRepository:
+    def __init__(self):
+        self.calls = 0
+
+    async def get_daily_totals(self, day: str):
+        self.calls += 1
+        return [{"_id": 1, "total_delivery_cost": 150.5, "count_packages": 3}]
+
+    async def get_totals_range(self, start_date, end_date, type_id):
+        self.calls += 1
+        return [{"_id": 1, "total_delivery_cost": 150.5, "count_packages": 3}]
+
+
+@pytest.fixture
+def analytics_repo():
+    repo = CountingAnalyticsRepository()
+    app.dependency_overrides[get_analytics_repo] = lambda: repo
+    yield repo
+    app.dependency_overrides.pop(get_analytics_repo)
+
+
+async def test_daily_totals_cache_hit(
+    api_client: AsyncClient, analytics_repo: CountingAnalyticsRepository
+):
+    day = "2000-01-01"
+    await analytics_cache.invalidate_days([day])
+
+    first = await api_client.get("/analytics/daily_totals", params={"day": day})
+    second = await api_client.get("/analytics/daily_totals", params={"day": day})
+
+    assert first.status_code == second.status_code == 200
+    assert first.json() == second.json()
+    assert analytics_repo.calls == 1
+
+    await analytics_cache.invalidate_days([day])
+    await api_client.get("/analytics/daily_totals", params={"day": day})
+    assert analytics_repo.calls == 2
+
+
+async def test_totals_range_cache_key_covers_params(
+    api_client: AsyncClient, analytics_repo: CountingAnalyticsRepository
+):
+    params = {"start_date": "2000-02-01", "end_date": "2000-02-03"}
+    await analytics_cache.invalidate_days(["2000-02-01", "2000-02-02", "2000-02-03"])
+
+    await api_client.get("/analytics/delivery_totals_range", params=params)
+    await api_client.get("/analytics/delivery_totals_range", params=params)
+    assert analytics_repo.calls == 1
+
+    await api_client.get(
+        "/analytics/delivery_totals_range", params={**params, "type_id": 1}
+    )
+    assert analytics_repo.calls == 2
+
+    # Новые логи за один из дней диапазона сбрасывают запись
+    await analytics_cache.invalidate_days(["2000-02-02"])
+    await api_client.get("/analytics/delivery_totals_range", params=params)
+    assert analytics_repo.calls == 3
+
+
+EXPORT_TYPE_ID = 987654
+
+
+@pytest.fixture
+async def export_logs():
+    db = await mongo_manager.get_mongodb()
+    logs = db[LOGS_COLLECTION]
+    await logs.delete_many({TYPE_FIELD: EXPORT_TYPE_ID})
+    await logs.insert_many(
+        [
+            to_storage(
+                {
+                    "package_id": package_id,
+                    "type_id": EXPORT_TYPE_ID,
+                    "weight_kg": 1.0,
+                    "value_usd": 10.0,
+                    "usd_rub_rate": 90.0,
+                    "is_estimated": False,
+                    "created_at": datetime(
+                        2000, 3, 1, 12, package_id, tzinfo=timezone.utc
+                    ),
+                    "day_key": "2000-03-01",
+                    "hour": 15,
+                }
+            )
+            for package_id in range(3)
+        ]
+    )
+    await analytics_cache.invalidate_days(["2000-03-01"])
+    yield
+    await logs.delete_many({TYPE_FIELD: EXPORT_TYPE_ID})
+
+
+async def test_export_logs_ndjson(api_client: AsyncClient, export_logs):
+    response = await api_client.get(
+        "/analytics/export", params={"type_id": EXPORT_TYPE_ID, "sort_order": "desc"}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["package_id"] for row in rows] == [2, 1, 0]
+    assert all(isinstance(row["id"], str) for row in rows)
+
+
+async def test_export_logs_csv(api_client: AsyncClient, export_logs):
+    response = await api_client.get(
+        "/analytics/export", params={"type_id": EXPORT_TYPE_ID, "format": "csv"}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["package_id"] for row in rows] == ["0", "1", "2"]
+    assert rows[0]["day_key"] == "2000-03-01"
+
+
+async def test_all_logs_seek_pagination(api_client: AsyncClient, export_logs):
+    params = {
+        "type_id": EXPORT_TYPE_ID,
+        "limit": 2,
+        "sort_field": "created_at",
+        "sort_order": "asc",
+    }
+    first = await api_client.get("/analytics/all", params=params)
+    assert first.status_code == 200
+    assert [log["package_id"] for log in first.json()] == [0, 1]
+    cursor = first.headers["X-Next-Cursor"]
+
+    second = await api_client.get("/analytics/all", params={**params, "cursor": cursor})
+    assert second.status_code == 200
+    assert [log["package_id"] for log in second.json()] == [2]
+    assert "X-Next-Cursor" not in second.headers
+
+    # Курсор привязан к сортировке, с которой был выдан
+    response = await api_client.get(
+        "/analytics/all", params={**params, "sort_order": "desc", "cursor": cursor}
+    )
+    assert response.status_code == 400
+
+    response = await api_client.get(
+        "/analytics/all", params={**params, "sort_field": "weight_kg"}
+    )
+    assert response.status_code == 422
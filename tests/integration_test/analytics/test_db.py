@@ -0,0 +1,227 @@
+from datetime import datetime, timezone
+
+from bson import ObjectId
+import pytest
+
+from app.setup import mongo_manager, mongo_manager_sync
+from app.pricing import delivery_cost_rub
+from app.setup_indexes import ensure_mongo_indexes
+from app.tasks.backfill_costs import backfill_delivery_costs
+from app.tasks.rollups import DAILY_ROLLUPS, HOURLY_ROLLUPS
+from app.tasks.timeseries_migration import CHECKPOINT_ID, migrate_to_timeseries
+from app.utils.delivery_logs_storage import (
+    LOGS_COLLECTION,
+    PLAIN_COLLECTION,
+    TIMESERIES,
+    TIMESERIES_COLLECTION,
+    TYPE_FIELD,
+    from_storage,
+    to_storage,
+)
+
+
+DAY_FROM = datetime(2000, 1, 1, tzinfo=timezone.utc)
+DAY_TO = datetime(2000, 1, 31, tzinfo=timezone.utc)
+SEEK = {
+    "$or": [
+        {"created_at": {"$lt": DAY_TO}},
+        {"created_at": DAY_TO, "_id": {"$lt": ObjectId()}},
+    ]
+}
+
+# (коллекция, фильтр, сортировка) — формы запросов из репозиториев и задач
+FIND_SHAPES = [
+    ("delivery_logs", {}, [("created_at", -1), ("_id", -1)]),
+    ("delivery_logs", {"type_id": 1}, [("created_at", -1), ("_id", -1)]),
+    (
+        "delivery_logs",
+        {"created_at": {"$gte": DAY_FROM, "$lte": DAY_TO}},
+        [("created_at", 1), ("_id", 1)],
+    ),
+    ("delivery_logs", {"type_id": 1}, [("package_id", 1), ("_id", 1)]),
+    (
+        "delivery_logs",
+        {"$and": [{"type_id": 1}, SEEK]},
+        [("created_at", -1), ("_id", -1)],
+    ),
+    ("delivery_logs", {"created_at": {"$lt": DAY_FROM}}, None),
+    ("delivery_daily_rollups", {"day_key": "2000-01-01"}, [("type_id", 1)]),
+    (
+        "delivery_hourly_rollups",
+        {"day_key": {"$gte": "2000-01-01", "$lte": "2000-01-31"}, "type_id": 1},
+        [("day_key", 1), ("hour", 1), ("type_id", 1)],
+    ),
+    ("usd_rate_history", {}, [("created_at", -1)]),
+    ("usd_rate_history", {"created_at": {"$lte": DAY_FROM}}, [("created_at", -1)]),
+    (
+        "usd_rate_history",
+        {"created_at": {"$gt": DAY_FROM, "$lte": DAY_TO}},
+        [("created_at", 1)],
+    ),
+]
+
+AGGREGATE_SHAPES = [
+    (
+        "delivery_logs",
+        [{"$match": {"day_key": {"$gte": "2000-01-01", "$lte": "2000-01-31"}}}],
+    ),
+    (
+        "delivery_daily_rollups",
+        [
+            {
+                "$match": {
+                    "day_key": {"$gte": "2000-01-01", "$lte": "2000-01-31"},
+                    "type_id": 1,
+                }
+            },
+            {"$group": {"_id": "$type_id", "count": {"$sum": "$count_packages"}}},
+        ],
+    ),
+]
+
+
+def plan_stages(explain) -> set[str]:
+    """Стадии выбранных планов из вывода explain()"""
+    stages = set()
+
+    def walk(node, in_plan: bool):
+        if isinstance(node, dict):
+            if in_plan and "stage" in node:
+                stages.add(node["stage"])
+            for key, value in node.items():
+                if key == "rejectedPlans":
+                    continue
+                walk(value, in_plan or key == "winningPlan")
+        elif isinstance(node, list):
+            for item in node:
+                walk(item, in_plan)
+
+    walk(explain, False)
+    return stages
+
+
+@pytest.fixture(scope="module")
+async def mongo_db():
+    db = await mongo_manager.get_mongodb()
+    await ensure_mongo_indexes(db)
+    return db
+
+
+# Планы по корзинам time-series коллекции устроены иначе
+plain_storage_only = pytest.mark.skipif(
+    TIMESERIES, reason="формы запросов описаны для обычной коллекции логов"
+)
+
+
+@plain_storage_only
+@pytest.mark.parametrize("collection, query, sort", FIND_SHAPES)
+async def test_find_uses_index(mongo_db, collection, query, sort):
+    cursor = mongo_db[collection].find(query)
+    if sort:
+        cursor = cursor.sort(sort)
+    stages = plan_stages(await cursor.explain())
+
+    assert stages
+    assert "COLLSCAN" not in stages
+
+
+@plain_storage_only
+@pytest.mark.parametrize("collection, pipeline", AGGREGATE_SHAPES)
+async def test_aggregate_uses_index(mongo_db, collection, pipeline):
+    explain = await mongo_db.command(
+        "explain",
+        {"aggregate": collection, "pipeline": pipeline, "cursor": {}},
+        verbosity="queryPlanner",
+    )
+    stages = plan_stages(explain)
+
+    assert stages
+    assert "COLLSCAN" not in stages
+
+
+MIGRATION_TYPE_ID = 876543
+
+
+def test_migrate_to_timeseries():
+    db = mongo_manager_sync.get_mongodb()
+    source = db[PLAIN_COLLECTION]
+    target = db[TIMESERIES_COLLECTION]
+    source.delete_many({"type_id": MIGRATION_TYPE_ID})
+    source.insert_many(
+        [
+            {
+                "package_id": package_id,
+                "type_id": MIGRATION_TYPE_ID,
+                "weight_kg": 1.0,
+                "value_usd": 10.0,
+                "usd_rub_rate": 90.0,
+                "is_estimated": False,
+                "created_at": datetime(2000, 4, 1, 21, package_id, tzinfo=timezone.utc),
+                "day_key": "2000-04-02",
+                "hour": 0,
+            }
+            for package_id in range(2)
+        ]
+    )
+    # С начала: уже перенесённые ранее логи не должны задублироваться
+    db.migrations.delete_one({"_id": CHECKPOINT_ID})
+
+    migrate_to_timeseries(db, batch_size=1)
+    assert migrate_to_timeseries(db, batch_size=1) == 0
+
+    migrated = list(
+        target.find({"meta.type_id": MIGRATION_TYPE_ID}, sort=[("package_id", 1)])
+    )
+    assert [log["package_id"] for log in migrated] == [0, 1]
+    assert "day_key" not in migrated[0]
+
+    restored = from_storage(migrated[0])
+    assert restored["type_id"] == MIGRATION_TYPE_ID
+    assert restored["day_key"] == "2000-04-02"
+    assert restored["hour"] == 0
+
+    source.delete_many({"type_id": MIGRATION_TYPE_ID})
+    target.delete_many({"meta.type_id": MIGRATION_TYPE_ID})
+
+
+BACKFILL_TYPE_ID = 765432
+
+
+def test_backfill_delivery_costs():
+    db = mongo_manager_sync.get_mongodb()
+    logs = db[LOGS_COLLECTION]
+    logs.delete_many({TYPE_FIELD: BACKFILL_TYPE_ID})
+    logs.insert_many(
+        [
+            to_storage(
+                {
+                    "package_id": 1,
+                    "type_id": BACKFILL_TYPE_ID,
+                    "weight_kg": 2.345,
+                    "value_usd": 19.99,
+                    "usd_rub_rate": 91.2345,
+                    "is_estimated": False,
+                    "created_at": datetime(2000, 5, 1, tzinfo=timezone.utc),
+                    "day_key": "2000-05-01",
+                    "hour": 3,
+                }
+            )
+        ]
+    )
+
+    assert backfill_delivery_costs(db, batch_size=100) >= 1
+
+    cost = float(delivery_cost_rub(2.345, 19.99, 91.2345))
+    log = logs.find_one({TYPE_FIELD: BACKFILL_TYPE_ID})
+    assert log["delivery_cost_rub"] == cost
+
+    # Агрегаты за день лога пересобраны с дописанной стоимостью
+    rollup = db[DAILY_ROLLUPS].find_one(
+        {"day_key": "2000-05-01", "type_id": BACKFILL_TYPE_ID}
+    )
+    assert rollup["total_delivery_cost"] == cost
+    assert rollup["count_packages"] == 1
+
+    logs.delete_many({TYPE_FIELD: BACKFILL_TYPE_ID})
+    for collection in (DAILY_ROLLUPS, HOURLY_ROLLUPS):
+        db[collection].delete_many({"type_id": BACKFILL_TYPE_ID})
@@ -0,0 +1,30 @@
+from httpx import AsyncClient
+
+from app.utils.metrics import metrics
+
+
+async def test_metrics_api(api_client: AsyncClient):
+    response = await api_client.get("/package_types/")
+    assert response.status_code == 200
+    metrics.flush()
+
+    response = await api_client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+
+    body = response.text
+    assert "# TYPE http_request_duration_seconds histogram" in body
+    assert 'path="/package_types/"' in body
+    assert 'le="+Inf"' in body
+    assert "redis_roundtrips_total" in body
+    assert "celery_queue_length" in body
+
+
+async def test_metrics_validation_error_status(api_client: AsyncClient):
+    response = await api_client.post("/pricing/quote", json=[])
+    assert response.status_code == 422
+    metrics.flush()
+
+    body = (await api_client.get("/metrics")).text
+    assert 'path="/pricing/quote",status="422"' in body
+    assert 'path="/pricing/quote",status="500"' not in body
@@ -1,6 +1,20 @@
-from httpx import AsyncClient
+import asyncio
+import json
+import time
+from decimal import Decimal
+
+from httpx import ASGITransport, AsyncClient
 import pytest
 
+from app.main import app
+from app.pricing import delivery_cost_rub
+from app.setup import redis_manager
+from app.tasks.rate_provider import RATE_KEY
+from app.tasks.tasks import log_packages_batch
+from app.utils.package_log_batcher import PackageLogBatcher
+from app.utils.task_enqueuer import TaskEnqueuer
+from app.utils.usd_rate_cache import usd_rate_cache
+
 
 @pytest.mark.dependency(name="add_package")
 async def test_add_package_api(setup_package_type: int, api_client: AsyncClient):
@@ -20,6 +34,30 @@ async def test_add_package_api(setup_package_type: int, api_client: AsyncClient)
     pytest.package_id = data["id"]
 
 
+async def test_add_package_priced_at_insert_api(
+    setup_package_type: int, api_client: AsyncClient
+):
+    await redis_manager.connect()
+    await redis_manager.set(RATE_KEY, "90.5")
+    usd_rate_cache.invalidate()
+
+    response = await api_client.post(
+        "/packages/",
+        json={
+            "name": "сразу со стоимостью",
+            "weight_kg": "1.5",
+            "value_usd": "10",
+            "type_id": setup_package_type,
+        },
+    )
+    assert response.status_code == 201
+
+    response = await api_client.get(f"/packages/{response.json()['id']}")
+    assert Decimal(response.json()["delivery_cost"]) == delivery_cost_rub(
+        "1.5", "10", "90.5", setup_package_type
+    )
+
+
 @pytest.mark.dependency(depends=["add_package"])
 async def test_get_packages_api(api_client: AsyncClient):
     response = await api_client.get("/packages/")
@@ -32,3 +70,140 @@ async def test_get_packages_api(api_client: AsyncClient):
     assert response.status_code == 200
     package = response.json()
     assert package["id"] == pytest.package_id
+
+
+@pytest.mark.dependency(depends=["add_package"])
+async def test_get_packages_cursor_api(api_client: AsyncClient):
+    type_id = (await api_client.get("/package_types/")).json()[0]["id"]
+    for i in range(3):
+        response = await api_client.post(
+            "/packages/",
+            json={
+                "name": f"посылка {i}",
+                "weight_kg": 1,
+                "value_usd": 1,
+                "type_id": type_id,
+            },
+        )
+        assert response.status_code == 201
+
+    by_page = await api_client.get("/packages/", params={"per_page": 2, "page": 2})
+    assert by_page.status_code == 200
+
+    first = await api_client.get("/packages/", params={"per_page": 2})
+    assert first.status_code == 200
+    cursor = first.headers["X-Next-Cursor"]
+
+    by_cursor = await api_client.get(
+        "/packages/", params={"per_page": 2, "cursor": cursor}
+    )
+    assert by_cursor.status_code == 200
+    assert by_cursor.json() == by_page.json()
+
+    response = await api_client.get("/packages/", params={"cursor": "не курсор"})
+    assert response.status_code == 400
+
+
+async def test_get_packages_delivery_cost_api(api_client: AsyncClient):
+    # Без курса посылка создаётся без стоимости
+    await redis_manager.connect()
+    await redis_manager.delete(RATE_KEY)
+    usd_rate_cache.invalidate()
+    type_id = (await api_client.get("/package_types/")).json()[0]["id"]
+    response = await api_client.post(
+        "/packages/",
+        json={"name": "без курса", "weight_kg": 1, "value_usd": 1, "type_id": type_id},
+    )
+    assert response.status_code == 201
+
+    response = await api_client.get("/packages/", params={"has_delivery_cost": False})
+    assert response.status_code == 200
+    packages = response.json()
+    assert packages
+    assert all(p["delivery_cost"] == "Не рассчитано" for p in packages)
+    assert set(packages[0]) == {"id", "name", "type", "weight_kg", "delivery_cost"}
+
+    response = await api_client.get("/packages/", params={"has_delivery_cost": True})
+    assert response.status_code == 200
+    assert all(Decimal(p["delivery_cost"]) > 0 for p in response.json())
+
+
+async def test_add_packages_bulk_api(api_client: AsyncClient):
+    type_id = (await api_client.get("/package_types/")).json()[0]["id"]
+    items = [
+        {"name": "пачка 1", "weight_kg": 1.5, "value_usd": 10, "type_id": type_id},
+        {"name": "пачка 2", "weight_kg": -1, "value_usd": 10, "type_id": type_id},
+        {"name": "пачка 3", "weight_kg": 2, "value_usd": 5, "type_id": type_id},
+    ]
+
+    response = await api_client.post("/packages/bulk", json=items)
+    assert response.status_code == 201
+    data = response.json()
+    assert len(data["ids"]) == 2
+    # id идут по возрастанию, но не обязательно подряд
+    assert data["ids"][1] > data["ids"][0]
+    assert [e["index"] for e in data["errors"]] == [1]
+
+    ndjson = "\n".join(json.dumps(item) for item in items[::2])
+    response = await api_client.post(
+        "/packages/bulk",
+        content=ndjson,
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 201
+    assert len(response.json()["ids"]) == 2
+
+    for package_id, name in zip(data["ids"], ["пачка 1", "пачка 3"]):
+        response = await api_client.get(f"/packages/{package_id}")
+        assert response.status_code == 200
+        assert response.json()["name"] == name
+
+
+async def test_session_cookie_api():
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        response = await client.get("/")
+        assert response.status_code == 200
+        session_id = response.cookies["session_id"]
+        assert "httponly" in response.headers["set-cookie"].lower()
+
+        response = await client.get("/")
+        assert "set-cookie" not in response.headers
+        assert client.cookies["session_id"] == session_id
+
+
+async def test_package_log_batcher():
+    sent: list[list[dict]] = []
+
+    async def send(records: list[dict]) -> None:
+        sent.append(records)
+
+    batcher = PackageLogBatcher(max_size=3, max_delay=0.05, send=send)
+    batcher.start()
+    for package_id in range(7):
+        await batcher.add({"package_id": package_id})
+    await asyncio.sleep(0.1)
+    await batcher.add({"package_id": 7})
+    await batcher.stop()
+
+    assert [len(batch) for batch in sent] == [3, 3, 1, 1]
+    assert [r["package_id"] for batch in sent for r in batch] == list(range(8))
+
+
+async def test_task_enqueuer_does_not_wait_for_broker():
+    published: list[tuple] = []
+
+    def slow_publish(task, args: tuple, kwargs: dict) -> None:
+        time.sleep(0.05)
+        published.append(args)
+
+    enqueuer = TaskEnqueuer(max_size=10, workers=2, publish=slow_publish)
+    enqueuer.start()
+    started = time.perf_counter()
+    for i in range(5):
+        await enqueuer.enqueue(log_packages_batch, [i])
+    assert time.perf_counter() - started < 0.05
+
+    await enqueuer.stop()
+    assert sorted(published) == [([i],) for i in range(5)]
@@ -23,3 +23,15 @@ async def test_add_package_types_api(
 async def test_get_package_types_api(api_client: AsyncClient):
     response = await api_client.get("/package_types/")
     assert response.status_code == 200
+
+
+async def test_new_package_type_visible_after_cache(api_client: AsyncClient):
+    before = await api_client.get("/package_types/")
+    assert before.status_code == 200
+
+    response = await api_client.post("/package_types/", json={"name": "тест кэша"})
+    assert response.status_code == 201
+    new_id = response.json()["id"]
+
+    after = await api_client.get("/package_types/")
+    assert new_id in [t["id"] for t in after.json()]
@@ -1,4 +1,7 @@
+import asyncio
+
 from app.schemas.package_types import PackageTypeBase
+from app.utils.package_type_cache import PackageTypeCache
 from app.utils.db_manager import DB_Manager
 from app.database import async_session_maker_null
 
@@ -15,3 +18,25 @@ async def test_add_package_types():
         saved_data = await db.package_types.get_one(id=new_data["id"])
         assert saved_data is not None
         assert saved_data.name == title
+
+
+async def test_package_type_cache_over_maxsize():
+    async with DB_Manager(session_factory=async_session_maker_null) as db:
+        for i in range(3):
+            await db.package_types.add(PackageTypeBase(name=f"тип для кэша {i}"))
+        await db.commit()
+        all_ids = {package_type.id for package_type in await db.package_types.get_all()}
+
+        # Таблица не помещается в кэш — недостающие типы дочитываются по id
+        cache = PackageTypeCache(maxsize=2)
+        found = await cache.get_many(db.session, all_ids)
+        assert found.keys() == all_ids
+
+        # Загрузка, начатая до сброса, не сохраняется
+        cache = PackageTypeCache()
+        reload = asyncio.create_task(cache.get_all(db.session))
+        await asyncio.sleep(0)
+        cache.invalidate()
+        assert {package_type.id for package_type in await reload} == all_ids
+        assert not cache._is_fresh()
+        assert not cache._types
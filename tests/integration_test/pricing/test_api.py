@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+from zoneinfo import ZoneInfo
+
+from httpx import AsyncClient
+
+from app.pricing import delivery_cost_rub
+from app.setup import redis_manager
+from app.tasks.rate_provider import RATE_KEY
+from app.tasks.repricing import REPRICE_PROGRESS_KEY
+from app.tasks.tasks import DELIVERY_COSTS_PROGRESS_KEY
+from app.utils.usd_rate_cache import usd_rate_cache
+
+
+async def test_quote_api(api_client: AsyncClient):
+    await redis_manager.connect()
+    await redis_manager.set(RATE_KEY, "91.2345")
+    usd_rate_cache.invalidate()
+
+    items = [
+        {"weight_kg": "2.345", "value_usd": "19.99", "type_id": 1},
+        {"weight_kg": "0.5", "value_usd": "1500", "type_id": 2},
+    ]
+    response = await api_client.post("/pricing/quote", json=items)
+    assert response.status_code == 200
+
+    data = response.json()
+    assert Decimal(data["usd_rub_rate"]) == Decimal("91.2345")
+    assert [Decimal(cost) for cost in data["costs"]] == [
+        delivery_cost_rub(
+            item["weight_kg"], item["value_usd"], "91.2345", item["type_id"]
+        )
+        for item in items
+    ]
+
+
+async def test_quote_api_validation(api_client: AsyncClient):
+    response = await api_client.post("/pricing/quote", json=[])
+    assert response.status_code == 422
+
+    response = await api_client.post(
+        "/pricing/quote", json=[{"weight_kg": "0", "value_usd": "1", "type_id": 1}]
+    )
+    assert response.status_code == 422
+
+
+async def test_reprice_progress_api(api_client: AsyncClient):
+    await redis_manager.connect()
+    await redis_manager.delete(REPRICE_PROGRESS_KEY)
+    response = await api_client.get("/pricing/reprice")
+    assert response.status_code == 200
+    assert response.json()["status"] == "idle"
+
+    since = datetime(2025, 3, 1, tzinfo=ZoneInfo("Europe/Moscow"))
+    await redis_manager.redis.hset(
+        REPRICE_PROGRESS_KEY,
+        mapping={
+            "job_id": "test",
+            "status": "running",
+            "usd_rub_rate": "95.5",
+            "since": since.isoformat(),
+            "started_at": (since + timedelta(days=4)).isoformat(),
+            "reached_at": (since + timedelta(days=3)).isoformat(),
+            "updated": 1200,
+        },
+    )
+    response = await api_client.get("/pricing/reprice")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "running"
+    assert data["updated"] == 1200
+    assert data["percent"] == 25.0
+    await redis_manager.delete(REPRICE_PROGRESS_KEY)
+
+
+async def test_delivery_costs_progress_api(api_client: AsyncClient):
+    await redis_manager.connect()
+    await redis_manager.delete(DELIVERY_COSTS_PROGRESS_KEY)
+    response = await api_client.get("/pricing/delivery_costs")
+    assert response.status_code == 200
+    assert response.json()["status"] == "idle"
+
+    await redis_manager.redis.hset(
+        DELIVERY_COSTS_PROGRESS_KEY,
+        mapping={
+            "status": "running",
+            "total_chunks": 4,
+            "done_chunks": 1,
+            "updated": 10,
+        },
+    )
+    response = await api_client.get("/pricing/delivery_costs")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "running"
+    assert data["done_chunks"] == 1
+    assert data["total_chunks"] == 4
+    await redis_manager.delete(DELIVERY_COSTS_PROGRESS_KEY)
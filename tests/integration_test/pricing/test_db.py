@@ -0,0 +1,168 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import insert, select, update
+
+from app.database import async_session_maker_null
+from app.models.package import PackageORM
+from app.pricing import delivery_cost_rub
+from app.setup import redis_manager_sync
+from app.tasks.locks import acquire_lock, release_lock
+from app.tasks.repricing import (
+    REPRICE_LOCK_KEY,
+    REPRICE_LOCK_TTL,
+    REPRICE_PROGRESS_KEY,
+    last_repriced_rate,
+    load_progress,
+    reprice_since,
+    run_repricing,
+    start_job,
+)
+from app.tasks.tasks import (
+    DELIVERY_COSTS_LOCK_KEY,
+    DELIVERY_COSTS_LOCK_TTL,
+    DELIVERY_COSTS_PROGRESS_KEY,
+    _price_with_engine,
+    fail_delivery_costs,
+    finish_delivery_costs,
+    split_ids,
+)
+from app.utils.db_manager import DB_Manager
+
+
+async def test_engine_matches_sql(setup_package_type: int):
+    start = datetime(2025, 3, 1, 12, tzinfo=ZoneInfo("Europe/Moscow"))
+    rate_series = [
+        (start, Decimal("90.1234")),
+        (start + timedelta(hours=1), Decimal("92.5678")),
+    ]
+    rows = [
+        {
+            "name": f"pricing {i}",
+            "weight_kg": Decimal(i * 137 % 30000 + 1).scaleb(-3),
+            "value_usd": Decimal(i * 7919 % 200000 + 1).scaleb(-2),
+            "type_id": setup_package_type,
+            "session_id": "pricing-engine",
+            "created_at": start + timedelta(minutes=i),
+        }
+        for i in range(120)
+    ]
+
+    async with DB_Manager(session_factory=async_session_maker_null) as db:
+        await db.session.execute(insert(PackageORM), rows)
+        result = await db.session.execute(
+            select(PackageORM.id).where(PackageORM.session_id == "pricing-engine")
+        )
+        ids = sorted(result.scalars().all())
+        await db.packages.update_costs(rate_series, ids[0], ids[-1])
+        sql_costs = await _costs(db, ids)
+        assert None not in sql_costs.values()
+
+        # Те же строки заново считает движок — стоимости должны совпасть
+        await db.session.execute(
+            update(PackageORM)
+            .where(PackageORM.id.in_(ids))
+            .values(delivery_cost=None)
+            .execution_options(synchronize_session=False)
+        )
+        updated = await _price_with_engine(db, rate_series, ids[0], ids[-1])
+        assert updated == len(ids)
+        assert await _costs(db, ids) == sql_costs
+        await db.commit()
+
+
+async def test_repricing_window(setup_package_type: int):
+    now = datetime.now(ZoneInfo("Europe/Moscow"))
+    rows = [
+        {
+            "name": f"reprice {i}",
+            "weight_kg": Decimal("1.5"),
+            "value_usd": Decimal("20"),
+            "type_id": setup_package_type,
+            "session_id": "reprice",
+            "delivery_cost": Decimal("1.00"),
+            "created_at": created_at,
+        }
+        for i, created_at in enumerate(
+            [now - timedelta(days=30)] + [now - timedelta(hours=i) for i in range(5)]
+        )
+    ]
+    async with DB_Manager(session_factory=async_session_maker_null) as db:
+        await db.session.execute(insert(PackageORM), rows)
+        await db.commit()
+        result = await db.session.execute(
+            select(PackageORM.id).where(PackageORM.session_id == "reprice")
+        )
+        old_id, *recent_ids = sorted(result.scalars().all())
+
+    redis_manager_sync.connect()
+    redis = redis_manager_sync.redis
+    start_job(redis, Decimal("95.5"), reprice_since(now))
+    lock_token = acquire_lock(redis, REPRICE_LOCK_KEY, REPRICE_LOCK_TTL)
+    assert lock_token is not None
+    assert acquire_lock(redis, REPRICE_LOCK_KEY, REPRICE_LOCK_TTL) is None
+    # Чужой токен блокировку не снимает
+    release_lock(redis, REPRICE_LOCK_KEY, "чужой")
+    assert redis.get(REPRICE_LOCK_KEY) is not None
+    try:
+        updated = await run_repricing(
+            async_session_maker_null,
+            redis,
+            lock_token,
+            batch_size=2,
+            rows_per_second=1000,
+        )
+    finally:
+        release_lock(redis, REPRICE_LOCK_KEY, lock_token)
+    assert redis.get(REPRICE_LOCK_KEY) is None
+    assert last_repriced_rate(redis) == Decimal("95.5")
+    assert updated >= len(recent_ids)
+
+    async with DB_Manager(session_factory=async_session_maker_null) as db:
+        costs = await _costs(db, [old_id, *recent_ids])
+    # Посылка старше окна не пересчитывается
+    assert costs[old_id] == Decimal("1.00")
+    expected = delivery_cost_rub("1.5", "20", "95.5", setup_package_type)
+    assert [costs[package_id] for package_id in recent_ids] == [expected] * 5
+
+    progress = load_progress(redis.hgetall(REPRICE_PROGRESS_KEY))
+    assert progress["status"] == "done"
+    assert progress["percent"] == 100.0
+    assert progress["updated"] == updated
+
+
+def test_split_ids():
+    assert split_ids([], 3) == []
+    assert split_ids([1, 2, 5], 3) == [(1, 5)]
+    assert split_ids([1, 2, 5, 8, 9, 20, 21], 3) == [(1, 5), (8, 20), (21, 21)]
+
+
+def test_delivery_costs_lock_released_on_error():
+    redis_manager_sync.connect()
+    redis = redis_manager_sync.redis
+    redis.delete(DELIVERY_COSTS_LOCK_KEY, DELIVERY_COSTS_PROGRESS_KEY)
+
+    lock_token = acquire_lock(redis, DELIVERY_COSTS_LOCK_KEY, DELIVERY_COSTS_LOCK_TTL)
+    fail_delivery_costs(
+        None, RuntimeError("диапазон упал"), None, lock_token=lock_token
+    )
+    assert redis.get(DELIVERY_COSTS_LOCK_KEY) is None
+    assert redis.hget(DELIVERY_COSTS_PROGRESS_KEY, "status") == b"failed"
+
+    # Запоздавший callback прошлого прохода не снимает чужую блокировку
+    lock_token = acquire_lock(redis, DELIVERY_COSTS_LOCK_KEY, DELIVERY_COSTS_LOCK_TTL)
+    finish_delivery_costs([1, 2], lock_token="прошлый проход")
+    assert redis.get(DELIVERY_COSTS_LOCK_KEY) == lock_token.encode()
+    assert redis.hget(DELIVERY_COSTS_PROGRESS_KEY, "status") == b"failed"
+
+    finish_delivery_costs([1, 2], lock_token=lock_token)
+    assert redis.get(DELIVERY_COSTS_LOCK_KEY) is None
+    assert redis.hget(DELIVERY_COSTS_PROGRESS_KEY, "status") == b"done"
+
+
+async def _costs(db, ids: list[int]) -> dict[int, Decimal | None]:
+    result = await db.session.execute(
+        select(PackageORM.id, PackageORM.delivery_cost).where(PackageORM.id.in_(ids))
+    )
+    return dict(result.all())